@@ -1,10 +1,13 @@
-from typing import List
+from typing import List, Optional
 
 class CmakeTools:
     
     from ._impl import cmake_command
 
-    def __init__(self, srcdir, builddir) -> None:
+    # supported generators (None means cmake's default)
+    generators = ['Unix Makefiles', 'Ninja']
+
+    def __init__(self, srcdir, builddir, generator=None) -> None:
         """
         Construct CmakeTools object for a package with given
         source directory and build directory
@@ -12,29 +15,44 @@ class CmakeTools:
         Args:
             srcdir ([type]): [description]
             builddir ([type]): [description]
+            generator (str, optional): cmake generator. Defaults to cmake's default.
         """
         from ._impl import _construct
-        _construct(self, srcdir, builddir)
+        _construct(self, srcdir, builddir, generator)
 
     @staticmethod
     def set_default_args(args: List[str]):
         from ._impl import _set_default_args
         _set_default_args(args)
 
-    def is_configured(self):
+    @staticmethod
+    def get_default_args() -> List[str]:
+        """
+        Arguments appended to every cmake configuration
+        """
+        from . import _impl
+        return list(_impl.default_args)
+
+    def is_configured(self, args=None):
         """
         Check if this cmake project has been already configured, i.e.
-        CMakeCache.txt exists.
+        CMakeCache.txt exists. If args is given, also check that the last
+        configuration used the same arguments (default args included) and
+        the same generator.
 
         Returns:
             bool: True if already configured
         """
         from ._impl import _is_configured
-        return _is_configured(self)
+        return _is_configured(self, args)
 
     def configure(self, args=None):
         """
-        Configure the project by calling cmake with given arguments
+        Configure the project by calling cmake with given arguments. A hash
+        of the arguments is stored inside the build directory, and cache
+        entries defined by the previous configuration but no longer passed
+        are removed. If the generator changed, the project is configured
+        from scratch.
 
         Args:
             args (list, optional): Arguments to be passed to cmake. Defaults to list().
@@ -45,15 +63,54 @@ class CmakeTools:
         from ._impl import _configure
         return _configure(self, args)
 
-    def build(self, target='all', jobs=1):
+    def build(self, target='all', jobs=1, env=None, jobserver=None, jobserver_fixed=False):
+        """
+        Build the given target with the given number of jobs, optionally
+        inside a custom environment (e.g. settings of a compiler cache).
+        If a jobserver is given, jobs are taken from its token pool instead,
+        as needed; with jobserver_fixed, exactly jobs tokens are taken
+        before building (e.g. for a build that cannot run more jobs).
+
+        Returns:
+            bool: True on success
+        """
         from ._impl import _build
-        return _build(self, target, jobs)
+        return _build(self, target, jobs, env, jobserver, jobserver_fixed)
+
+    @staticmethod
+    def set_toolchain_seed(enabled: bool):
+        """
+        Enable or disable seeding fresh build trees with the toolchain
+        detection results shared by the workspace
+        """
+        from ._impl import _set_toolchain_seed
+        _set_toolchain_seed(enabled)
+
+    @staticmethod
+    def set_find_package_cache(enabled: bool):
+        """
+        Enable or disable the workspace cache of find_package results
+        """
+        from ._impl import _set_find_package_cache
+        _set_find_package_cache(enabled)
 
     @staticmethod
     def find_package(pkg_name: str) -> bool:
         from ._impl import _find_package
         return _find_package(pkg_name=pkg_name)
 
+    @staticmethod
+    def find_package_config(pkg_name: str) -> Optional[str]:
+        """
+        Look for the config file of a package following the search rules of
+        cmake's find_package in config mode (without running cmake)
+
+        Returns:
+            str: path to the config file, or None if not found
+        """
+        from ._resolver import _find_config
+        return _find_config(pkg_name=pkg_name)
+
     @staticmethod
     def call_cmake(args, cwd='.'):
         from ._impl import _call_cmake
@@ -1,50 +1,235 @@
 from tempfile import TemporaryDirectory
+import hashlib
+import json
 import os 
+import re
+import shutil
+import sysconfig
+import threading
 from functools import partial
 
 from forest.common import proc_utils
-from forest.common.parser import make_regrex_pattern
+from forest.common import cache_utils
+from forest.common.parser import make_regrex_pattern, ninja_regrex_pattern
+import forest.common.forest_dirs as _forest_dirs
+from ._resolver import _find_config
+from . import _toolchain
 
 
 cmake_command = 'cmake'
 default_args = list()
 
-def _construct(self, srcdir, builddir):
+# arguments of the last configuration are stored in the build directory
+configure_args_filename = 'forest_configure_args.json'
+
+# find_package probe results are cached inside the workspace
+find_package_cache_enabled = True
+_find_package_cache = None
+_find_package_cache_lock = threading.Lock()
+
+def _construct(self, srcdir, builddir, generator):
     self.srcdir = srcdir
     self.builddir = builddir
+    self.generator = generator
 
-def _is_configured(self):
+def _is_configured(self, args=None):
 
-    return os.path.exists(os.path.join(self.builddir, 'Makefile'))
+    # note: build files depend on the generator
+    if not os.path.exists(os.path.join(self.builddir, 'CMakeCache.txt')):
+        return False
+
+    if args is None:
+        return True
+
+    stored = cache_utils.load_json(os.path.join(self.builddir, configure_args_filename), default=dict())
+
+    return stored.get('hash') == _args_hash(list(args) + default_args) and \
+        stored.get('generator') == self.generator
 
 def _set_default_args(args):
     global default_args
     default_args = args
 
+def _set_toolchain_seed(enabled):
+    _toolchain.seed_enabled = enabled
+
+def _set_find_package_cache(enabled):
+    global find_package_cache_enabled
+    find_package_cache_enabled = enabled
+
 def _configure(self, args):
 
     if args is None:
         args = list()
 
-    return _call_cmake([self.srcdir] + args + default_args, cwd=self.builddir)
+    args = list(args) + default_args
+    args_fname = os.path.join(self.builddir, configure_args_filename)
+
+    # variables defined by the previous configuration only are removed from
+    # the cache, so that dropping e.g. a mode does not leave them behind
+    defines = _defined_vars(args)
+    stored = cache_utils.load_json(args_fname, default=dict())
+    unset_args = [f'-U{v}' for v in stored.get('defines', list()) if v not in defines]
+
+    # cmake cannot switch the generator of a build tree
+    if stored.get('generator') != self.generator:
+        _remove_cache(self.builddir)
+
+    generator_args = [f'-G{self.generator}'] if self.generator is not None else []
+    args = generator_args + args
+
+    # fresh build trees are seeded with the toolchain detection results
+    # of other projects (not part of the configure arguments)
+    initial_cache = _toolchain._seed(self.builddir, cmake_command, args)
+
+    if initial_cache is not None:
+        ok = _call_cmake([self.srcdir, '-C', initial_cache] + args, cwd=self.builddir, print_on_error=False)
+
+        # a stale seed must not break the build, configure from scratch
+        if not ok:
+            _toolchain._discard(self.builddir, cmake_command, args)
+
+    if initial_cache is None or not ok:
+        if not _call_cmake([self.srcdir] + unset_args + args, cwd=self.builddir):
+            return False
+
+    _toolchain._harvest(self.builddir, cmake_command, args)
+
+    cache_utils.dump_json(args_fname, {'hash': _args_hash(args[len(generator_args):]), 
+                                       'defines': defines,
+                                       'generator': self.generator})
+
+    return True
+
+
+def _args_hash(args):
+    return hashlib.sha1(json.dumps(list(map(str, args))).encode()).hexdigest()
+
+
+def _defined_vars(args):
+    """
+    Names of the cache variables defined by -D<var>[:<type>]=<value> arguments
+    """
+    ret = []
+    for a in map(str, args):
+        m = re.match(r'-D([^:=]+)(:[^=]*)?=', a)
+        if m is not None and m.group(1) not in ret:
+            ret.append(m.group(1))
+    return ret
     
 
-def _build(self, target, jobs):
+def _remove_cache(builddir):
+    """
+    Remove the cache of a build tree (build outputs are kept)
+    """
+    shutil.rmtree(os.path.join(builddir, 'CMakeFiles'), ignore_errors=True)
+    if os.path.exists(os.path.join(builddir, 'CMakeCache.txt')):
+        os.remove(os.path.join(builddir, 'CMakeCache.txt'))
+
+
+def _build(self, target, jobs, env=None, jobserver=None, jobserver_fixed=False):
+
+    # the build tool is invoked by cmake with the right arguments, and
+    # progress is reported in its own format
+    generator = _read_cache_entry(os.path.join(self.builddir, 'CMakeCache.txt'), 'CMAKE_GENERATOR')
+    progress_pattern = ninja_regrex_pattern if generator is not None and 'Ninja' in generator else make_regrex_pattern
+
+    args = ['--build', self.builddir, '--target', target]
 
-    return _call_cmake(['--build', self.builddir, '--target', target, '--', '-j', jobs], print_progress=True)
+    if jobserver is None:
+        return _call_cmake(args + ['--parallel', jobs], 
+                           print_progress=True, 
+                           progress_pattern=progress_pattern,
+                           env=env)
 
+    # a fixed number of tokens, for a build that cannot run more jobs, or
+    # for a build tool that does not take part in the jobserver (e.g. ninja
+    # before 1.13, which would run its default number of jobs)
+    make_program = _read_cache_entry(os.path.join(self.builddir, 'CMakeCache.txt'), 'CMAKE_MAKE_PROGRAM')
+    if jobserver_fixed or not jobserver.supports(generator, make_program):
+        tokens = jobserver.acquire(min(int(jobs), jobserver.jobs))
+        try:
+            return _call_cmake(args + ['--parallel', len(tokens)], 
+                               print_progress=True, 
+                               progress_pattern=progress_pattern,
+                               env=env)
+        finally:
+            jobserver.release(tokens)
 
-def _call_cmake(args, cwd='.', print_on_error=True, print_progress=False):
+    # the token taken here stands for the implicit job of the build tool
+    token = jobserver.acquire()
+
+    try:
+        return _call_cmake(args, 
+                           print_progress=True, 
+                           progress_pattern=progress_pattern,
+                           env=jobserver.build_env(env, generator),
+                           pass_fds=jobserver.pass_fds)
+    finally:
+        jobserver.release(token)
+
+
+def _call_cmake(args, cwd='.', print_on_error=True, print_progress=False, progress_pattern=make_regrex_pattern, env=None, pass_fds=()):
 
     args_str = list(map(str, args))
-    update_regrex_pattern = make_regrex_pattern if print_progress else None
+    update_regrex_pattern = progress_pattern if print_progress else None
     return proc_utils.call_process(args=[cmake_command] + args_str,
                                    cwd=cwd, 
                                    print_on_error=print_on_error,
-                                   update_regrex_pattern=update_regrex_pattern)
+                                   update_regrex_pattern=update_regrex_pattern,
+                                   env=env,
+                                   pass_fds=pass_fds)
 
 
 def _find_package(pkg_name: str):
+
+    # look for a config file natively, cmake is only needed
+    # for packages that are not found this way (e.g. they ship
+    # a find module)
+    if _find_config(pkg_name) is not None:
+        return True
+
+    if not find_package_cache_enabled:
+        return _probe_package(pkg_name)[0]
+
+    prefix_path = os.environ.get('CMAKE_PREFIX_PATH', '')
+
+    with _find_package_cache_lock:
+        cache = _load_find_package_cache()
+        entry = cache.get(pkg_name)
+
+    # a cached result is valid if the prefix path is the same, and
+    # none of the files it depends on has been touched since
+    if entry is not None and entry['prefix_path'] == prefix_path and \
+            all(cache_utils.mtime_ns(f) == m for f, m in entry['mtimes'].items()):
+        return entry['found']
+
+    found, config_dir = _probe_package(pkg_name)
+
+    # a found package depends on its config files, while a missing 
+    # one depends on the directories where it could be installed
+    if config_dir is not None:
+        files = _config_files(pkg_name, config_dir)
+    else:
+        files = _search_roots(prefix_path)
+
+    with _find_package_cache_lock:
+        cache[pkg_name] = {
+            'found': found,
+            'prefix_path': prefix_path,
+            'mtimes': {f: cache_utils.mtime_ns(f) for f in files}
+        }
+        cache_utils.dump_json(_find_package_cache_path(), cache)
+
+    return found
+
+
+def _probe_package(pkg_name: str):
+    """
+    Run find_package on a throwaway cmake project, and return the
+    success flag together with the directory containing the package
+    config file (if any)
+    """
         
     with TemporaryDirectory(prefix="foresttmp-") as tmpdir:
 
@@ -63,5 +248,53 @@ def _find_package(pkg_name: str):
         with open(cmakelists_path, 'w') as f:
             f.write(srcdir)
         
-        return _call_cmake('.', cwd=tmpdir, print_on_error=False)
+        found = _call_cmake('.', cwd=tmpdir, print_on_error=False)
+
+        config_dir = _read_cache_entry(os.path.join(tmpdir, 'CMakeCache.txt'), f'{pkg_name}_DIR')
+        if config_dir is not None and not os.path.isdir(config_dir):
+            config_dir = None
+
+        return found, config_dir
+
+
+def _read_cache_entry(cache_file, name):
+    """
+    Read a variable from a CMakeCache.txt file, or None if it is not there
+    """
+    try:
+        with open(cache_file, 'r') as f:
+            for line in f:
+                if line.startswith(name + ':'):
+                    return line.split('=', 1)[1].strip()
+    except OSError:
+        pass
+    return None
+
+
+def _config_files(pkg_name, config_dir):
+    return [os.path.join(config_dir, f) for f in os.listdir(config_dir) 
+            if f.endswith(('Config.cmake', '-config.cmake'))]
+
+
+def _search_roots(prefix_path):
+    """
+    Directories where a package config could appear once the package is 
+    installed (a new entry changes their mtime)
+    """
+    prefixes = [p for p in prefix_path.split(os.pathsep) if p] + ['/usr/local', '/usr']
+    subdirs = ['', 'cmake', 'lib', 'lib/cmake', 'lib64', 'lib64/cmake', 'share', 'share/cmake']
+    multiarch = sysconfig.get_config_var('MULTIARCH')
+    if multiarch:
+        subdirs += [f'lib/{multiarch}', f'lib/{multiarch}/cmake']
+    return [os.path.join(p, s) for p in prefixes for s in subdirs]
+
+
+def _find_package_cache_path():
+    return os.path.join(_forest_dirs.cachedir, 'find_package.json')
+
 
+def _load_find_package_cache():
+    global _find_package_cache
+    if _find_package_cache is None:
+        _find_package_cache = cache_utils.load_json(_find_package_cache_path(), default=dict())
+    return _find_package_cache
@@ -0,0 +1,144 @@
+import os
+import sysconfig
+import typing
+
+import forest.common.forest_dirs as _forest_dirs
+
+
+# system prefixes searched by cmake on unix platforms (CMAKE_SYSTEM_PREFIX_PATH)
+system_prefixes = ['/usr/local', '/usr', '/', '/usr/X11R6', '/usr/pkg', '/opt']
+
+
+def _find_config(pkg_name: str) -> typing.Optional[str]:
+    """
+    Look for the config file of a package following the config-mode search
+    procedure of cmake's find_package, without running cmake.
+
+    Returns:
+        str: path to the package config file, or None if not found
+    """
+
+    names = (f'{pkg_name}Config.cmake', f'{pkg_name.lower()}-config.cmake')
+
+    # <PackageName>_DIR points to the directory containing the config file
+    config_dir = os.environ.get(f'{pkg_name}_DIR')
+    if config_dir:
+        config = _config_in_dir(config_dir, names)
+        if config is not None:
+            return config
+
+    for prefix in _prefixes(pkg_name):
+        for d in _candidate_dirs(prefix, pkg_name):
+            config = _config_in_dir(d, names)
+            if config is not None:
+                return config
+
+    return None
+
+
+def _config_in_dir(d, names):
+    for name in names:
+        path = os.path.join(d, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _prefixes(pkg_name: str) -> typing.List[str]:
+    """
+    Installation prefixes in the order cmake searches them
+    """
+
+    prefixes = []
+
+    # <PackageName>_ROOT and <PACKAGENAME>_ROOT
+    for var in (f'{pkg_name}_ROOT', f'{pkg_name.upper()}_ROOT'):
+        prefixes += _split_path(os.environ.get(var, ''))
+
+    # environment prefix path, and the forest install dir
+    prefixes += _split_path(os.environ.get('CMAKE_PREFIX_PATH', ''))
+    prefixes.append(_forest_dirs.installdir)
+
+    # PATH entries, where a trailing bin or sbin is removed
+    for p in _split_path(os.environ.get('PATH', '')):
+        p = p.rstrip('/')
+        if os.path.basename(p) in ('bin', 'sbin'):
+            p = os.path.dirname(p)
+        prefixes.append(p)
+
+    prefixes += system_prefixes
+
+    # remove duplicates preserving order
+    ret = []
+    for p in prefixes:
+        if p not in ret:
+            ret.append(p)
+
+    return ret
+
+
+def _split_path(value):
+    return [p for p in value.split(os.pathsep) if p]
+
+
+def _lib_dirs() -> typing.List[str]:
+    """
+    The (lib/<arch>|lib*|share) part of cmake's search paths
+    """
+    libs = []
+    multiarch = sysconfig.get_config_var('MULTIARCH')
+    if multiarch:
+        libs.append(os.path.join('lib', multiarch))
+    libs += ['lib', 'lib64', 'lib32', 'libx32', 'share']
+    return libs
+
+
+def _name_dirs(parent, pkg_name) -> typing.List[str]:
+    """
+    Sub-directories of parent matching <name>* (case insensitive)
+    """
+    try:
+        entries = os.listdir(parent)
+    except OSError:
+        return []
+
+    lower_name = pkg_name.lower()
+    return [os.path.join(parent, e) for e in sorted(entries)
+            if e.lower().startswith(lower_name) and os.path.isdir(os.path.join(parent, e))]
+
+
+def _candidate_dirs(prefix, pkg_name):
+    """
+    Generate the directories where a config file is searched for
+    a given prefix, following the order documented by cmake
+    """
+
+    cmake_dirs = ('cmake', 'CMake')
+
+    yield prefix
+
+    for c in cmake_dirs:
+        yield os.path.join(prefix, c)
+
+    name_dirs = _name_dirs(prefix, pkg_name)
+
+    for d in name_dirs:
+        yield d
+        for c in cmake_dirs:
+            yield os.path.join(d, c)
+            yield from _name_dirs(os.path.join(d, c), pkg_name)
+
+    for lib in _lib_dirs():
+        yield from _name_dirs(os.path.join(prefix, lib, 'cmake'), pkg_name)
+        for d in _name_dirs(os.path.join(prefix, lib), pkg_name):
+            yield d
+            for c in cmake_dirs:
+                yield os.path.join(d, c)
+
+    for nd in name_dirs:
+        for lib in _lib_dirs():
+            yield from _name_dirs(os.path.join(nd, lib, 'cmake'), pkg_name)
+            for d in _name_dirs(os.path.join(nd, lib), pkg_name):
+                yield d
+                for c in cmake_dirs:
+                    yield os.path.join(d, c)
@@ -0,0 +1,181 @@
+"""
+Toolchain detection results (compiler identification, ABI info, binutils,
+and stable platform probes) shared by all cmake projects of a workspace.
+
+After a project is configured, these are harvested from its build tree
+into a seed, keyed on a fingerprint of the toolchain (cmake and compiler
+binaries, their environment variables, and CMAKE_* toolchain arguments).
+Fresh build trees with the same fingerprint are then configured with an
+initial cache (-C) generated from the seed, together with the platform
+files of the seed, so that cmake skips detection altogether.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+
+from forest.common import cache_utils
+import forest.common.forest_dirs as _forest_dirs
+
+
+seed_enabled = True
+
+_seed_lock = threading.Lock()
+
+# cache entries with toolchain detection results
+_entry_regex = re.compile(
+    r'^(?P<name>CMAKE_(ADDR2LINE|AR|DLLTOOL|LINKER|MAKE_PROGRAM|MT|NM|OBJCOPY|OBJDUMP|RANLIB|READELF|STRIP|TAPI)'
+    r'|CMAKE_[A-Za-z]+_COMPILER(_AR|_RANLIB)?'
+    r'|CMAKE_HAVE_[A-Z_]+)'
+    r':(?P<type>[A-Z]+)=(?P<value>.*)$')
+
+# platform files written by cmake into CMakeFiles/<version>
+_platform_regex = re.compile(r'^CMake(System|[A-Za-z]+Compiler)\.cmake$')
+
+# cmake arguments that change detection results (generator included)
+_toolchain_arg_regex = re.compile(
+    r'^-G|^-D(CMAKE_TOOLCHAIN_FILE|CMAKE_SYSROOT|CMAKE_SYSTEM_[A-Z_]+|CMAKE_OSX_[A-Z_]+'
+    r'|CMAKE_[A-Za-z]+_COMPILER(_TARGET|_EXTERNAL_TOOLCHAIN)?|CMAKE_[A-Za-z]+_FLAGS(_[A-Z]+)?'
+    r'|CMAKE_[A-Z_]*LINKER[A-Z_]*|CMAKE_GENERATOR[A-Z_]*)(:[^=]*)?='
+)
+
+# environment variables that change detection results
+_toolchain_env = ['CC', 'CXX', 'CUDACXX', 'FC', 'ASM', 'CFLAGS', 'CXXFLAGS', 'CUDAFLAGS',
+                  'FFLAGS', 'CPPFLAGS', 'LDFLAGS', 'SDKROOT', 'CMAKE_TOOLCHAIN_FILE']
+
+
+def _fingerprint(cmake_command, args):
+
+    def binary(exe):
+        path = shutil.which(exe)
+        if path is None:
+            return None
+        path = os.path.realpath(path)
+        st = os.stat(path)
+        return [path, st.st_size, st.st_mtime_ns]
+
+    inputs = {
+        'cmake': binary(cmake_command),
+        'cc': binary(os.environ.get('CC', 'cc')),
+        'cxx': binary(os.environ.get('CXX', 'c++')),
+        'env': {k: os.environ.get(k) for k in _toolchain_env},
+        'args': [a for a in map(str, args) if _toolchain_arg_regex.match(a)]
+    }
+
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def _seed_dir(fingerprint):
+    return os.path.join(_forest_dirs.cachedir, 'cmake_toolchain', fingerprint)
+
+
+def _seed(builddir, cmake_command, args):
+    """
+    Prepare a fresh build tree with the seed matching its toolchain
+
+    Returns:
+        str: path to the initial cache file, or None if there is no seed
+    """
+
+    if not seed_enabled or os.path.exists(os.path.join(builddir, 'CMakeCache.txt')):
+        return None
+
+    seed_dir = _seed_dir(_fingerprint(cmake_command, args))
+    initial_cache = os.path.join(seed_dir, 'initial_cache.cmake')
+    seed = cache_utils.load_json(os.path.join(seed_dir, 'seed.json'))
+
+    if seed is None or not os.path.isfile(initial_cache):
+        return None
+
+    try:
+        for version, files in seed['platform'].items():
+            platform_dir = os.path.join(builddir, 'CMakeFiles', version)
+            os.makedirs(platform_dir, exist_ok=True)
+            for fname, content in files.items():
+                with open(os.path.join(platform_dir, fname), 'w') as f:
+                    f.write(content)
+    except (OSError, KeyError, AttributeError):
+        return None
+
+    return initial_cache
+
+
+def _harvest(builddir, cmake_command, args):
+    """
+    Add the detection results of a configured build tree to the seed
+    matching its toolchain
+    """
+
+    if not seed_enabled:
+        return
+
+    entries = dict()
+
+    try:
+        with open(os.path.join(builddir, 'CMakeCache.txt'), 'r') as f:
+            for line in f:
+                m = _entry_regex.match(line.rstrip('\n'))
+                if m is not None:
+                    entries[m.group('name')] = [m.group('type'), m.group('value')]
+    except OSError:
+        return
+
+    platform = dict()
+
+    cmakefiles = os.path.join(builddir, 'CMakeFiles')
+    try:
+        for version in os.listdir(cmakefiles):
+            if not os.path.isfile(os.path.join(cmakefiles, version, 'CMakeSystem.cmake')):
+                continue
+            platform[version] = dict()
+            for fname in os.listdir(os.path.join(cmakefiles, version)):
+                if _platform_regex.match(fname):
+                    with open(os.path.join(cmakefiles, version, fname), 'r') as f:
+                        platform[version][fname] = f.read()
+    except OSError:
+        return
+
+    if not platform:
+        return
+
+    seed_dir = _seed_dir(_fingerprint(cmake_command, args))
+    seed_path = os.path.join(seed_dir, 'seed.json')
+
+    with _seed_lock:
+
+        # results for other languages may have been harvested before
+        seed = cache_utils.load_json(seed_path, default=dict())
+        new_seed = {
+            'entries': dict(seed.get('entries', dict()), **entries),
+            'platform': {v: dict(seed.get('platform', dict()).get(v, dict()), **files)
+                         for v, files in platform.items()}
+        }
+
+        if new_seed == seed:
+            return
+
+        lines = [f'set({name} "{_escape(value)}" CACHE {type} "")' for name, (type, value) in sorted(new_seed['entries'].items())]
+
+        # platform files are only loaded by a build tree that was configured before
+        lines.append('set(CMAKE_PLATFORM_INFO_INITIALIZED 1 CACHE INTERNAL "")')
+
+        cache_utils.dump_json(seed_path, new_seed)
+        cache_utils.dump_text(os.path.join(seed_dir, 'initial_cache.cmake'), '\n'.join(lines) + '\n')
+
+
+def _discard(builddir, cmake_command, args):
+    """
+    Remove the seed of a build tree, and the files it left there
+    """
+
+    shutil.rmtree(_seed_dir(_fingerprint(cmake_command, args)), ignore_errors=True)
+    shutil.rmtree(os.path.join(builddir, 'CMakeFiles'), ignore_errors=True)
+    if os.path.exists(os.path.join(builddir, 'CMakeCache.txt')):
+        os.remove(os.path.join(builddir, 'CMakeCache.txt'))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('$', '\\$')
@@ -0,0 +1,207 @@
+import abc
+import hashlib
+import os
+import shutil
+import tempfile
+import typing
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+class IntegrityError(Exception):
+    """
+    A downloaded archive does not match its digest
+    """
+    pass
+
+
+class CacheBackend(abc.ABC):
+
+    """
+    Abstract interface to a remote store of artifact archives, shared among
+    machines. Every archive is stored together with its sha256 digest (as
+    <name>.sha256), which is verified on download.
+
+    Concrete instances of this class are created via the from_url() factory method.
+    """
+
+    @abc.abstractmethod
+    def get(self, name: str, path: str) -> bool:
+        """
+        Download the archive with the given name to path, if it exists
+        and its digest matches
+
+        Raises:
+            IntegrityError: the archive does not match its digest
+
+        Returns:
+            bool: True on success, False if the archive does not exist
+        """
+
+    @abc.abstractmethod
+    def put(self, name: str, path: str) -> bool:
+        """
+        Upload the archive at path with the given name
+
+        Returns:
+            bool: True on success
+        """
+
+    @classmethod
+    def from_url(cls, url: str) -> 'CacheBackend':
+        """
+        Factory method returning the backend for the given url
+
+        Args:
+            url (str): http(s):// url, file:// url, or directory path
+
+        Raises:
+            ValueError: the url scheme is not supported
+        """
+
+        scheme = urllib.parse.urlparse(url).scheme
+
+        if scheme in ('http', 'https'):
+            return HttpBackend(url)
+        elif scheme == 'file':
+            return DirectoryBackend(urllib.parse.urlparse(url).path)
+        elif scheme == '':
+            return DirectoryBackend(os.path.abspath(os.path.expanduser(url)))
+        else:
+            raise ValueError(f'unsupported artifact cache url "{url}"')
+
+
+class DirectoryBackend(CacheBackend):
+
+    """
+    Archives inside a (shared) directory, e.g. on a network file system
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def __str__(self) -> str:
+        return self.root
+
+    def get(self, name: str, path: str) -> bool:
+
+        src = os.path.join(self.root, name)
+
+        try:
+            with open(src + '.sha256', 'r') as f:
+                digest = f.read().strip()
+            return _download(lambda dst: shutil.copyfile(src, dst), path, digest)
+        except OSError:
+            return False
+
+    def put(self, name: str, path: str) -> bool:
+
+        dst = os.path.join(self.root, name)
+
+        # archive first, so that readers never see a digest without it
+        try:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            _atomic_write(dst, lambda tmp: shutil.copyfile(path, tmp))
+            _atomic_write(dst + '.sha256', lambda tmp: _write_text(tmp, sha256(path)))
+            return True
+        except OSError:
+            return False
+
+
+class HttpBackend(CacheBackend):
+
+    """
+    Archives served by plain HTTP GET, and uploaded by HTTP PUT (e.g. a
+    static file server with uploads enabled)
+    """
+
+    # seconds
+    timeout = 60
+
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip('/')
+
+    def __str__(self) -> str:
+        return self.url
+
+    def get(self, name: str, path: str) -> bool:
+
+        url = f'{self.url}/{name}'
+
+        def fetch(dst):
+            with urllib.request.urlopen(url, timeout=HttpBackend.timeout) as r, open(dst, 'wb') as f:
+                shutil.copyfileobj(r, f)
+
+        try:
+            with urllib.request.urlopen(url + '.sha256', timeout=HttpBackend.timeout) as r:
+                digest = r.read().decode().strip()
+            return _download(fetch, path, digest)
+        except (OSError, urllib.error.URLError, ValueError):
+            return False
+
+    def put(self, name: str, path: str) -> bool:
+
+        url = f'{self.url}/{name}'
+
+        try:
+            with open(path, 'rb') as f:
+                self._put(url, f, os.path.getsize(path))
+            self._put(url + '.sha256', sha256(path).encode())
+            return True
+        except (OSError, urllib.error.URLError, ValueError):
+            return False
+
+    def _put(self, url, data, size=None):
+        headers = {'Content-Type': 'application/octet-stream'}
+        if size is not None:
+            headers['Content-Length'] = str(size)
+        request = urllib.request.Request(url, data=data, method='PUT', headers=headers)
+        with urllib.request.urlopen(request, timeout=HttpBackend.timeout):
+            pass
+
+
+def sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _download(fetch_fn: typing.Callable[[str], None], path: str, digest: str) -> bool:
+    """
+    Fetch a file to path through a temporary file, which is kept only if
+    its digest matches
+    """
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    os.close(fd)
+
+    try:
+        fetch_fn(tmp_path)
+        if sha256(tmp_path) != digest:
+            raise IntegrityError('sha256 digest mismatch')
+        os.replace(tmp_path, path)
+        return True
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _atomic_write(path: str, write_fn: typing.Callable[[str], None]):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    os.close(fd)
+    try:
+        write_fn(tmp_path)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write_text(path: str, text: str):
+    with open(path, 'w') as f:
+        f.write(text)
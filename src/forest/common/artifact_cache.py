@@ -0,0 +1,452 @@
+import concurrent.futures
+import functools
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import typing
+
+from forest.common import offline as _offline
+from forest.common import proc_utils
+from forest.common.artifact_backends import CacheBackend, IntegrityError
+from forest.git_tools import GitTools
+
+# stands for the install prefix inside relocated files
+_prefix_placeholder = b'@FOREST_INSTALLDIR@'
+
+# metadata member of each archive
+_metadata_name = 'forest_artifact.json'
+
+
+class ArtifactCache:
+
+    """
+    Content-addressed cache of built packages, shared among workspaces.
+    Each package is keyed on its source commit, build configuration
+    (resolved cmake args, build type), compiler identity, and the keys
+    of its dependencies; after a successful build, its installed files
+    (as listed by install_manifest.txt) are stored as a compressed archive,
+    which is unpacked instead of building the package again. Text files
+    and symbolic links referring to the install prefix are relocated on
+    unpack; packages with binary files referring to it (e.g. an RPATH)
+    are not stored, as they cannot be relocated.
+
+    Optionally, archives missing from the local cache are downloaded from
+    a remote backend (shared directory, or HTTP server), and new archives
+    are uploaded to it in the background (unless read-only).
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    # root folder of the cache (None if disabled), set by main.py
+    root = None
+
+    # url of the remote backend (None if disabled), set by main.py
+    remote = None
+
+    # if True, archives are never uploaded to the remote backend
+    read_only = False
+
+    # number of concurrent uploads
+    upload_jobs = 4
+
+    # bump this when the archive format changes
+    version = 2
+
+    def __init__(self, root: str, remote: str = None) -> None:
+        self.root = root
+        self.remote = CacheBackend.from_url(remote) if remote is not None else None
+        self.lock = threading.Lock()
+        self.uploader = None
+        self.uploads = []
+
+        # keys of the packages considered in this run (None if not cacheable)
+        self.keys = dict()
+
+        # hit/miss statistics of this run
+        self.hits = []
+        self.misses = []
+        self.stored = []
+        self.downloaded = []
+        self.uploaded = []
+        self.upload_failed = []
+
+        self._compiler = None
+
+    @classmethod
+    def instance(cls) -> typing.Optional['ArtifactCache']:
+        """
+        The artifact cache, or None if it is disabled
+        """
+        with cls._instance_lock:
+            if cls.root is None:
+                return None
+            if cls._instance is None:
+                cls._instance = cls(cls.root, cls.remote)
+        return cls._instance
+
+    def key(self, pkg, srcdir: str, builddir: str, installdir: str, buildtype: str, jobs: int) -> typing.Optional[str]:
+        """
+        Compute the cache key of a package whose dependencies have already
+        been considered; returns None if the package cannot be cached (e.g.
+        not a clean git checkout, or a dependency that cannot be cached)
+        """
+
+        key = self._key(pkg, srcdir, builddir, installdir, buildtype, jobs)
+
+        with self.lock:
+            self.keys[pkg.name] = key
+
+        return key
+
+    def defer_key(self, pkg, srcdir: str, builddir: str, installdir: str, buildtype: str, jobs: int):
+        """
+        Like key, for packages that are skipped: the key is only computed
+        (spawning git and the compilers) if a dependent package needs it
+        """
+        with self.lock:
+            self.keys[pkg.name] = functools.partial(self.key, pkg, srcdir, builddir, installdir, buildtype, jobs)
+
+    def _key(self, pkg, srcdir, builddir, installdir, buildtype, jobs):
+
+        if pkg.builder.manifests(srcdir, builddir) is None:
+            return None
+
+        git = GitTools(srcdir)
+        head = git.head()
+        if head is None or git.is_dirty() is not False:
+            return None
+
+        # dependencies built by forest must be cacheable as well
+        depends = dict()
+        for dep in pkg.depends:
+            with self.lock:
+                if dep not in self.keys:
+                    continue
+                dep_key = self.keys[dep]
+            if callable(dep_key):
+                dep_key = dep_key()
+            if dep_key is None:
+                return None
+            depends[dep] = dep_key
+
+        # workspace paths do not take part in the key
+        build = json.dumps(pkg.builder.signature(srcdir, builddir, installdir, jobs), sort_keys=True)
+        build = build.replace(installdir, '@INSTALLDIR@').replace(srcdir, '@SRCDIR@').replace(builddir, '@BUILDDIR@')
+
+        inputs = {
+            'version': ArtifactCache.version,
+            'package': pkg.name,
+            'source': head,
+            'build': build,
+            'buildtype': buildtype,
+            'compiler': self._compiler_identity(),
+            'system_depends': pkg.system_depends,
+            'pip_depends': pkg.pip_depends,
+            'depends': depends
+        }
+
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+    def _compiler_identity(self) -> dict:
+        """
+        Path and version of the C and C++ compilers (computed once per run)
+        """
+
+        with self.lock:
+            if self._compiler is not None:
+                return self._compiler
+
+            ret = dict()
+
+            for var, dfl in (('CC', 'cc'), ('CXX', 'c++')):
+                exe = shutil.which(os.environ.get(var, dfl))
+                version = None
+                if exe is not None:
+                    exe = os.path.realpath(exe)
+                    version = proc_utils.get_output([exe, '--version'], print_on_error=False)
+                ret[var] = {
+                    'path': exe,
+                    'version': version.splitlines()[0] if version else None
+                }
+
+            self._compiler = ret
+
+            return ret
+
+    @staticmethod
+    def name(key: str) -> str:
+        """
+        Name of the archive with the given key, relative to the cache root
+        """
+        return f'{key[:2]}/{key}.tar.gz'
+
+    def path(self, key: str) -> str:
+        """
+        Path of the archive with the given key
+        """
+        return os.path.join(self.root, ArtifactCache.name(key))
+
+    def restore(self, pkg, key: str, srcdir: str, builddir: str, installdir: str) -> bool:
+        """
+        Unpack the archive with the given key into installdir, if it exists
+
+        Returns:
+            bool: True on cache hit
+        """
+
+        archive = self.path(key)
+
+        if not os.path.isfile(archive) and not self._download(pkg, key):
+            with self.lock:
+                self.misses.append(pkg.name)
+            return False
+
+        manifests = pkg.builder.manifests(srcdir, builddir)
+
+        try:
+            files, metadata = _unpack(archive, installdir)
+            if len(metadata['manifests']) != len(manifests):
+                raise ValueError('install manifests do not match the recipe')
+        except (OSError, tarfile.TarError, ValueError, KeyError) as e:
+            pkg.builder.pprint(f'unable to unpack cached artifact {archive} ({e})')
+            with self.lock:
+                self.misses.append(pkg.name)
+            return False
+
+        # install manifests, as written by a build (one for each cmake project)
+        for manifest, names in zip(manifests, metadata['manifests']):
+            os.makedirs(os.path.dirname(manifest), exist_ok=True)
+            with open(manifest, 'w') as f:
+                f.write('\n'.join(os.path.join(installdir, n) for n in names))
+
+        install_cache_dir = os.path.join(installdir, '.install_cache')
+        os.makedirs(install_cache_dir, exist_ok=True)
+        with open(os.path.join(install_cache_dir, pkg.name), 'w') as f:
+            f.write('\n'.join(files))
+
+        with self.lock:
+            self.hits.append(pkg.name)
+
+        return True
+
+    def store(self, pkg, key: str, srcdir: str, builddir: str, installdir: str) -> bool:
+        """
+        Store the files installed by a package under the given key
+
+        Returns:
+            bool: success flag
+        """
+
+        files = []
+        manifests = []
+
+        for manifest in pkg.builder.manifests(srcdir, builddir):
+            try:
+                with open(manifest, 'r') as f:
+                    manifests.append([l.strip() for l in f if l.strip()])
+            except OSError:
+                return False
+            files.extend(manifests[-1])
+
+        # environment hooks are not listed in the manifest
+        env_hook = os.path.join(installdir, 'share', 'forest_env_hook', f'{pkg.name}.bash')
+        if os.path.isfile(env_hook):
+            files.append(env_hook)
+
+        # only files inside the install prefix can be relocated
+        prefix = os.path.join(installdir, '')
+        if not all(f.startswith(prefix) for f in files):
+            return False
+
+        archive = self.path(key)
+        metadata = {
+            'package': pkg.name, 
+            'key': key,
+            'manifests': [[os.path.relpath(f, installdir) for f in m] for m in manifests]
+        }
+
+        tmp_path = None
+
+        try:
+            os.makedirs(os.path.dirname(archive), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(archive), prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                _pack(f, sorted(set(files)), installdir, metadata)
+            os.replace(tmp_path, archive)
+        except (OSError, ValueError) as e:
+            pkg.builder.pprint(f'unable to store artifact ({e})')
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+        with self.lock:
+            self.stored.append(pkg.name)
+
+        if self.remote is not None and not ArtifactCache.read_only and not _offline.enabled:
+            self._upload(pkg, key)
+
+        return True
+
+    def _download(self, pkg, key: str) -> bool:
+        """
+        Download an archive from the remote backend into the local cache
+        """
+
+        if self.remote is None or _offline.enabled:
+            return False
+
+        try:
+            ok = self.remote.get(ArtifactCache.name(key), self.path(key))
+        except IntegrityError as e:
+            pkg.builder.pprint(f'ignoring corrupted artifact from {self.remote} ({e})')
+            return False
+
+        if ok:
+            with self.lock:
+                self.downloaded.append(pkg.name)
+
+        return ok
+
+    def _upload(self, pkg, key: str):
+        """
+        Upload an archive to the remote backend in the background
+        """
+
+        def upload_fn():
+            if self.remote.put(ArtifactCache.name(key), self.path(key)):
+                uploaded = self.uploaded
+            else:
+                uploaded = self.upload_failed
+                pkg.builder.pprint(f'unable to upload artifact to {self.remote}')
+            with self.lock:
+                uploaded.append(pkg.name)
+
+        with self.lock:
+            if self.uploader is None:
+                self.uploader = concurrent.futures.ThreadPoolExecutor(max_workers=ArtifactCache.upload_jobs)
+            self.uploads.append(self.uploader.submit(upload_fn))
+
+    def wait(self):
+        """
+        Wait for pending uploads to complete
+        """
+        with self.lock:
+            uploads = list(self.uploads)
+        concurrent.futures.wait(uploads)
+
+    def summary(self) -> str:
+        ret = f'[forest] artifact cache: {len(self.hits)} hit{"s" if len(self.hits) != 1 else ""}, ' \
+              f'{len(self.misses)} miss{"es" if len(self.misses) != 1 else ""}, ' \
+              f'{len(self.stored)} stored ({self.root})'
+        if self.remote is not None:
+            ret += f'; remote: {len(self.downloaded)} downloaded, {len(self.uploaded)} uploaded'
+            if self.upload_failed:
+                ret += f', {len(self.upload_failed)} failed'
+            ret += f' ({self.remote}{", read-only" if ArtifactCache.read_only else ""})'
+        return ret
+
+
+def _pack(fileobj, files: typing.List[str], installdir: str, metadata: dict):
+    """
+    Write a tar.gz archive of the given files (absolute paths inside
+    installdir), replacing installdir in text files with a placeholder,
+    and making symbolic links to files inside installdir relative
+
+    Raises:
+        ValueError: a binary file refers to installdir
+    """
+
+    prefix = installdir.encode()
+    relocated = []
+
+    with tarfile.open(fileobj=fileobj, mode='w:gz') as tar:
+
+        for path in files:
+
+            name = os.path.relpath(path, installdir)
+
+            if os.path.islink(path):
+                info = tar.gettarinfo(path, arcname=name)
+                target = os.path.normpath(info.linkname)
+                if os.path.isabs(target) and (target + os.sep).startswith(os.path.join(installdir, '')):
+                    info.linkname = os.path.relpath(target, os.path.dirname(path))
+                tar.addfile(info)
+                continue
+
+            if not os.path.isfile(path):
+                if os.path.lexists(path):
+                    tar.add(path, arcname=name, recursive=False)
+                continue
+
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            if prefix in data:
+                if b'\0' in data:
+                    raise ValueError(f'{name} refers to the install prefix, and cannot be relocated')
+                data = data.replace(prefix, _prefix_placeholder)
+                relocated.append(name)
+
+            info = tar.gettarinfo(path, arcname=name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+        metadata = dict(metadata, version=ArtifactCache.version, relocated=relocated)
+        data = json.dumps(metadata, indent=1).encode()
+        info = tarfile.TarInfo(_metadata_name)
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+
+
+def _unpack(archive: str, installdir: str) -> typing.Tuple[typing.List[str], dict]:
+    """
+    Extract an archive written by _pack into installdir
+
+    Returns:
+        Tuple[List[str], dict]: the installed files, and the archive metadata
+    """
+
+    files = []
+
+    with tarfile.open(archive, mode='r:gz') as tar:
+
+        metadata = json.load(tar.extractfile(_metadata_name))
+        relocated = set(metadata['relocated'])
+
+        for info in tar.getmembers():
+
+            if info.name == _metadata_name:
+                continue
+
+            name = os.path.normpath(info.name)
+            if os.path.isabs(name) or name.startswith('..'):
+                raise ValueError(f'invalid member {info.name}')
+
+            dst = os.path.join(installdir, name)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+
+            if os.path.lexists(dst) and not os.path.isdir(dst):
+                os.remove(dst)
+
+            if info.issym():
+                os.symlink(info.linkname, dst)
+            elif info.isfile():
+                data = tar.extractfile(info).read()
+                if name in relocated:
+                    data = data.replace(_prefix_placeholder, installdir.encode())
+                with open(dst, 'wb') as f:
+                    f.write(data)
+                os.chmod(dst, info.mode)
+                os.utime(dst, (info.mtime, info.mtime))
+            else:
+                continue
+
+            files.append(dst)
+
+    return files, metadata
@@ -1,15 +1,93 @@
 import os 
+import psutil
 import yaml
+from typing import List, Optional, Tuple
 
 from tempfile import TemporaryDirectory
 
 from forest.cmake_tools import CmakeTools
 from forest.common import eval_handler
+from forest.common.compiler_cache import CompilerCache
+from forest.common.jobserver import JobServer
+from forest.common.memory_governor import parse_size
 from forest.common import print_utils
 from forest.common.fetch_handler import CustomFetcher
 from forest.common.print_utils import ProgressReporter
 from forest.common import proc_utils
 
+class BuildResources:
+
+    """
+    Resource hints of a build (recipe build.resources): memory used by
+    each job, maximum number of jobs, expected duration (as a weight
+    relative to other packages, 1 by default), and whether it must be the
+    only package building. They set the number of jobs of the build, and
+    the order in which packages are scheduled.
+    """
+
+    def __init__(self, memory_per_job: int = None, max_jobs: int = None, weight: float = 1.0, exclusive=False) -> None:
+        self.memory_per_job = memory_per_job
+        self.max_jobs = max_jobs
+        self.weight = weight
+        self.exclusive = exclusive
+
+    @classmethod
+    def from_yaml(cls, pkgname, data):
+
+        if not isinstance(data, dict):
+            raise ValueError(f'build resources of "{pkgname}" must be a dictionary')
+
+        unknown = set(data.keys()) - {'memory_per_job', 'max_jobs', 'weight', 'exclusive'}
+        if unknown:
+            raise ValueError(f'unknown build resources {", ".join(sorted(unknown))} for "{pkgname}"')
+
+        ret = BuildResources()
+
+        try:
+            if data.get('memory_per_job') is not None:
+                ret.memory_per_job = parse_size(data['memory_per_job'], total=psutil.virtual_memory().total)
+            if data.get('max_jobs') is not None:
+                ret.max_jobs = max(1, int(data['max_jobs']))
+            ret.weight = max(0.0, float(data.get('weight', 1.0)))
+            ret.exclusive = bool(data.get('exclusive', False))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'invalid build resources for "{pkgname}" ({e})')
+
+        return ret
+
+    def limits_jobs(self) -> bool:
+        """
+        True if the number of jobs is bounded by these hints
+        """
+        return self.max_jobs is not None or self.memory_per_job is not None
+
+    def jobs(self, jobs: int) -> int:
+        """
+        Number of jobs of a build given --jobs, bounded by max_jobs, and
+        by the jobs that fit into the memory available right now
+        """
+
+        ret = max(1, int(jobs))
+
+        if self.max_jobs is not None:
+            ret = min(ret, self.max_jobs)
+
+        if self.memory_per_job is not None:
+            ret = min(ret, max(1, psutil.virtual_memory().available // self.memory_per_job))
+
+        return ret
+
+    def memory(self, jobs: int) -> int:
+        """
+        Expected memory footprint of a build given --jobs (0 if unknown)
+        """
+
+        if self.memory_per_job is None:
+            return 0
+
+        return self.memory_per_job * min(max(1, int(jobs)), self.max_jobs or int(jobs))
+
+
 class BuildHandler:
 
     # entries in this cache have already been built
@@ -30,6 +108,9 @@ class BuildHandler:
         # env hook to install
         self.env_hooks = []
 
+        # resource hints
+        self.resources = BuildResources()
+
     
     def pre_build(self, builddir, srcdir, installdir):
         eh = eval_handler.EvalHandler.instance()
@@ -75,6 +156,32 @@ class BuildHandler:
 
         self.pprint('installed environment hook, re-source your setup.bash')
 
+    def signature(self, srcdir: str, builddir: str, installdir: str, jobs: int) -> dict:
+        """
+        Describe the build configuration of this package, so that a new 
+        build can be skipped if neither this nor the sources changed.
+        To be extended by derived classes.
+        """
+        return {
+            'type': type(self).__name__,
+            'pre_build': self.pre_build_cmd,
+            'post_build': self.post_build_cmd,
+            'env_hooks': self.env_hooks
+        }
+
+    def outputs(self, builddir: str, installdir: str) -> List[str]:
+        """
+        Paths that must exist for a previous build to be reused
+        """
+        return []
+
+    def manifests(self, srcdir: str, builddir: str) -> Optional[List[str]]:
+        """
+        Install manifests listing the files installed by a build, or None
+        if they are not known (and the package cannot be cached)
+        """
+        return None
+
     def build(self, 
               srcdir: str, 
               builddir: str, 
@@ -133,6 +240,9 @@ class BuildHandler:
         # env hooks
         builder.env_hooks = data.get('env_hooks', list())
 
+        # resource hints
+        builder.resources = BuildResources.from_yaml(pkgname, data.get('resources', dict()))
+
         return builder
 
 
@@ -160,7 +270,7 @@ class CustomBuilder(BuildHandler):
         with TemporaryDirectory(prefix="foresttmp-") as tmpdir:
             ncmd = len(self.commands)
             for i, cmd in enumerate(self.commands):
-                cmd_p = eh.process_string(cmd, {'srcdir': srcdir, 'installdir': installdir, 'jobs': jobs})
+                cmd_p = eh.process_string(cmd, {'srcdir': srcdir, 'installdir': installdir, 'jobs': self.resources.jobs(jobs)})
                 self.pprint(f'[{i+1}/{ncmd}] {cmd_p}')
                 if not proc_utils.call_process([cmd_p], cwd=tmpdir, shell=True, print_on_error=True):
                     self.pprint(f'{cmd_p} failed')
@@ -174,6 +284,14 @@ class CustomBuilder(BuildHandler):
         
         return True 
 
+    def signature(self, srcdir: str, builddir: str, installdir: str, jobs: int) -> dict:
+        ret = super().signature(srcdir, builddir, installdir, jobs)
+        ret['commands'] = self.commands
+        return ret
+
+    def outputs(self, builddir: str, installdir: str) -> List[str]:
+        return [installdir]
+
     @classmethod
     def from_yaml(cls, pkgname, data):
         ret = CustomBuilder(pkgname=pkgname)
@@ -182,12 +300,21 @@ class CustomBuilder(BuildHandler):
 
 class CmakeBuilder(BuildHandler):
 
-    def __init__(self, pkgname, cmake_args=None, cmakelists='.', target='install') -> None:
+    # generator for recipes that do not specify one (None means
+    # cmake's default), set by main.py
+    default_generator = None
+
+    def __init__(self, pkgname, cmake_args=None, cmakelists='.', target='install', generator=None) -> None:
 
         super().__init__(pkgname=pkgname)
         self.cmake_args = cmake_args if cmake_args is not None else list()
         self.cmakelists_folder = cmakelists
         self.target = target
+        self.generator = generator
+
+        # cmake args resolved by _user_cmake_args (once per run, as they
+        # may call the shell)
+        self.resolved_args = dict()
     
     
     @classmethod
@@ -212,7 +339,8 @@ class CmakeBuilder(BuildHandler):
         return CmakeBuilder(pkgname=pkgname, 
                             cmake_args=args,
                             cmakelists=data.get('cmakelists', '.'),
-                            target=data.get('target', 'install'))
+                            target=data.get('target', 'install'),
+                            generator=data.get('generator'))
     
 
     def build(self, 
@@ -227,21 +355,8 @@ class CmakeBuilder(BuildHandler):
         if self.pkgname in BuildHandler.build_cache:
             self.pprint('already built, skipping')
             return True
-        
-        srcdir_list = []
-        builddir_list = []
-        
-        if isinstance(self.cmakelists_folder, str):
-            srcdir_list = [os.path.join(srcdir, self.cmakelists_folder)]
-            builddir_list = [builddir]
-        else:
-            for item in self.cmakelists_folder:
-                sub_name, sub_folder = list(item.items())[0]
-                srcdir_list.append(os.path.join(srcdir, sub_folder))
-                builddir_list.append(os.path.join(builddir, sub_name))
-        
 
-        for srcdir, builddir in zip(srcdir_list, builddir_list):
+        for srcdir, builddir in self._cmake_projects(srcdir, builddir):
             
             ret = self._build_single(srcdir=srcdir,
                                      builddir=builddir,
@@ -256,6 +371,54 @@ class CmakeBuilder(BuildHandler):
         return True        
 
 
+    def signature(self, srcdir: str, builddir: str, installdir: str, jobs: int) -> dict:
+        ret = super().signature(srcdir, builddir, installdir, jobs)
+        ret['target'] = self.target
+        ret['cmake_args'] = [self._user_cmake_args(s, installdir, jobs) for s, _ in self._cmake_projects(srcdir, builddir)]
+        ret['default_args'] = CmakeTools.get_default_args()
+        if self._generator() is not None:
+            ret['generator'] = self._generator()
+        return ret
+
+    def outputs(self, builddir: str, installdir: str) -> List[str]:
+        return [builddir, installdir]
+
+    def manifests(self, srcdir: str, builddir: str) -> Optional[List[str]]:
+        return [os.path.join(b, 'install_manifest.txt') for _, b in self._cmake_projects(srcdir, builddir)]
+
+    def _cmake_projects(self, srcdir: str, builddir: str) -> List[Tuple[str, str]]:
+        """
+        Source and build directories of the cmake project(s) of this package
+        """
+        
+        if isinstance(self.cmakelists_folder, str):
+            return [(os.path.join(srcdir, self.cmakelists_folder), builddir)]
+        
+        ret = []
+        for item in self.cmakelists_folder:
+            sub_name, sub_folder = list(item.items())[0]
+            ret.append((os.path.join(srcdir, sub_folder), os.path.join(builddir, sub_name)))
+        
+        return ret
+
+    def _generator(self) -> Optional[str]:
+        return self.generator if self.generator is not None else CmakeBuilder.default_generator
+
+    def _user_cmake_args(self, srcdir: str, installdir: str, jobs: int) -> List[str]:
+        """
+        Process all cmake args from the recipe through the shell (only the
+        first time, the same args are used by the build stamp and by the
+        configure step)
+        """
+        key = (srcdir, installdir, jobs)
+        if key not in self.resolved_args:
+            eh = eval_handler.EvalHandler.instance()
+            user_cmake_args = []
+            for arg in self.cmake_args:
+                user_cmake_args.append(eh.process_string(arg, {'srcdir': srcdir, 'installdir': installdir, 'jobs': jobs}))
+            self.resolved_args[key] = user_cmake_args
+        return list(self.resolved_args[key])
+
     def _build_single(self, 
               srcdir: str, 
               builddir: str, 
@@ -269,23 +432,25 @@ class CmakeBuilder(BuildHandler):
             os.makedirs(builddir)
 
         # create cmake tools
-        cmake = CmakeTools(srcdir=srcdir, builddir=builddir)
+        cmake = CmakeTools(srcdir=srcdir, builddir=builddir, generator=self._generator())
 
-        # configure
-        if not cmake.is_configured() or reconfigure:
+        # parse additional cmake args through the shell
+        user_cmake_args = self._user_cmake_args(srcdir, installdir, jobs)
 
-            # parse additional cmake args through the shell
-            # process all args through the shell
-            eh = eval_handler.EvalHandler.instance()
-            user_cmake_args = []
-            for arg in self.cmake_args:
-                user_cmake_args.append(eh.process_string(arg, {'srcdir': srcdir, 'installdir': installdir, 'jobs': jobs}))
+        # set install prefix and build type
+        cmake_args = list()
+        cmake_args.append(f'-DCMAKE_INSTALL_PREFIX={installdir}')
+        cmake_args.append(f'-DCMAKE_BUILD_TYPE={buildtype}')
+
+        # compiler launchers
+        compiler_cache = CompilerCache.instance()
+        if compiler_cache is not None:
+            cmake_args += compiler_cache.cmake_args()
+
+        cmake_args += user_cmake_args  # note: flags from recipes as last entries to allow override
 
-            # set install prefix and build type (only on first or forced configuration)
-            cmake_args = list()
-            cmake_args.append(f'-DCMAKE_INSTALL_PREFIX={installdir}')
-            cmake_args.append(f'-DCMAKE_BUILD_TYPE={buildtype}')
-            cmake_args += user_cmake_args  # note: flags from recipes as last entries to allow override
+        # configure (only on first configuration, if args changed, or if forced)
+        if not cmake.is_configured(args=cmake_args) or reconfigure:
 
             self.pprint('running cmake...')
             if not cmake.configure(args=cmake_args):
@@ -297,7 +462,20 @@ class CmakeBuilder(BuildHandler):
 
         # build
         self.pprint('building...')
-        if not cmake.build(target=self.target, jobs=jobs):
+        env = compiler_cache.build_env(builddir) if compiler_cache is not None else None
+        ok = cmake.build(target=self.target, 
+                         jobs=self.resources.jobs(jobs), 
+                         env=env, 
+                         jobserver=JobServer.instance(), 
+                         jobserver_fixed=self.resources.limits_jobs())
+
+        # compiler cache stats (also for failed builds)
+        if env is not None:
+            stats = compiler_cache.collect(self.pkgname, env)
+            if stats is not None:
+                self.pprint(f'compiler cache: {stats[0]} hits, {stats[1]} misses')
+
+        if not ok:
             self.pprint('build failed')
             return False 
 
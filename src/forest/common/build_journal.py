@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import threading
+import typing
+
+from forest.common import cache_utils
+from forest.git_tools import GitTools
+import forest.common.forest_dirs as _forest_dirs
+
+
+class BuildJournal:
+
+    """
+    Journal of the packages built successfully inside the workspace, each one
+    with the stamp of its build inputs (source tree state, build configuration,
+    and stamps of its dependencies). A package whose stamp did not change
+    since its last build can be skipped altogether.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries = cache_utils.load_json(path, default=dict())
+        self.lock = threading.Lock()
+
+        # source state of each stamped package, recorded together with its stamp
+        self.sources = dict()
+
+    @classmethod
+    def instance(cls) -> 'BuildJournal':
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(os.path.join(_forest_dirs.cachedir, 'build_journal.json'))
+        return cls._instance
+
+    def get(self, name: str) -> typing.Optional[str]:
+        """
+        Stamp of the last successful build of a package
+        """
+        entry = self.get_entry(name)
+        return entry['stamp'] if entry is not None else None
+
+    def get_entry(self, name: str) -> typing.Optional[dict]:
+        """
+        Last successful build of a package: its stamp, and the state of its
+        sources (tree) and dependencies (depends) it was computed from
+        """
+        with self.lock:
+            entry = self.entries.get(name)
+        if isinstance(entry, str):
+            return {'stamp': entry}
+        return entry
+
+    def set(self, name: str, stamp: str):
+        with self.lock:
+            entry = {'stamp': stamp}
+            entry.update(self.sources.get(name, dict()))
+            self.entries[name] = entry
+            cache_utils.dump_json(self.path, self.entries)
+
+    def remove(self, name: str):
+        with self.lock:
+            if self.entries.pop(name, None) is not None:
+                cache_utils.dump_json(self.path, self.entries)
+
+    def is_up_to_date(self, pkg, stamp: str, builddir: str, installdir: str) -> bool:
+        """
+        Check if the package was built with the given stamp, and its build
+        outputs still exist
+        """
+        return self.get(pkg.name) == stamp and \
+            all(os.path.exists(p) for p in pkg.builder.outputs(builddir, installdir))
+
+    def stamp(self, pkg, srcdir: str, builddir: str, installdir: str, buildtype: str, jobs: int) -> str:
+        """
+        Compute the stamp of a package, i.e. a digest of all inputs of its build
+        """
+
+        depends = dict()
+        for dep in pkg.depends:
+            dep_stamp = self.get(dep)
+            if dep_stamp is not None:
+                depends[dep] = dep_stamp
+
+        inputs = {
+            'tree': tree_fingerprint(srcdir),
+            'build': pkg.builder.signature(srcdir, builddir, installdir, jobs),
+            'buildtype': buildtype,
+            'installdir': installdir,
+            'system_depends': pkg.system_depends,
+            'pip_depends': pkg.pip_depends,
+            'depends': depends
+        }
+
+        with self.lock:
+            self.sources[pkg.name] = {k: inputs[k] for k in ('tree', 'depends')}
+
+        return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def tree_fingerprint(srcdir: str) -> str:
+    """
+    Digest of the state of the source tree in srcdir, which changes whenever
+    a file is edited, added or removed, computed without spawning any process.
+    For git work trees, this is the checked out commit, the state of the files
+    in the index, and the path, size and modification time of untracked files
+    (ignored files excluded); other trees are walked in full
+    """
+
+    git = GitTools(srcdir)
+    index = git.index()
+
+    if index is None:
+        return _walk_fingerprint(srcdir)
+
+    # files modified after the index was written cannot be told apart from
+    # their staged version by their stat data alone (racy git)
+    try:
+        index_mtime = os.stat(os.path.join(git.git_dir(), 'index')).st_mtime_ns
+    except OSError:
+        index_mtime = 0
+
+    h = hashlib.sha1()
+    h.update(f'head {git.head()}\n'.encode())
+
+    for rel, entry in sorted(index.items()):
+        path = os.path.join(srcdir, rel)
+        if entry[0] & 0o170000 == 0o160000:
+            state = f'submodule {GitTools(path).head()}'
+        else:
+            state = _tracked_state(path, entry, index_mtime)
+        h.update(f'{rel} {state}\n'.encode(errors='surrogateescape'))
+
+    for rel, e in git.untracked(index):
+        try:
+            st = e.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        h.update(f'? {rel} {st.st_size} {st.st_mtime_ns}\n'.encode(errors='surrogateescape'))
+
+    return h.hexdigest()
+
+
+def _tracked_state(path: str, entry: tuple, index_mtime: int) -> str:
+    """
+    State of a tracked file: the sha of its staged blob, if the file still
+    matches it (by stat data, or by content), the sha of its current content
+    otherwise ('missing' for deleted files)
+    """
+
+    mode, sha, mtime_ns, size, ino = entry
+
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return 'missing'
+
+    # the index keeps the lower 32 bits of sizes and inodes
+    exe = 'x' if st.st_mode & 0o100 else '-'
+    if st.st_mtime_ns == mtime_ns and st.st_size & 0xffffffff == size and \
+            st.st_ino & 0xffffffff == ino and st.st_mtime_ns < index_mtime:
+        return f'{sha} {exe}'
+
+    try:
+        if os.path.islink(path):
+            data = os.fsencode(os.readlink(path))
+        else:
+            with open(path, 'rb') as f:
+                data = f.read()
+    except OSError:
+        return 'missing'
+
+    blob = hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+    return f'{blob} {exe}'
+
+
+def _walk_fingerprint(srcdir: str) -> str:
+    """
+    Digest of path, size and modification time of all files inside srcdir
+    (git metadata excluded)
+    """
+
+    h = hashlib.sha1()
+    stack = [srcdir]
+
+    while stack:
+        d = stack.pop()
+
+        try:
+            entries = sorted(os.scandir(d), key=lambda e: e.name)
+        except OSError:
+            continue
+
+        for e in entries:
+
+            if e.name == '.git':
+                continue
+
+            try:
+                st = e.stat(follow_symlinks=False)
+            except OSError:
+                continue
+
+            rel = os.path.relpath(e.path, srcdir)
+
+            if e.is_dir(follow_symlinks=False):
+                h.update(f'd {rel}\n'.encode(errors='surrogateescape'))
+                stack.append(e.path)
+            else:
+                h.update(f'f {rel} {st.st_size} {st.st_mtime_ns}\n'.encode(errors='surrogateescape'))
+
+    return h.hexdigest()
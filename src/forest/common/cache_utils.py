@@ -0,0 +1,85 @@
+import json
+import os
+import pickle
+import tempfile
+
+
+def load_json(path: str, default=None):
+    """
+    Load a json cache file, returning default if it does not exist
+    or it cannot be parsed (e.g. written by another forest version)
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def dump_json(path: str, data) -> bool:
+    """
+    Atomically write a json cache file, creating its directory
+    if needed. Failures are not fatal, as caches can always be
+    re-computed.
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        return False
+
+
+def dump_text(path: str, text: str) -> bool:
+    """
+    Atomically write a text file, see dump_json
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        return False
+
+
+def load_pickle(path: str, default=None):
+    """
+    Load a binary cache file, returning default if it does not exist
+    or it cannot be unpickled
+    """
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return default
+
+
+def dump_pickle(path: str, data) -> bool:
+    """
+    Atomically write a binary cache file, see dump_json
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        return False
+
+
+def mtime_ns(path: str):
+    """
+    Modification time of path in nanoseconds, or None if it does not exist
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
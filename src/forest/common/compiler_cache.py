@@ -0,0 +1,187 @@
+import json
+import os
+import shutil
+import socket
+import threading
+import typing
+
+from forest.common import proc_utils
+import forest.common.forest_dirs as _forest_dirs
+
+
+class CompilerCache:
+
+    """
+    Compiler cache (ccache or sccache) used as compiler launcher by every
+    cmake package, with a cache directory that is shared by all packages
+    of the workspace, and bounded in size. Objects compiled by earlier
+    builds (e.g. before a --clean, or a branch switch) are then taken from
+    the cache instead of being compiled again.
+
+    Hits and misses are collected per package: ccache logs them into a
+    stats log inside the build directory, while sccache runs a private
+    server (on its own port) for each package build.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    # supported tools
+    tools = ['ccache', 'sccache']
+
+    # tool in use (None if disabled), set by main.py
+    tool = None
+
+    # shared cache directory, set by main.py
+    dir = None
+
+    # maximum size of the cache directory
+    max_size = '5G'
+
+    # languages whose compilers are launched through the cache
+    languages = ['C', 'CXX', 'CUDA']
+
+    # ccache stats log, inside the build directory
+    statslog_filename = 'forest_ccache_stats.log'
+
+    def __init__(self, tool: str, dir: str, max_size: str) -> None:
+        self.tool = tool
+        self.dir = dir
+        self.max_size = max_size
+        self.exe = shutil.which(tool)
+        self.lock = threading.Lock()
+
+        # (hits, misses) of each package built in this run
+        self.stats = dict()
+
+    @classmethod
+    def instance(cls) -> typing.Optional['CompilerCache']:
+        """
+        The compiler cache, or None if it is disabled
+        """
+        with cls._instance_lock:
+            if cls.tool is None:
+                return None
+            if cls._instance is None:
+                cls._instance = cls(cls.tool, cls.dir, cls.max_size)
+        return cls._instance
+
+    def cmake_args(self) -> typing.List[str]:
+        """
+        Cmake arguments setting the compiler launchers
+        """
+        return [f'-DCMAKE_{lang}_COMPILER_LAUNCHER={self.exe}' for lang in CompilerCache.languages]
+
+    def build_env(self, builddir: str) -> dict:
+        """
+        Environment of a build inside builddir; stats are gathered from the
+        start of the build, until collect() is called with the same environment
+        """
+
+        env = dict(os.environ)
+
+        if self.tool == 'ccache':
+            statslog = os.path.join(builddir, CompilerCache.statslog_filename)
+            if os.path.exists(statslog):
+                os.remove(statslog)
+            env['CCACHE_DIR'] = self.dir
+            env['CCACHE_MAXSIZE'] = self.max_size
+            env['CCACHE_BASEDIR'] = _forest_dirs.rootdir
+            env['CCACHE_STATSLOG'] = statslog
+        else:
+            env['SCCACHE_DIR'] = self.dir
+            env['SCCACHE_CACHE_SIZE'] = self.max_size
+            env['SCCACHE_SERVER_PORT'] = str(_free_port())
+
+        return env
+
+    def collect(self, pkgname: str, env: dict) -> typing.Optional[typing.Tuple[int, int]]:
+        """
+        Gather hits and misses of a build that used the given environment,
+        and add them to the stats of the package
+
+        Returns:
+            Tuple[int, int]: hits and misses of the build (None if unknown)
+        """
+
+        if self.tool == 'ccache':
+            ret = _ccache_stats(env['CCACHE_STATSLOG'])
+        else:
+            ret = self._sccache_stats(env)
+
+        if ret is None:
+            return None
+
+        with self.lock:
+            hits, misses = self.stats.get(pkgname, (0, 0))
+            self.stats[pkgname] = (hits + ret[0], misses + ret[1])
+
+        return ret
+
+    def _sccache_stats(self, env: dict):
+
+        out = proc_utils.get_output([self.exe, '--show-stats', '--stats-format', 'json'], env=env, print_on_error=False)
+        proc_utils.get_output([self.exe, '--stop-server'], env=env, print_on_error=False)
+
+        try:
+            stats = json.loads(out)['stats']
+            return _count(stats['cache_hits']), _count(stats['cache_misses'])
+        except (TypeError, ValueError, KeyError):
+            return None
+
+    def summary(self) -> str:
+
+        hits = sum(h for h, _ in self.stats.values())
+        misses = sum(m for _, m in self.stats.values())
+
+        ret = [f'[forest] compiler cache: {hits} hit{"s" if hits != 1 else ""}, '
+               f'{misses} miss{"es" if misses != 1 else ""}{_rate(hits, misses)} ({self.tool}, {self.dir})']
+
+        for pkgname, (h, m) in sorted(self.stats.items()):
+            ret.append(f'[{pkgname}] {h} hit{"s" if h != 1 else ""}, {m} miss{"es" if m != 1 else ""}{_rate(h, m)}')
+
+        return '\n'.join(ret)
+
+
+def _ccache_stats(statslog: str):
+    """
+    Count hits and misses inside a ccache stats log, which lists the
+    counters updated by each compilation (e.g. direct_cache_hit, cache_miss)
+    """
+
+    if not os.path.isfile(statslog):
+        return None
+
+    hits, misses = 0, 0
+
+    with open(statslog, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.endswith('cache_hit'):
+                hits += 1
+            elif line == 'cache_miss':
+                misses += 1
+
+    return hits, misses
+
+
+def _count(counter) -> int:
+    """
+    Total of an sccache counter, which is split by language in recent versions
+    """
+    if isinstance(counter, dict):
+        return sum(counter.get('counts', dict()).values())
+    return int(counter)
+
+
+def _rate(hits: int, misses: int) -> str:
+    if hits + misses == 0:
+        return ''
+    return f' ({100 * hits // (hits + misses)}% hit rate)'
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
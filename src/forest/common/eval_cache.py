@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+from forest.common import cache_utils
+import forest.common.forest_dirs as _forest_dirs
+
+
+class EvalCache:
+
+    """
+    On-disk memo of expensive evaluations used by recipes (e.g. shell
+    commands), stored inside the workspace. Each entry has its own time
+    to live, and is invalidated when any of the environment variables
+    (or files) it was keyed on changes.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    # if False, cached values are not used (but they are refreshed)
+    enabled = True
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries = cache_utils.load_json(path, default=dict())
+        self.lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> 'EvalCache':
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(os.path.join(_forest_dirs.cachedir, 'eval_cache.json'))
+        return cls._instance
+
+    def lookup(self, key: str, ttl: float, env_keys: List[str] = (), files: List[str] = ()) -> Optional[str]:
+        """
+        Return the memoized result with the given key if it is still valid,
+        None otherwise (nothing is evaluated)
+        """
+
+        if not EvalCache.enabled:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+        if entry is None or time.time() - entry['time'] >= ttl:
+            return None
+
+        if entry['env'] != {k: os.environ.get(k) for k in env_keys} or \
+                entry['mtimes'] != {f: cache_utils.mtime_ns(f) for f in files}:
+            return None
+
+        return entry['value']
+
+    def memoize(self, key: str, fn: Callable[[], str], ttl: float,
+                env_keys: List[str] = (), files: List[str] = ()):
+        """
+        Return the memoized result of fn, or call it if no valid entry
+        exists. Failures (i.e. None results) are not memoized.
+
+        Args:
+            key (str): unique key of the evaluation
+            fn (Callable[[], str]): function computing the value
+            ttl (float): time to live in seconds
+            env_keys (List[str], optional): environment variables the result depends on
+            files (List[str], optional): files the result depends on (via their mtime)
+        """
+
+        value = self.lookup(key, ttl, env_keys, files)
+        if value is not None:
+            return value
+
+        env = {k: os.environ.get(k) for k in env_keys}
+        mtimes = {f: cache_utils.mtime_ns(f) for f in files}
+
+        value = fn()
+
+        if value is None:
+            return value
+
+        with self.lock:
+            self.entries[key] = {
+                'value': value,
+                'time': time.time(),
+                'env': env,
+                'mtimes': mtimes
+            }
+            cache_utils.dump_json(self.path, self.entries)
+
+        return value
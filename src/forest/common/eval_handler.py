@@ -1,12 +1,18 @@
 import os
 from forest.common import proc_utils
 from forest.common import config_handler
+from forest.common import shell_expand
+from forest.common.shell_session import ShellSession
+from forest.common.eval_cache import EvalCache
+from forest.common.plan_cache import PlanCache
 import inspect
+import threading
 from typing import List
 
 class EvalHandler:
 
     _instance = None
+    _instance_lock = threading.Lock()
 
     # modes are strings that are used to conditionally add cmake args
     # (and possibly other things, too!)
@@ -14,8 +20,15 @@ class EvalHandler:
 
     class Locals:
 
+        # lsb_release is memoized for this long (seconds)
+        lsb_release_ttl = 24*3600
+
         def __init__(self) -> None:
-            self.ubuntu_release = float(proc_utils.get_output('lsb_release -rs'.split(' ')))
+            lsb_release = EvalCache.instance().memoize(key='lsb_release -rs', 
+                                                       fn=lambda: proc_utils.get_output('lsb_release -rs'.split(' ')),
+                                                       ttl=EvalHandler.Locals.lsb_release_ttl,
+                                                       files=['/etc/os-release', '/etc/lsb-release'])
+            self.ubuntu_release = float(lsb_release)
             self.shell = EvalHandler.Locals.shell
             self.env = EvalHandler.Locals.env
             self.config = config_handler.ConfigHandler.instance()
@@ -26,16 +39,29 @@ class EvalHandler:
             return mode in EvalHandler.modes
 
         @staticmethod
-        def shell(cmd: str) -> str:
-            ret = proc_utils.get_output(args=[cmd], shell=True)
-            if ret is None:
-                return ''
+        def shell(cmd: str, ttl: float = None, env_keys: List[str] = ('PATH',)) -> str:
+            """
+            Run cmd through the shell and return its output; if ttl (seconds)
+            is given, the output is memoized on disk for that long, or until
+            any of the env_keys environment variables changes
+            """
+            if ttl is None:
+                key = None
+                ret = ShellSession.instance().get_output(cmd)
             else:
-                return ret
+                key = f'shell:{os.getcwd()}:{cmd}'
+                ret = EvalCache.instance().memoize(key=key,
+                                                   fn=lambda: ShellSession.instance().get_output(cmd),
+                                                   ttl=ttl,
+                                                   env_keys=env_keys)
+            if ret is None:
+                ret = ''
+            PlanCache.instance().record_shell(key, ttl, env_keys, ret)
+            return ret
 
         @staticmethod
         def env(key: str) -> str:
-            return os.environ.get(key, '')
+            return PlanCache.instance().environ().get(key, '')
     
     
     def __init__(self) -> None:
@@ -44,14 +70,19 @@ class EvalHandler:
     
     @classmethod
     def instance(cls):
-        if cls._instance is None:
-            cls._instance = cls()
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
         return cls._instance
 
     
     @classmethod
     def echo(cls, text: str) -> str:
-        return proc_utils.get_output(args=['/bin/echo "' + text + '"'], shell=True)
+        # expand in-process when possible, otherwise use the shell session
+        ret = shell_expand.echo(text, env=PlanCache.instance().environ())
+        if ret is not None:
+            return ret
+        return cls.Locals.shell('/bin/echo "' + text + '"')
         
     
     @classmethod
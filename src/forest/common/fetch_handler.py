@@ -3,9 +3,12 @@ import shutil
 from tempfile import TemporaryDirectory
 
 from forest.git_tools import GitTools
+from forest.common import offline as _offline
 from forest.common import proc_utils
+from forest.common import sys_deps
 from forest.common.print_utils import ProgressReporter
 from forest.common.eval_handler import EvalHandler
+from forest.common.plan_cache import PlanCache
 
 
 class FetchHandler:
@@ -35,6 +38,10 @@ class FetchHandler:
         # create symlink after do_fetch?
         self.symlink_dst = None
 
+        # can sources be fetched ahead of the build (i.e., before
+        # dependencies are installed)?
+        self.prefetch = False
+
     
     def fetch(self, srcdir):
         """
@@ -69,6 +76,16 @@ class FetchHandler:
         return True
     
     
+    def missing_offline(self, srcdir):
+        """
+        Check if the package can be fetched without network access.
+        To be overridden by derived classes.
+
+        Returns:
+            str: description of the missing artifact, or None
+        """
+        return None
+
     def do_fetch(self, srcdir):
         """
         Carry out the actual fetch operation on the package.
@@ -153,6 +170,12 @@ class CustomFetcher(FetchHandler):
         
         return True
 
+    def missing_offline(self, srcdir):
+        # custom commands are assumed to download the sources
+        if os.path.exists(srcdir):
+            return None
+        return 'source code (fetched by custom commands)'
+
     @classmethod
     def from_yaml(cls, pkgname, data):
         ret = CustomFetcher(pkgname=pkgname)
@@ -169,8 +192,14 @@ class GitFetcher(FetchHandler):
 
     # tag overrides
     tag_overrides = {}
+
+    # root folder of the git mirror cache (if enabled)
+    mirror = None
+
+    # clone strategy for recipes that do not specify one
+    default_strategy = 'full'
     
-    def __init__(self, pkgname, server, repository, tag=None, proto='ssh', recursive=False) -> None:
+    def __init__(self, pkgname, server, repository, tag=None, proto='ssh', recursive=False, strategy=None) -> None:
 
         super().__init__(pkgname=pkgname)
         self.tag = tag
@@ -178,6 +207,8 @@ class GitFetcher(FetchHandler):
         self.repository = repository
         self.proto = proto if self.proto_override is None else self.proto_override
         self.recursive = recursive
+        self.strategy = strategy
+        self.prefetch = True
     
     @classmethod
     def from_yaml(cls, pkgname, data):
@@ -202,8 +233,13 @@ class GitFetcher(FetchHandler):
         # override has precendence
         tag = GitFetcher.tag_overrides.get(pkgname, tag)
 
+        # clone strategy
+        strategy = data.get('strategy', None)
+        if strategy is not None and strategy not in GitTools.clone_strategies:
+            raise ValueError(f'unsupported clone strategy "{strategy}" (choose from {", ".join(GitTools.clone_strategies)})')
+
         # default proto from env
-        default_proto = os.getenv('HHCM_FOREST_CLONE_DEFAULT_PROTO')
+        default_proto = PlanCache.instance().environ().get('HHCM_FOREST_CLONE_DEFAULT_PROTO')
         if default_proto is None:
             default_proto = 'ssh'
 
@@ -212,9 +248,31 @@ class GitFetcher(FetchHandler):
                           repository=data['repository'],
                           tag=tag,
                           proto=data.get('proto', default_proto),
-                          recursive=data.get('recursive', False))
+                          recursive=data.get('recursive', False),
+                          strategy=strategy)
 
 
+    def missing_offline(self, srcdir):
+
+        if os.path.exists(srcdir):
+            return None
+
+        repo = f'{self.server}/{self.repository}'
+
+        if GitFetcher.mirror is None:
+            return f'source code of {repo} (not cloned, and --git-mirror is not enabled)'
+
+        mirror_path = GitTools.mirror_path(GitFetcher.mirror, self.server, self.repository)
+        if not os.path.isdir(mirror_path):
+            return f'source code of {repo} (missing from git mirror {GitFetcher.mirror})'
+
+        eh = EvalHandler.instance()
+        tag = eh.process_string(self.tag)
+        if not GitTools(mirror_path).has_ref(tag):
+            return f'source code of {repo} (tag {tag} missing from git mirror {GitFetcher.mirror})'
+
+        return None
+
     def do_fetch(self, srcdir) -> bool:
         
         # custom print shorthand
@@ -226,14 +284,17 @@ class GitFetcher(FetchHandler):
         eh = EvalHandler.instance()
         tag_processed = eh.process_string(self.tag)
 
-        pprint(f'cloning source code ({self.proto})...')
+        mirror_str = ', via mirror' if GitFetcher.mirror is not None else ''
+        pprint(f'cloning source code ({self.proto}{mirror_str})...')
         
         if not git.clone(server=self.server, 
                         repository=self.repository, 
                         tag=tag_processed,
                         proto=self.proto, 
                         recursive=self.recursive,
-                        depth=GitFetcher.depth_override):
+                        depth=GitFetcher.depth_override,
+                        mirror=GitFetcher.mirror,
+                        strategy=self.strategy or GitFetcher.default_strategy):
             pprint(f'unable to clone source code (tag {tag_processed})')
             git.rm()
             return False
@@ -247,9 +308,14 @@ class DebFetcher(FetchHandler):
         super().__init__(pkgname)
         # note: expand environment variables between {curly braces}
         # example: 'ros-{ROS_DISTRO}-moveit-core` becomes 'ros-melodic-moveit-core'
-        self.debname = debname.format(**os.environ)
+        self.debname = debname.format_map(PlanCache.instance().environ())
 
     
+    def missing_offline(self, srcdir):
+        if sys_deps.missing_system_deps([self.debname], manager='apt'):
+            return f'deb package {self.debname}'
+        return None
+
     def do_fetch(self, srcdir) -> bool:
 
         # custom print shorthand
@@ -260,6 +326,10 @@ class DebFetcher(FetchHandler):
         if pkg_already_installed:
             pprint(f'{self.debname} already installed')
             return True
+
+        if _offline.enabled:
+            pprint(f'{self.debname} is not installed, and cannot be installed offline')
+            return False
             
         pprint(f'installing {self.debname} from apt')
 
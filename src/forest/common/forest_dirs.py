@@ -18,11 +18,13 @@ recipesdir = os.path.join(rootdir, 'recipes')
 buildroot = os.path.join(rootdir, 'build')
 installdir = os.path.join(rootdir, 'install')
 srcroot = os.path.join(rootdir, 'src')
+cachedir = os.path.join(rootdir, '.cache')
 
 def update_dirs():
-    global rootdir, recipesdir, buildroot, installdir, srcroot
+    global rootdir, recipesdir, buildroot, installdir, srcroot, cachedir
     rootdir = _find_ws_root(os.getcwd())
     recipesdir = os.path.join(rootdir, 'recipes')
     buildroot = os.path.join(rootdir, 'build')
     installdir = os.path.join(rootdir, 'install')
     srcroot = os.path.join(rootdir, 'src')
+    cachedir = os.path.join(rootdir, '.cache')
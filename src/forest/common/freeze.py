@@ -1,9 +1,11 @@
+import concurrent.futures
 import os
 import subprocess
 import sys
 
 import yaml
 
+from forest.git_tools import GitTools
 import forest.common.forest_dirs as _forest_dirs
 
 
@@ -21,36 +23,18 @@ def freeze(append: bool = False, ignore_errors: bool = False) -> bool:
         if os.path.isdir(os.path.join(srcroot, d))
     ])
 
+    # dirty-state checks spawn git, and run concurrently
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        states = list(executor.map(_freeze_single, [os.path.join(srcroot, pkg) for pkg in pkgs]))
+
     entries = {}
     errors = []
 
-    for pkg in pkgs:
-        pkgdir = os.path.join(srcroot, pkg)
-
-        # check it is a git repo
-        is_git = subprocess.run(
-            ['git', 'rev-parse', '--git-dir'],
-            cwd=pkgdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-        ).returncode == 0
-        if not is_git:
-            errors.append(f'{pkg}: not a git repository')
-            continue
-
-        # check for local changes (tracked files only; untracked files are irrelevant for the lock)
-        status = subprocess.run(
-            ['git', 'status', '--porcelain', '--untracked-files=no'],
-            cwd=pkgdir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
-        )
-        if status.stdout.strip():
-            errors.append(f'{pkg}: has uncommitted local changes')
-            continue
-
-        # get HEAD sha1
-        sha1 = subprocess.run(
-            ['git', 'rev-parse', 'HEAD'],
-            cwd=pkgdir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
-        ).stdout.strip()
-        entries[pkg] = sha1
+    for pkg, (sha1, error) in zip(pkgs, states):
+        if error is not None:
+            errors.append(f'{pkg}: {error}')
+        else:
+            entries[pkg] = sha1
 
     if errors:
         for e in errors:
@@ -69,3 +53,35 @@ def freeze(append: bool = False, ignore_errors: bool = False) -> bool:
 
     print(f'wrote {lock_file} ({len(entries)} package{"s" if len(entries) != 1 else ""})')
     return True
+
+
+def _freeze_single(pkgdir: str):
+    """
+    Returns:
+        tuple: HEAD sha1 of the repository in pkgdir, and error message (or None)
+    """
+
+    git = GitTools(pkgdir)
+
+    # check it is a git repo
+    if git.git_dir(discover=True) is None:
+        return None, 'not a git repository'
+
+    # check for local changes (tracked files only; untracked files are irrelevant for the lock)
+    status = subprocess.run(
+        ['git', 'status', '--porcelain', '--untracked-files=no'],
+        cwd=pkgdir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    if status.stdout.strip():
+        return None, 'has uncommitted local changes'
+
+    # get HEAD sha1 (git is called if refs cannot be read directly,
+    # e.g. when pkgdir is nested inside another repository)
+    sha1 = git.head()
+    if sha1 is None:
+        sha1 = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=pkgdir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        ).stdout.strip()
+
+    return sha1, None
@@ -1,15 +1,24 @@
 import os
+from typing import List
 
-from forest.cmake_tools import CmakeTools
 from . import package
 from .print_utils import ProgressReporter
 from . import forest_dirs as _forest_dirs
 from forest.common import proc_utils
 from forest.common.recipe import Cookbook
 from forest.common import sys_deps as _sys_deps
+from forest.common import offline as _offline
+from forest.common.scheduler import InstallScheduler
+from forest.common.build_journal import BuildJournal
+from forest.common.artifact_cache import ArtifactCache
+from forest.common.compiler_cache import CompilerCache
+from forest.common.memory_governor import MemoryGovernor
 
 _build_cache = dict()
 
+# packages whose sources were fetched ahead of their build in this run
+_fetch_cache = dict()
+
 def build_package(pkg: package.Package, 
                   srcroot: str, 
                   buildroot: str, 
@@ -38,7 +47,8 @@ def install_package(pkg: str,
                     jobs: int,
                     reconfigure=False, 
                     no_deps=False,
-                    src_only=False):
+                    src_only=False,
+                    force_build=False):
     
     """
     Fetch a recipe file from the default path using the given package name, 
@@ -49,68 +59,166 @@ def install_package(pkg: str,
         bool: success flag
     """
 
-    # custom print
-    pprint = ProgressReporter.get_print_fn(pkg)
+    return install_packages(pkgs=[pkg], 
+                            srcroot=srcroot, 
+                            buildroot=buildroot, 
+                            installdir=installdir, 
+                            buildtype=buildtype, 
+                            jobs=jobs, 
+                            reconfigure=reconfigure, 
+                            no_deps=no_deps, 
+                            src_only=src_only,
+                            force_build=force_build)
+
+
+def install_packages(pkgs: List[str],
+                     srcroot: str,
+                     buildroot: str,
+                     installdir: str,
+                     buildtype: str,
+                     jobs: int,
+                     reconfigure=False, 
+                     no_deps=False,
+                     src_only=False,
+                     parallel_packages=1,
+                     force_build=False,
+                     fetch_jobs=0):
+    
+    """
+    Resolve the dependency graph of the given packages, and perform the 
+    required cloning and building steps, installing up to parallel_packages
+    independent packages at the same time (each one with the given number
+    of jobs). Packages that are up to date with their last successful build
+    are skipped, unless force_build is True. If fetch_jobs > 0, sources of
+    all packages are fetched as soon as the graph is resolved, up to
+    fetch_jobs at the same time, and each package is built as soon as its
+    own sources are available.
 
-    # skip if already built in this run
-    if pkg in _build_cache:
-        pprint(f'already built in this run, skipping')
-        return True
+    Returns:
+        bool: success flag
+    """
+
+    def install_fn(pkg: package.Package):
+        return _install_single(pkg=pkg, 
+                               srcroot=srcroot, 
+                               buildroot=buildroot, 
+                               installdir=installdir, 
+                               buildtype=buildtype, 
+                               jobs=jobs, 
+                               reconfigure=reconfigure, 
+                               src_only=src_only,
+                               force_build=force_build)
+
+    def fetch_fn(pkg: package.Package):
+        return _prefetch_single(pkg=pkg, srcroot=srcroot)
+
+    scheduler = InstallScheduler(install_fn=install_fn, 
+                                 buildroot=buildroot, 
+                                 no_deps=no_deps, 
+                                 parallel_packages=parallel_packages,
+                                 fetch_fn=fetch_fn,
+                                 fetch_jobs=fetch_jobs,
+                                 jobs=jobs)
+
+    # offline: report every missing artifact before building anything
+    if _offline.enabled:
+        scheduler.resolve(pkgs)
+        if not _offline.check(scheduler.packages.values(), srcroot):
+            return False
+
+    # throttle builds when memory is low
+    governor = MemoryGovernor.instance()
+    if governor is not None:
+        governor.start()
 
-    # retrieve package info from recipe
     try:
-        pkg = package.Package.from_name(name=pkg)
-    except FileNotFoundError:
-        pprint(f'recipe file not found (searched in {Cookbook.get_recipe_path()})')
-        return False
+        ok = scheduler.run(pkgs)
+    finally:
+        if governor is not None:
+            governor.stop()
 
-    # install dependencies if not found
-    for dep in pkg.depends:
-        
-        # if no-deps mode, skip dependency installation
-        if no_deps:
-            pprint(f'skipping dependency {dep}')
-            continue
+    cache = ArtifactCache.instance()
+    if cache is not None:
+        cache.wait()
+        print(cache.summary())
+
+    compiler_cache = CompilerCache.instance()
+    if compiler_cache is not None:
+        print(compiler_cache.summary())
+
+    if governor is not None:
+        print(governor.summary())
 
-        # this dependency build directory name (if exists)
-        dep_builddir = os.path.join(buildroot, dep)
+    return ok
 
-        # if dependency is built by this ws, trigger build
-        if os.path.exists(dep_builddir):
-            
-            # dependency found and built by forest -> trigger build
-            pprint(f'depends on {dep} -> build found, building..')   
 
-            ok = install_package(dep, srcroot, buildroot, installdir, 
-                    buildtype, jobs, reconfigure, no_deps=no_deps, src_only=src_only)   
+def _prefetch_single(pkg: package.Package, srcroot: str):
+    
+    """
+    Fetch the sources of a package ahead of its build, if they are missing
+    and the package fetcher supports it
+
+    Returns:
+        bool: success flag, or None if nothing was fetched
+    """
 
-            if not ok:
-                pprint(f'failed to build dependency {dep}')
-                return False 
+    srcdir = os.path.join(srcroot, pkg.name)
 
-            # go to next dependency
-            continue
+    if pkg.name in _build_cache or not pkg.fetcher.prefetch or os.path.exists(srcdir):
+        return None
 
-        # try to find-package this dependency
-        dep_found = CmakeTools.find_package(dep)
+    ok = pkg.fetcher.fetch(srcdir)
 
-        if not dep_found:
-            # dependency not found -> install it
-            pprint(f'depends on {dep} -> not found, installing..')
-            
-            # note: reconfigure needed if there's build but not install
-            ok = install_package(dep, srcroot, buildroot, installdir, 
-                    buildtype, jobs, reconfigure, no_deps=no_deps, src_only=src_only)
+    if ok:
+        _fetch_cache[pkg.name] = True
 
-            if not ok:
-                pprint(f'failed to install dependency {dep}')
-                return False
+    return ok
 
-        else:
-            # dependency found and not built by forest -> nothing to do
-            pprint(f'depends on {dep} -> found')
+
+def _install_single(pkg: package.Package,
+                    srcroot: str,
+                    buildroot: str,
+                    installdir: str,
+                    buildtype: str,
+                    jobs: int,
+                    reconfigure=False, 
+                    src_only=False,
+                    force_build=False):
+    
+    """
+    Perform the cloning and building steps of a package whose 
+    dependencies have already been installed
+
+    Returns:
+        bool: success flag
+    """
+
+    # custom print
+    pprint = ProgressReporter.get_print_fn(pkg.name)
+
+    # skip if already built in this run
+    if pkg.name in _build_cache:
+        pprint(f'already built in this run, skipping')
+        return True
     
     srcdir = os.path.join(srcroot, pkg.name)
+    builddir = os.path.join(buildroot, pkg.name)
+
+    # skip packages whose build inputs did not change since their
+    # last successful build (without spawning any process)
+    journal = BuildJournal.instance()
+    cache = ArtifactCache.instance()
+    stamp = None
+    if not src_only and os.path.isdir(srcdir):
+        stamp = journal.stamp(pkg, srcdir, builddir, installdir, buildtype, jobs)
+        if not force_build and not reconfigure and \
+                journal.is_up_to_date(pkg, stamp, builddir, installdir):
+            pprint('up to date, skipping')
+            _build_cache[pkg.name] = True
+            # the key may be needed by dependent packages
+            if cache is not None:
+                cache.defer_key(pkg, srcdir, builddir, installdir, buildtype, jobs)
+            return True
 
     # install system / pip dependencies declared in the recipe
     if pkg.system_depends:
@@ -125,14 +233,26 @@ def install_package(pkg: str,
             pprint('failed to install pip dependencies')
             return False
 
-    if not pkg.fetcher.fetch(srcdir):
+    if pkg.name not in _fetch_cache and not pkg.fetcher.fetch(srcdir):
         pprint('failed to fetch package')
         return False 
+
+    # stamp freshly fetched sources before they are built
+    if not src_only and stamp is None and os.path.isdir(srcdir):
+        stamp = journal.stamp(pkg, srcdir, builddir, installdir, buildtype, jobs)
+
+    # artifact cache key
+    key = None
+    if not src_only and cache is not None:
+        key = cache.key(pkg, srcdir, builddir, installdir, buildtype, jobs)
     
-    # configure and build
+    # configure and build (or unpack a cached build)
     if src_only:
         pprint('src_only mode: will not build')
         ok = True
+    elif key is not None and not force_build and cache.restore(pkg, key, srcdir, builddir, installdir):
+        pprint('restored from artifact cache')
+        ok = True
     else:
         ok = build_package(pkg=pkg, 
                         srcroot=srcroot, 
@@ -142,9 +262,14 @@ def install_package(pkg: str,
                         jobs=jobs, 
                         reconfigure=reconfigure)
 
+        if ok and key is not None and cache.store(pkg, key, srcdir, builddir, installdir):
+            pprint('stored into artifact cache')
+
     if ok:
         pprint('ok')
         _build_cache[pkg.name] = True
+        if stamp is not None:
+            journal.set(pkg.name, stamp)
 
     return ok
 
@@ -162,6 +287,9 @@ def uninstall_package(pkg: str,
     except FileNotFoundError:
         pprint(f'recipe file not found (searched in {Cookbook.get_recipe_basedir()})')
         return False
+    except ValueError as e:
+        pprint(f'invalid recipe: {e}')
+        return False
 
     install_cache_fname = os.path.join(installdir, ".install_cache", pkg.name)
     if not os.path.isfile(install_cache_fname):
@@ -178,6 +306,7 @@ def uninstall_package(pkg: str,
     if not error:
         cmd = ['rm', install_cache_fname]
         ok = proc_utils.call_process(args=cmd, print_on_error=verbose)
+        BuildJournal.instance().remove(pkg.name)
         
         pprint('uninstalled successfully')
         return True
@@ -220,10 +349,11 @@ def _remove_fname(pkg: str, fname: str, installdir:str, verbose: bool):
 
 def clean(pkg: str, buildroot: str,  installdir: str, verbose: bool):
     pprint = ProgressReporter.get_print_fn(pkg)      
-    return _remove_buildir(pkg, verbose)
+    BuildJournal.instance().remove(pkg)
+    return _remove_buildir(pkg, buildroot, verbose)
 
 
-def _remove_buildir(pkg, verbose):
+def _remove_buildir(pkg, buildroot, verbose):
     builddir = os.path.join(buildroot, pkg)
     pprint = ProgressReporter.get_print_fn(pkg)
     pprint(f'removing build directory: {builddir}')
@@ -292,6 +422,46 @@ def write_ws_file(rootdir):
         f.write('# forest marker file \n')
         return True
 
+def load_ws_settings(rootdir) -> dict:
+
+    """
+    Workspace settings (e.g. the default compiler cache), stored as yaml
+    inside the marker file
+    """
+
+    import yaml
+
+    ws_file = os.path.join(rootdir, '.forest')
+
+    try:
+        with open(ws_file, 'r') as f:
+            settings = yaml.safe_load(f)
+    except (OSError, yaml.YAMLError):
+        return dict()
+
+    return settings if isinstance(settings, dict) else dict()
+
+
+def save_ws_settings(rootdir, **settings):
+
+    """
+    Update the given workspace settings (None removes a setting)
+    """
+
+    import yaml
+
+    ws_settings = load_ws_settings(rootdir)
+    ws_settings.update(settings)
+    ws_settings = {k: v for k, v in ws_settings.items() if v is not None}
+
+    ws_file = os.path.join(rootdir, '.forest')
+
+    with open(ws_file, 'w') as f:
+        f.write('# forest marker file \n')
+        if ws_settings:
+            yaml.safe_dump(ws_settings, f, default_flow_style=False)
+
+
 def create_ws_venv(rootdir):
     
     venv_name = os.path.basename(rootdir)
@@ -0,0 +1,146 @@
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import typing
+
+from forest.common import proc_utils
+
+
+class JobServer:
+
+    """
+    GNU make jobserver shared by all packages that build at the same time,
+    so that --jobs is a global limit instead of a per-package one.
+
+    The token pool is a named pipe holding one token per job. Forest takes
+    a token before starting a build, which stands for the implicit job slot
+    of its build tool; make and ninja take the others from the pool as
+    needed (MAKEFLAGS --jobserver-auth), so that idle slots flow to the
+    packages that can use them (e.g. the last one still compiling).
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    # size of the token pool (None if disabled), set by main.py
+    jobs = None
+
+    def __init__(self, jobs: int) -> None:
+
+        self.jobs = jobs
+        self.lock = threading.Lock()
+
+        # whether each ninja executable supports the jobserver
+        self.ninja_support = dict()
+        self.tmpdir = tempfile.mkdtemp(prefix='forest-jobserver-')
+        self.fifo = os.path.join(self.tmpdir, 'fifo')
+        os.mkfifo(self.fifo, 0o600)
+
+        # make < 4.4 only accepts a pair of file descriptors, while
+        # ninja requires a named pipe: both refer to the same pool
+        self.rfd = os.open(self.fifo, os.O_RDWR)
+        self.wfd = os.open(self.fifo, os.O_RDWR)
+
+        # used to take tokens without waiting
+        self.nbfd = os.open(self.fifo, os.O_RDWR | os.O_NONBLOCK)
+
+        os.write(self.wfd, b'+' * jobs)
+
+        atexit.register(self.close)
+
+    @classmethod
+    def instance(cls) -> typing.Optional['JobServer']:
+        """
+        The jobserver, or None if it is disabled
+        """
+        with cls._instance_lock:
+            if cls.jobs is None:
+                return None
+            if cls._instance is None:
+                cls._instance = cls(cls.jobs)
+        return cls._instance
+
+    @property
+    def pass_fds(self) -> typing.Tuple[int, int]:
+        """
+        File descriptors to be inherited by build processes
+        """
+        return (self.rfd, self.wfd)
+
+    def acquire(self, n: int = 1) -> bytes:
+        """
+        Take n tokens from the pool, waiting until they are available
+        """
+
+        if n == 1:
+            return os.read(self.rfd, 1)
+
+        # one build at a time, so that two builds never wait for the
+        # tokens held by each other
+        with self.lock:
+            return b''.join(os.read(self.rfd, 1) for _ in range(n))
+
+    def try_acquire(self) -> typing.Optional[bytes]:
+        """
+        Take a token from the pool if one is available, without waiting
+        """
+        try:
+            return os.read(self.nbfd, 1) or None
+        except BlockingIOError:
+            return None
+
+    def release(self, token: bytes):
+        """
+        Give token(s) back to the pool
+        """
+        os.write(self.wfd, token)
+
+    def supports(self, generator: str = None, make_program: str = None) -> bool:
+        """
+        True if the build tool of the given generator takes part in the
+        jobserver (make always does, ninja from version 1.13)
+        """
+
+        if generator is None or 'Ninja' not in generator:
+            return True
+
+        exe = make_program or 'ninja'
+
+        with self.lock:
+            if exe not in self.ninja_support:
+                version = proc_utils.get_output([exe, '--version'], print_on_error=False)
+                try:
+                    major, minor = (int(v) for v in version.split('.')[:2])
+                    self.ninja_support[exe] = (major, minor) >= (1, 13)
+                except (AttributeError, ValueError):
+                    self.ninja_support[exe] = False
+            return self.ninja_support[exe]
+
+    def build_env(self, env: dict = None, generator: str = None) -> dict:
+        """
+        Environment of a build process, i.e. MAKEFLAGS pointing to the pool
+        (the build tool must be called without an explicit -j)
+        """
+
+        env = dict(env if env is not None else os.environ)
+
+        if generator is not None and 'Ninja' in generator:
+            auth = f'fifo:{self.fifo}'
+        else:
+            auth = f'{self.rfd},{self.wfd}'
+
+        env['MAKEFLAGS'] = f' -j{self.jobs} --jobserver-auth={auth}'
+        env.pop('MFLAGS', None)
+        env.pop('CMAKE_BUILD_PARALLEL_LEVEL', None)
+
+        return env
+
+    def close(self):
+        for fd in (self.rfd, self.wfd, self.nbfd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
@@ -0,0 +1,258 @@
+import os
+import re
+import threading
+import typing
+
+import psutil
+
+from forest.common.jobserver import JobServer
+from forest.common.print_utils import ProgressReporter
+import forest.common.forest_dirs as _forest_dirs
+
+
+class MemoryGovernor:
+
+    """
+    Keeps the host out of swap while building, by throttling the jobserver
+    (see JobServer) when available memory falls below a reserve.
+
+    A monitor thread polls available memory, and the RSS of each build
+    process tree (cmake --build and its descendants). Below the reserve,
+    all free tokens are taken out of the pool, so that no new job starts;
+    below half the reserve, the most recently started build trees are
+    paused (SIGSTOP). One build is always left running (or about to start,
+    with a token given back to it). When memory recovers by more than the
+    largest job seen so far, paused trees are resumed first, and then
+    tokens are given back one at a time.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    # memory to keep available, as a size (e.g. 2G) or a percentage of
+    # the total memory (None if disabled), set by main.py
+    reserve = None
+
+    # seconds between two samples
+    interval = 0.5
+
+    # memory of a single job, until one has been observed
+    dfl_job_rss = 256 * 1024**2
+
+    def __init__(self, reserve: str, jobserver: JobServer) -> None:
+        self.reserve = parse_size(reserve, total=psutil.virtual_memory().total)
+        self.jobserver = jobserver
+        self.thread = None
+        self.stop_event = threading.Event()
+
+        # tokens taken out of the pool, and paused build trees
+        self.withheld = []
+        self.paused: typing.Dict[int, str] = dict()
+
+        # statistics of this run
+        self.min_available = None
+        self.max_withheld = 0
+        self.pauses = 0
+        self.peak_rss: typing.Dict[str, int] = dict()
+        self.job_rss = 0
+
+    @classmethod
+    def instance(cls) -> typing.Optional['MemoryGovernor']:
+        """
+        The memory governor, or None if it is disabled
+        """
+        with cls._instance_lock:
+            if cls.reserve is None or JobServer.instance() is None:
+                return None
+            if cls._instance is None:
+                cls._instance = cls(cls.reserve, JobServer.instance())
+        return cls._instance
+
+    def start(self):
+        """
+        Start monitoring builds in the background
+        """
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._monitor, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop monitoring, resuming paused builds and giving back every token
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        for pid in list(self.paused):
+            self._resume(pid)
+        while self.withheld:
+            self.jobserver.release(self.withheld.pop())
+
+    def _monitor(self):
+        while not self.stop_event.is_set():
+            try:
+                self._step()
+            except psutil.Error:
+                pass
+            self.stop_event.wait(MemoryGovernor.interval)
+
+    def _step(self):
+
+        available = psutil.virtual_memory().available
+        trees = self._build_trees()
+
+        if self.min_available is None or available < self.min_available:
+            self.min_available = available
+
+        # paused trees that are gone
+        for pid in list(self.paused):
+            if pid not in trees:
+                del self.paused[pid]
+
+        running = [pid for pid in trees if pid not in self.paused]
+
+        # builds cannot progress if all of them are paused, or waiting
+        # for a token to start
+        if self.paused and not running:
+            self._resume(min(self.paused, key=lambda pid: trees[pid][1]))
+            return
+
+        if self.withheld and not running:
+            self.jobserver.release(self.withheld.pop())
+            return
+
+        if available < self.reserve:
+            token = self.jobserver.try_acquire()
+            if token is not None:
+                while token is not None:
+                    self.withheld.append(token)
+                    token = self.jobserver.try_acquire()
+                self.max_withheld = max(self.max_withheld, len(self.withheld))
+            elif available < self.reserve // 2 and len(running) > 1:
+                newest = max(running, key=lambda pid: trees[pid][1])
+                self._pause(newest, trees[newest][0], available)
+            return
+
+        if available < self.reserve + (self.job_rss or MemoryGovernor.dfl_job_rss):
+            return
+
+        if self.paused:
+            self._resume(min(self.paused, key=lambda pid: trees[pid][1]))
+        elif self.withheld:
+            self.jobserver.release(self.withheld.pop())
+
+    def _build_trees(self) -> typing.Dict[int, typing.Tuple[str, float]]:
+        """
+        Build processes started by forest, with their package and start
+        time; peak RSS of each package and job is updated on the way
+        """
+
+        ret = dict()
+
+        for proc in psutil.Process(os.getpid()).children():
+            try:
+                cmdline = proc.cmdline()
+                if '--build' not in cmdline[:-1]:
+                    continue
+                pkgname = _package_of(cmdline[cmdline.index('--build') + 1])
+                procs = [proc] + proc.children(recursive=True)
+                ret[proc.pid] = (pkgname, proc.create_time())
+            except (psutil.Error, IndexError):
+                continue
+
+            rss = 0
+            for p in procs:
+                try:
+                    p_rss = p.memory_info().rss
+                    if not p.children():
+                        self.job_rss = max(self.job_rss, p_rss)
+                    rss += p_rss
+                except psutil.Error:
+                    continue
+
+            self.peak_rss[pkgname] = max(self.peak_rss.get(pkgname, 0), rss)
+
+        return ret
+
+    def _tree(self, pid: int) -> typing.List[psutil.Process]:
+        proc = psutil.Process(pid)
+        return [proc] + proc.children(recursive=True)
+
+    def _pause(self, pid: int, pkgname: str, available: int):
+        try:
+            for p in self._tree(pid):
+                p.suspend()
+        except psutil.Error:
+            return
+        self.paused[pid] = pkgname
+        self.pauses += 1
+        ProgressReporter.print(pkgname, f'build paused, low memory ({format_size(available)} available)')
+
+    def _resume(self, pid: int):
+        pkgname = self.paused.pop(pid)
+        try:
+            for p in self._tree(pid):
+                p.resume()
+        except psutil.Error:
+            return
+        ProgressReporter.print(pkgname, 'build resumed')
+
+    def summary(self) -> str:
+
+        ret = f'[forest] memory: reserve {format_size(self.reserve)}'
+
+        if self.min_available is not None:
+            ret += f', lowest available {format_size(self.min_available)}'
+
+        ret += f', up to {self.max_withheld} job{"s" if self.max_withheld != 1 else ""} withheld, ' \
+               f'{self.pauses} pause{"s" if self.pauses != 1 else ""}'
+
+        for pkgname, rss in sorted(self.peak_rss.items()):
+            ret += f'\n[{pkgname}] peak build memory {format_size(rss)}'
+
+        return ret
+
+
+def _package_of(builddir: str) -> str:
+    """
+    Package owning a build directory, i.e. its first path component under
+    the build root (packages with several cmake projects build each one in
+    a subdirectory)
+    """
+    rel = os.path.relpath(os.path.realpath(builddir), os.path.realpath(_forest_dirs.buildroot))
+    if rel == os.curdir or rel.startswith(os.pardir):
+        return os.path.basename(builddir.rstrip(os.sep))
+    return rel.split(os.sep)[0]
+
+
+_size_regex = re.compile(r'^\s*(\d+(\.\d+)?)\s*([KMGT]?)(i?B)?\s*$', re.IGNORECASE)
+
+
+def parse_size(size: str, total: int) -> int:
+    """
+    Number of bytes from a size (e.g. 512M, 2G, 1.5GiB), or from a
+    percentage of total (e.g. 10%)
+
+    Raises:
+        ValueError: invalid size
+    """
+
+    size = str(size).strip()
+
+    if size.endswith('%'):
+        return int(total * float(size[:-1]) / 100)
+
+    m = _size_regex.match(size)
+    if m is None:
+        raise ValueError(f'invalid size "{size}"')
+
+    return int(float(m.group(1)) * 1024**' KMGT'.index(m.group(3).upper() or ' '))
+
+
+def format_size(size: int) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GiB'
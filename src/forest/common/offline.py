@@ -0,0 +1,62 @@
+"""
+Offline mode (forest grow --offline): git sources are cloned from the
+local mirror cache only, and system, pip and deb dependencies must be
+already installed. Missing artifacts are listed before anything is built.
+"""
+
+import os
+from typing import List, Tuple
+
+from forest.common.print_utils import ProgressReporter
+
+# set by main.py when --offline is passed
+enabled = False
+
+
+def missing_artifacts(packages, srcroot: str) -> List[Tuple[str, str]]:
+    """
+    Check that every given package can be installed without network access
+
+    Returns:
+        List[Tuple[str, str]]: (package name, description) of every missing artifact
+    """
+
+    from forest.common import sys_deps
+
+    ret = []
+
+    for pkg in packages:
+
+        srcdir = os.path.join(srcroot, pkg.name)
+
+        for p in sys_deps.missing_system_deps(pkg.system_depends):
+            ret.append((pkg.name, f'system package {p}'))
+
+        for p in sys_deps.missing_pip_deps(pkg.pip_depends):
+            ret.append((pkg.name, f'pip package {p}'))
+
+        missing = pkg.fetcher.missing_offline(srcdir)
+        if missing is not None:
+            ret.append((pkg.name, missing))
+
+    return ret
+
+
+def check(packages, srcroot: str) -> bool:
+    """
+    Print every missing artifact of the given packages
+
+    Returns:
+        bool: True if nothing is missing
+    """
+
+    missing = missing_artifacts(packages, srcroot)
+
+    if not missing:
+        return True
+
+    print('[forest] offline mode: the following artifacts are not available locally')
+    for pkgname, descr in missing:
+        ProgressReporter.print(pkgname, descr)
+
+    return False
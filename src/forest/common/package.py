@@ -5,7 +5,8 @@ import os
 from .fetch_handler import FetchHandler
 from .build_handler import BuildHandler
 from forest.common.eval_handler import EvalHandler
-from forest.common.recipe import Cookbook
+from forest.common.recipe_index import RecipeIndex
+from forest.common.plan_cache import PlanCache
 
 
 class BasicPackage:
@@ -98,12 +99,21 @@ class Package(BasicPackage):
         object is constructed based on its content.
 
         Raises:
-            RuntimeError: recipe file does not exist
+            FileNotFoundError: recipe file does not exist
+            ValueError: invalid recipe
         """
 
-        filename = os.path.join(Cookbook.get_recipe_path(), name + '.yaml')
-        if not os.path.exists(filename):
-            # TODO more specific exception
-            raise FileNotFoundError(f'{filename} does not exist')
-        return Package.from_file(file=filename)
+        # use the resolved package from the previous run, if still valid
+        plan = PlanCache.instance()
+        pkg = plan.get(name)
+        if pkg is not None:
+            return pkg
+
+        # parsed recipes are taken from the workspace recipe index
+        yaml_dict = RecipeIndex.instance().get(name)
+        with plan.record(name):
+            pkg = Package.from_yaml(name=name, recipe=yaml_dict)
+        plan.add(name, pkg)
+
+        return pkg
 
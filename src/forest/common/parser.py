@@ -5,13 +5,18 @@ import typing
 
 
 make_regrex_pattern = r'\[((?:\s|\d)(?:\s|\d)\d)%\]'
+ninja_regrex_pattern = r'^\[(\d+)/(\d+)\] '
 git_regrex_pattern = r'Receiving objects: ((?:\s|\d)(?:\s|\d)\d)% \('
 
 
 def find_progress(line: str, regrex_pattern) -> float:
     match = re.search(regrex_pattern, line)
     if match is not None:
-        progress = float(match.groups()[0])
+        groups = match.groups()
+        # finished/total edges (e.g. ninja)
+        if len(groups) == 2:
+            return 100.0 * float(groups[0]) / max(1.0, float(groups[1]))
+        progress = float(groups[0])
         return progress
     
 
@@ -0,0 +1,236 @@
+import contextlib
+import os
+import threading
+import typing
+from collections.abc import Mapping
+
+from forest.common import cache_utils
+from forest.common.eval_cache import EvalCache
+from forest.common.recipe import Cookbook
+from forest.common.recipe_index import RecipeIndex
+import forest.common.forest_dirs as _forest_dirs
+
+# modules defining the objects stored inside the plan
+_plan_modules = ('package.py', 'fetch_handler.py', 'build_handler.py', 'plan_cache.py')
+
+# files the ubuntu_release local depends on
+_release_files = ('/etc/os-release', '/etc/lsb-release')
+
+
+class PlanCache:
+
+    """
+    Cache of the resolved build plan, i.e. of the Package objects obtained by
+    evaluating recipes (depends_if, args_if, tag_if, skip_if, ...), stored
+    inside the workspace.
+
+    While a recipe is evaluated, the inputs of the evaluation are recorded:
+    the recipe file, and the environment variables and shell outputs used by
+    its expressions. A saved package is used by the next run only if none of
+    its inputs changed, which is checked without running anything: shell
+    outputs must still be memoized (see EvalCache), so that packages using
+    shell commands without a ttl are evaluated on every run. The whole plan
+    is discarded if modes, config variables or clone overrides change.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    # bump this when the plan format changes
+    version = 2
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.dirty = False
+        self.recording = None
+        self.packages = dict()
+        self.inputs = dict()
+
+        # inputs recorded for each package, until it is added
+        self.recorded = dict()
+
+    @classmethod
+    def instance(cls) -> 'PlanCache':
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(os.path.join(_forest_dirs.cachedir, 'build_plan.pickle'))
+        return cls._instance
+
+    def get(self, name: str):
+        """
+        Return the resolved package with the given name, or None if it is
+        not part of a valid plan
+        """
+        with self.lock:
+            if not self.loaded:
+                self._load()
+            return self.packages.get(name)
+
+    def add(self, name: str, pkg):
+        """
+        Add a package that was resolved while recording
+        """
+        with self.lock:
+            info = RecipeIndex.instance().file_info(name)
+            if info is None or info[1] is None:
+                return
+            inputs = self.recorded.pop(name, None)
+            if inputs is None or inputs['volatile']:
+                return
+            inputs['recipe'] = info
+            self.inputs[name] = inputs
+            self.packages[name] = pkg
+            self.dirty = True
+
+    def save(self):
+        """
+        Save the plan, if new packages were resolved
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            plan = {
+                'version': PlanCache.version,
+                'globals': self._globals(),
+                'inputs': self.inputs,
+                'packages': self.packages
+            }
+            cache_utils.dump_pickle(self.path, plan)
+            self.dirty = False
+
+    @contextlib.contextmanager
+    def record(self, name: str):
+        """
+        Record the inputs of the evaluations carried out within this context,
+        as the inputs of the package with the given name
+        """
+        with self.lock:
+            self.recording = {'env': dict(), 'shell': dict(), 'volatile': False}
+            try:
+                yield
+            finally:
+                self.recorded[name] = self.recording
+                self.recording = None
+
+    def environ(self) -> typing.Mapping[str, str]:
+        """
+        The environment, whose reads are recorded while recording
+        """
+        if self.recording is not None:
+            return _RecordedEnviron(self)
+        return os.environ
+
+    def record_env(self, key: str, value: typing.Optional[str]):
+        if self.recording is not None:
+            self.recording['env'][key] = value
+
+    def record_shell(self, key: typing.Optional[str], ttl: float, env_keys: typing.Sequence[str], output: str):
+        """
+        Record the output of a shell command, memoized with the given key
+        (None if it is not memoized, which makes the package volatile)
+        """
+        if self.recording is None:
+            return
+        if key is None:
+            self.recording['volatile'] = True
+        else:
+            self.recording['shell'][(key, ttl, tuple(env_keys))] = output
+
+    def _load(self):
+
+        self.loaded = True
+
+        # memoized evaluations are bypassed, the plan will be refreshed
+        if not EvalCache.enabled:
+            return
+
+        plan = cache_utils.load_pickle(self.path)
+
+        if not isinstance(plan, dict) or plan.get('version') != PlanCache.version:
+            return
+
+        if plan['globals'] != self._globals():
+            return
+
+        # packages are invalidated one by one
+        for name, inputs in plan['inputs'].items():
+            if self._inputs_valid(inputs):
+                self.inputs[name] = inputs
+                self.packages[name] = plan['packages'][name]
+            else:
+                self.dirty = True
+
+    @staticmethod
+    def _globals():
+        """
+        Inputs of the evaluation that do not depend on the recipe
+        """
+        from forest.common.config_handler import ConfigHandler
+        from forest.common.eval_handler import EvalHandler
+        from forest.common.fetch_handler import GitFetcher
+
+        moddir = os.path.dirname(__file__)
+        files = [os.path.join(moddir, m) for m in _plan_modules] + list(_release_files)
+
+        return {
+            'rootdir': _forest_dirs.rootdir,
+            'recipe_path': Cookbook.get_recipe_path(),
+            'modes': sorted(EvalHandler.modes),
+            'config': dict(ConfigHandler.instance().__dict__),
+            'tag_overrides': dict(GitFetcher.tag_overrides),
+            'proto_override': GitFetcher.proto_override,
+            'files': {f: cache_utils.mtime_ns(f) for f in files}
+        }
+
+    @staticmethod
+    def _inputs_valid(inputs) -> bool:
+        """
+        Check the inputs of a package, without running anything
+        """
+
+        path, mtime, size = inputs['recipe']
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if st.st_mtime_ns != mtime or st.st_size != size:
+            return False
+
+        for k, v in inputs['env'].items():
+            if os.environ.get(k) != v:
+                return False
+
+        # shell outputs must still be memoized, with the same value
+        for (key, ttl, env_keys), output in inputs['shell'].items():
+            if EvalCache.instance().lookup(key, ttl, env_keys) != output:
+                return False
+
+        return True
+
+
+class _RecordedEnviron(Mapping):
+
+    """
+    Read-only view of os.environ recording every lookup into the plan
+    """
+
+    def __init__(self, plan: PlanCache) -> None:
+        self.plan = plan
+
+    def __getitem__(self, key):
+        value = os.environ.get(key)
+        self.plan.record_env(key, value)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __iter__(self):
+        return iter(os.environ)
+
+    def __len__(self):
+        return len(os.environ)
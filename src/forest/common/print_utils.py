@@ -29,7 +29,9 @@ class ProgressReporter:
         indent = '..' * (cls.call_count - 1)
         fmt_text = f'[{pkg}] {text}'
         fmt_text = textwrap.indent(text=fmt_text, prefix=indent)
-        print(fmt_text, **kwargs)
+        # single write, so that lines from concurrent packages do not mix
+        end = kwargs.pop('end', '\n')
+        print(fmt_text + end, end='', **kwargs)
 
     
     @classmethod
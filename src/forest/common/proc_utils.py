@@ -3,6 +3,7 @@ import sys
 import typing
 import progressbar
 import os
+import threading
 
 from forest.common import print_utils
 from forest.common.parser import update_progress_bar
@@ -10,6 +11,12 @@ from forest.common.forest_dirs import rootdir
 
 call_process_verbose = False
 
+# progress bars are disabled when several processes run concurrently
+progress_bar_enabled = True
+
+# serializes access to the shared log file
+_log_lock = threading.Lock()
+
 
 def call_process(args: typing.List[str] = None, 
                  cwd='.', 
@@ -18,7 +25,9 @@ def call_process(args: typing.List[str] = None,
                  print_on_error=True, 
                  shell: bool=False,
                  timeout=None,
-                 update_regrex_pattern=None
+                 update_regrex_pattern=None,
+                 env=None,
+                 pass_fds=()
                  ) -> bool:    
     
     # convert args to string
@@ -44,7 +53,9 @@ def call_process(args: typing.List[str] = None,
                         cwd=cwd, 
                         input=input, 
                         shell=shell, 
-                        executable=executable)
+                        executable=executable,
+                        env=env,
+                        pass_fds=pass_fds)
 
         print(f'returned {proc.returncode}')
 
@@ -58,6 +69,8 @@ def call_process(args: typing.List[str] = None,
                                 cwd=cwd, 
                                 shell=shell, 
                                 executable=executable,
+                                env=env,
+                                pass_fds=pass_fds,
                                 universal_newlines=True)
         
         lines = []
@@ -65,14 +78,15 @@ def call_process(args: typing.List[str] = None,
             lines = _progress_bar(pr, update_regrex_pattern)
             
         if pr.wait(timeout=timeout) != 0:
-            if lines:
-                print_utils.log_file.writelines(lines)
-            else:
-                print_utils.log_file.write(pr.stdout.read())
-            
-            if print_on_error and not verbose:
-                print_utils.log_file.seek(0)  # go to the beginning of the file
-                print(print_utils.log_file.read(), file=sys.stderr)
+            with _log_lock:
+                if lines:
+                    print_utils.log_file.writelines(lines)
+                else:
+                    print_utils.log_file.write(pr.stdout.read())
+                
+                if print_on_error and not verbose:
+                    print_utils.log_file.seek(0)  # go to the beginning of the file
+                    print(print_utils.log_file.read(), file=sys.stderr)
 
             return False
         
@@ -89,9 +103,11 @@ def call_process(args: typing.List[str] = None,
         return False
 
 def _progress_bar(process, regrex_pattern):
-    pbar = progressbar.ProgressBar(maxval=100, \
-    widgets=[progressbar.Bar('=', '[', ']'), ' ', progressbar.Percentage()])
-    pbar.start()
+    pbar = None
+    if progress_bar_enabled:
+        pbar = progressbar.ProgressBar(maxval=100, \
+        widgets=[progressbar.Bar('=', '[', ']'), ' ', progressbar.Percentage()])
+        pbar.start()
     lines = []
 
     while True:
@@ -99,13 +115,15 @@ def _progress_bar(process, regrex_pattern):
         lines.append(line)
 
         if not line:
-            pbar.finish()
+            if pbar is not None:
+                pbar.finish()
             return lines
-            
-        update_progress_bar(line, pbar=pbar, regrex_pattern=regrex_pattern)
+        
+        if pbar is not None:
+            update_progress_bar(line, pbar=pbar, regrex_pattern=regrex_pattern)
 
 
-def get_output(args, cwd='.', input=None, verbose=False, print_on_error=True, shell=False):
+def get_output(args, cwd='.', input=None, verbose=False, print_on_error=True, shell=False, env=None):
 
     if verbose or call_process_verbose:
         if shell:
@@ -115,7 +133,7 @@ def get_output(args, cwd='.', input=None, verbose=False, print_on_error=True, sh
 
     try:
         # check_output will not print
-        out = subprocess.check_output(args=args, cwd=cwd, input=input, shell=shell)
+        out = subprocess.check_output(args=args, cwd=cwd, input=input, shell=shell, env=env)
         ret = out.decode().strip()
         if verbose or call_process_verbose:
             print('calling "{}" returned "{}"'.format(' '.join(args), ret))
@@ -86,6 +86,7 @@ class RecipeSource:
 class Cookbook:
     basedir: str
     _recipes_dirname: str = 'recipes'
+    _recipe_paths: typing.Dict[str, str] = dict()
 
     @classmethod
     def set_recipe_basedir(cls, path):
@@ -104,7 +105,14 @@ class Cookbook:
 
     @classmethod
     def get_recipe_path(cls):
-        return _find_path_to_dir(cls.get_recipe_basedir(), cls._recipes_dirname)
+        # the recipes folder is searched once per basedir
+        basedir = cls.get_recipe_basedir()
+        path = cls._recipe_paths.get(basedir)
+        if path is None:
+            path = _find_path_to_dir(basedir, cls._recipes_dirname)
+            if path is not None:
+                cls._recipe_paths[basedir] = path
+        return path
 
     @classmethod
     def get_available_recipes(cls) -> typing.List[str]:
@@ -0,0 +1,155 @@
+import copy
+import os
+import threading
+
+import yaml
+
+from forest.common import cache_utils
+from forest.common.recipe import Cookbook
+import forest.common.forest_dirs as _forest_dirs
+
+# use libyaml's C loader when available
+_yaml_loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+class RecipeIndex:
+
+    """
+    Binary index of the recipes folder stored inside the workspace, mapping
+    each recipe name to its file path, modification time, and parsed content.
+    On load, only recipe files whose mtime (or size) changed are parsed again.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    # bump this when the index format changes
+    version = 1
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.recipe_path = None
+        self.entries = dict()
+        self.lock = threading.Lock()
+        self.updated = False
+
+    @classmethod
+    def instance(cls) -> 'RecipeIndex':
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(os.path.join(_forest_dirs.cachedir, 'recipe_index.pickle'))
+        return cls._instance
+
+    def get(self, name: str) -> dict:
+        """
+        Return the parsed content of the given recipe
+
+        Raises:
+            FileNotFoundError: recipe file does not exist
+        """
+
+        with self.lock:
+            if not self.updated:
+                self._update()
+
+            entry = self.entries.get(name)
+
+        if entry is None:
+            raise FileNotFoundError(f'recipe {name} does not exist')
+
+        # recipe could not be parsed, raise the parser error
+        if entry['data'] is None:
+            with open(entry['path'], 'r') as f:
+                yaml.load(f, Loader=_yaml_loader)
+
+        # parsed content is modified while evaluating the recipe
+        return copy.deepcopy(entry['data'])
+
+    def file_info(self, name: str):
+        """
+        Return path, mtime and size of the recipe file as it was parsed,
+        or None if the recipe is not indexed
+        """
+        with self.lock:
+            entry = self.entries.get(name)
+        if entry is None:
+            return None
+        return entry['path'], entry['mtime'], entry['size']
+
+    def _load(self):
+        index = cache_utils.load_pickle(self.path)
+        if isinstance(index, dict) and index.get('version') == RecipeIndex.version:
+            return index
+        return None
+
+    def _save(self):
+        index = {
+            'version': RecipeIndex.version,
+            'recipe_path': self.recipe_path,
+            'entries': self.entries
+        }
+        cache_utils.dump_pickle(self.path, index)
+
+    def _update(self):
+        """
+        Bring the index up to date with the recipes folder
+        """
+
+        self.updated = True
+        self.recipe_path = Cookbook.get_recipe_path()
+
+        if self.recipe_path is None:
+            self.entries = dict()
+            return
+
+        # entries from a previous run are reused if the folder is the same
+        index = self._load()
+        old_entries = dict()
+        if index is not None and index['recipe_path'] == self.recipe_path:
+            old_entries = index['entries']
+
+        changed = len(old_entries) == 0
+        entries = dict()
+
+        for f in os.listdir(self.recipe_path):
+
+            name, ext = os.path.splitext(f)
+            if ext != '.yaml':
+                continue
+
+            path = os.path.join(self.recipe_path, f)
+
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+
+            old = old_entries.get(name)
+            if old is not None and old['mtime'] == st.st_mtime_ns and old['size'] == st.st_size:
+                entries[name] = old
+                continue
+
+            # invalid recipes are parsed again on the next run
+            try:
+                with open(path, 'r') as fh:
+                    data = yaml.load(fh, Loader=_yaml_loader)
+                if data is None:
+                    data = dict()
+            except yaml.YAMLError:
+                data = None
+
+            entries[name] = {
+                'path': path,
+                'mtime': st.st_mtime_ns if data is not None else None,
+                'size': st.st_size,
+                'data': data
+            }
+            changed = True
+
+        if set(entries.keys()) != set(old_entries.keys()):
+            changed = True
+
+        self.entries = entries
+
+        if changed:
+            self._save()
@@ -0,0 +1,321 @@
+import concurrent.futures
+import os
+import psutil
+from typing import Dict, List
+
+from forest.cmake_tools import CmakeTools
+from forest.common import package
+from forest.common.build_handler import BuildResources
+from forest.common.plan_cache import PlanCache
+from forest.common import proc_utils
+from forest.common.print_utils import ProgressReporter
+from forest.common.recipe import Cookbook
+
+
+class InstallScheduler:
+
+    """
+    Resolve the full dependency graph of the requested recipes up front,
+    and then install its packages on a pool of worker slots, starting
+    each package as soon as all of its dependencies have been installed.
+    Optionally, sources are fetched ahead of time on a separate pool, and
+    each package waits for its own sources only.
+
+    Among the packages that can start, the ones with the longest chain of
+    dependents (weighted by their build.resources weight) go first, so
+    that large packages start early. Exclusive packages build alone, and
+    packages whose memory (memory_per_job times their jobs) does not fit
+    next to the running ones wait for them.
+    """
+
+    def __init__(self,
+                 install_fn,
+                 buildroot: str,
+                 no_deps=False,
+                 parallel_packages=1,
+                 fetch_fn=None,
+                 fetch_jobs=0,
+                 jobs=1) -> None:
+        """
+        Construct the scheduler
+
+        Args:
+            install_fn (callable): function installing a single resolved package,
+                returning a success flag
+            buildroot (str): the workspace build root
+            no_deps (bool, optional): skip dependency resolution. Defaults to False.
+            parallel_packages (int, optional): number of packages that can be
+                installed at the same time. Defaults to 1.
+            fetch_fn (callable, optional): function fetching the sources of a
+                single resolved package, returning a success flag, or None if
+                the package does not need to be prefetched. Defaults to None.
+            fetch_jobs (int, optional): number of packages that can be fetched
+                at the same time, ahead of their build (0 disables prefetching).
+                Defaults to 0.
+            jobs (int, optional): number of jobs of each build, used to
+                estimate its memory. Defaults to 1.
+        """
+        self.install_fn = install_fn
+        self.buildroot = buildroot
+        self.no_deps = no_deps
+        self.parallel_packages = max(1, int(parallel_packages))
+        self.fetch_fn = fetch_fn
+        self.fetch_jobs = max(0, int(fetch_jobs)) if fetch_fn is not None else 0
+        self.jobs = max(1, int(jobs))
+
+        # pending fetches of prefetched packages
+        self.fetches: Dict[str, concurrent.futures.Future] = dict()
+
+        # resolved packages, in depth-first post-order
+        self.packages: Dict[str, package.Package] = dict()
+
+        # dependencies of each package that must be installed before it,
+        # together with the verb used to report a failure
+        self.depends: Dict[str, Dict[str, str]] = dict()
+
+        # packages that could not be resolved
+        self.unresolved = set()
+
+    def resolve(self, pkgs: List[str]):
+        """
+        Load the recipes of the given packages and of all their dependencies
+        that must be installed by forest
+        """
+        visiting = set()
+        for pkg in pkgs:
+            self._resolve(pkg, visiting)
+
+        # save newly resolved packages for the next run
+        PlanCache.instance().save()
+
+    def _resolve(self, pkgname: str, visiting: set):
+
+        if pkgname in self.packages or pkgname in self.unresolved:
+            return
+
+        # custom print
+        pprint = ProgressReporter.get_print_fn(pkgname)
+
+        if pkgname in visiting:
+            pprint('circular dependency detected')
+            self.unresolved.add(pkgname)
+            return
+
+        # retrieve package info from recipe
+        try:
+            pkg = package.Package.from_name(name=pkgname)
+        except FileNotFoundError:
+            pprint(f'recipe file not found (searched in {Cookbook.get_recipe_path()})')
+            self.unresolved.add(pkgname)
+            return
+        except ValueError as e:
+            pprint(f'invalid recipe: {e}')
+            self.unresolved.add(pkgname)
+            return
+
+        visiting.add(pkgname)
+        depends = dict()
+
+        for dep in pkg.depends:
+
+            # if no-deps mode, skip dependency installation
+            if self.no_deps:
+                pprint(f'skipping dependency {dep}')
+                continue
+
+            # if dependency is built by this ws, trigger build
+            if os.path.exists(os.path.join(self.buildroot, dep)):
+                pprint(f'depends on {dep} -> build found, building..')
+                depends[dep] = 'build'
+            elif not CmakeTools.find_package(dep):
+                pprint(f'depends on {dep} -> not found, installing..')
+                depends[dep] = 'install'
+            else:
+                # dependency found and not built by forest -> nothing to do
+                pprint(f'depends on {dep} -> found')
+                continue
+
+            self._resolve(dep, visiting)
+
+        visiting.discard(pkgname)
+
+        # part of a dependency cycle
+        if pkgname in self.unresolved:
+            return
+
+        self.packages[pkgname] = pkg
+        self.depends[pkgname] = depends
+
+    def run(self, pkgs: List[str]) -> bool:
+        """
+        Resolve and install the given packages.
+
+        Returns:
+            bool: True if all requested packages were installed
+        """
+
+        self.resolve(pkgs)
+
+        # progress bars from concurrent processes would garble the terminal
+        if self.parallel_packages > 1 or (self.fetch_jobs > 0 and len(self.packages) > 1):
+            proc_utils.progress_bar_enabled = False
+
+        if self.fetch_jobs == 0:
+            return self._run(pkgs)
+
+        # start fetching all sources as soon as the plan is known, so that
+        # clones overlap with the build of packages whose sources arrived
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.fetch_jobs) as fetcher:
+            try:
+                for pkgname, pkg in self.packages.items():
+                    future = fetcher.submit(self.fetch_fn, pkg)
+                    self.fetches[pkgname] = future
+                return self._run(pkgs)
+            finally:
+                # packages that were not needed anymore are not fetched
+                for future in self.fetches.values():
+                    future.cancel()
+
+    def _run(self, pkgs: List[str]) -> bool:
+
+        done = dict()
+        running = dict()
+
+        # highest priority first (dependencies before dependents otherwise)
+        priority = self._priority()
+        pending = sorted(self.packages.keys(), key=lambda p: -priority[p])
+
+        # memory that builds can take, and packages that were told to wait
+        memory_budget = psutil.virtual_memory().available
+        waiting = set()
+
+        for pkgname in self.unresolved:
+            done[pkgname] = False
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.parallel_packages) as executor:
+
+            while pending or running:
+
+                # schedule every package whose dependencies are done
+                scheduled = False
+
+                for pkgname in list(pending):
+
+                    if len(running) >= self.parallel_packages:
+                        break
+
+                    # an exclusive package is building
+                    if any(self._resources(p).exclusive for p in running.values()):
+                        break
+
+                    state = self._dependency_state(pkgname, done)
+
+                    if state is None:
+                        continue
+
+                    resources = self._resources(pkgname)
+                    pprint = ProgressReporter.get_print_fn(pkgname)
+
+                    # wait for running packages to finish, without letting
+                    # others go first
+                    if state and resources.exclusive and running:
+                        if pkgname not in waiting:
+                            pprint('waiting to build alone')
+                            waiting.add(pkgname)
+                        break
+
+                    memory = resources.memory(self.jobs)
+                    memory_used = sum(self._resources(p).memory(self.jobs) for p in running.values())
+
+                    if state and running and memory_used + memory > memory_budget:
+                        if pkgname not in waiting:
+                            pprint('waiting for memory to build')
+                            waiting.add(pkgname)
+                        continue
+
+                    pending.remove(pkgname)
+                    scheduled = True
+
+                    if not state:
+                        done[pkgname] = False
+                        continue
+
+                    pkg = self.packages[pkgname]
+                    future = executor.submit(self._install, pkg)
+                    running[future] = pkgname
+
+                if not running:
+                    if scheduled:
+                        continue
+
+                    # nothing can be scheduled anymore (should not happen)
+                    for pkgname in pending:
+                        done[pkgname] = False
+                    break
+
+                finished, _ = concurrent.futures.wait(running.keys(),
+                                                      return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in finished:
+                    pkgname = running.pop(future)
+                    done[pkgname] = future.result()
+
+        return all(done.get(pkg, False) for pkg in pkgs)
+
+    def _resources(self, pkgname: str) -> BuildResources:
+        return self.packages[pkgname].builder.resources
+
+    def _priority(self) -> Dict[str, float]:
+        """
+        Weight of each package plus the largest priority among its
+        dependents, i.e. the expected duration of the longest chain of
+        builds that starts with the package
+        """
+
+        dependents = {pkgname: [] for pkgname in self.packages}
+        for pkgname, depends in self.depends.items():
+            for dep in depends:
+                if dep in dependents:
+                    dependents[dep].append(pkgname)
+
+        ret = dict()
+
+        # dependents come after their dependencies
+        for pkgname in reversed(list(self.packages.keys())):
+            ret[pkgname] = self._resources(pkgname).weight + \
+                max((ret[d] for d in dependents[pkgname]), default=0)
+
+        return ret
+
+    def _install(self, pkg: package.Package) -> bool:
+        """
+        Wait for the sources of the package (if prefetched), and install it
+        """
+
+        fetch = self.fetches.get(pkg.name)
+
+        if fetch is not None and fetch.result() is False:
+            pprint = ProgressReporter.get_print_fn(pkg.name)
+            pprint('failed to fetch package')
+            return False
+
+        return self.install_fn(pkg)
+
+    def _dependency_state(self, pkgname, done):
+        """
+        Returns None if some dependency is still to be installed,
+        False if some dependency failed, True otherwise
+        """
+
+        pprint = ProgressReporter.get_print_fn(pkgname)
+
+        for dep, verb in self.depends[pkgname].items():
+
+            if dep not in done:
+                return None
+
+            if not done[dep]:
+                pprint(f'failed to {verb} dependency {dep}')
+                return False
+
+        return True
@@ -0,0 +1,239 @@
+"""
+In-process emulation of the shell command `/bin/echo "<text>"`, which is
+used to expand environment variables inside recipe strings.
+
+Only the common subset of the shell syntax is handled natively, i.e.
+$VAR, ${VAR}, ${VAR:-default}, ${VAR-default}, ~ and quoting;
+echo() returns None for anything else (command substitution, globbing,
+escapes, other parameter expansions, ...), so that the caller can fall
+back to an actual shell.
+"""
+
+import os
+import pwd
+import re
+import typing
+
+
+class _NeedsShell(Exception):
+    pass
+
+
+_name_re = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+# variables that are set or modified by the shell itself,
+# so that their value differs from the environment
+_shell_vars = frozenset({
+    'BASH', 'BASHOPTS', 'BASHPID', 'BASH_ALIASES', 'BASH_ARGC', 'BASH_ARGV',
+    'BASH_ARGV0', 'BASH_CMDS', 'BASH_COMMAND', 'BASH_LINENO', 'BASH_SOURCE',
+    'BASH_SUBSHELL', 'BASH_VERSINFO', 'BASH_VERSION', 'COLUMNS', 'COMP_WORDBREAKS',
+    'DIRSTACK', 'EPOCHREALTIME', 'EPOCHSECONDS', 'EUID', 'FUNCNAME', 'GROUPS',
+    'HISTCMD', 'HISTFILE', 'HISTFILESIZE', 'HISTSIZE', 'HOSTNAME', 'HOSTTYPE',
+    'IFS', 'LINENO', 'LINES', 'MACHTYPE', 'MAILCHECK', 'OLDPWD', 'OPTARG', 'OPTIND',
+    'OSTYPE', 'PIPESTATUS', 'PPID', 'PS1', 'PS2', 'PS4', 'PWD', 'RANDOM',
+    'SECONDS', 'SHELLOPTS', 'SHLVL', 'SRANDOM', 'UID', '_',
+})
+
+# unquoted characters with a special meaning for the shell
+_unquoted_special = frozenset('\\`*?[]|&;<>(){}#!\n')
+
+# characters that end a tilde prefix
+_tilde_end = frozenset('/ \t')
+
+
+def echo(text: str, env: typing.Mapping[str, str] = None) -> typing.Optional[str]:
+    """
+    Compute the output of `/bin/echo "<text>"` (with surrounding whitespace
+    stripped), or None if the text requires an actual shell.
+
+    Args:
+        text (str): the text to be expanded
+        env (Mapping[str, str], optional): the environment. Defaults to os.environ.
+    """
+
+    if env is None:
+        env = os.environ
+
+    # echo interprets backslash escapes in posix mode
+    if 'POSIXLY_CORRECT' in env:
+        return None
+
+    try:
+        words = _Expander(env).expand('"' + text + '"')
+    except _NeedsShell:
+        return None
+
+    # words that would be parsed as options by echo
+    if words and re.fullmatch(r'-[neE]+', words[0]):
+        return None
+
+    if len(words) == 1 and words[0] in ('--help', '--version'):
+        return None
+
+    return ' '.join(words).strip()
+
+
+class _Expander:
+
+    def __init__(self, env) -> None:
+        self.env = env
+        self.words = []
+        self.word = []
+        self.word_quoted = False
+
+    def expand(self, s: str) -> typing.List[str]:
+
+        i = 0
+        n = len(s)
+        dq = False
+
+        while i < n:
+            c = s[i]
+
+            if dq:
+                if c == '"':
+                    dq = False
+                    i += 1
+                elif c == '$':
+                    value, i = self._parameter(s, i, quoted=True)
+                    self.word.append(value)
+                elif c in '\\`':
+                    raise _NeedsShell()
+                else:
+                    self.word.append(c)
+                    i += 1
+                continue
+
+            if c == '"':
+                dq = True
+                self.word_quoted = True
+                i += 1
+            elif c == "'":
+                j = s.find("'", i + 1)
+                if j < 0:
+                    raise _NeedsShell()
+                self.word.append(s[i+1:j])
+                self.word_quoted = True
+                i = j + 1
+            elif c in ' \t':
+                self._end_word()
+                i += 1
+            elif c == '~' and not self.word and not self.word_quoted:
+                value, i = self._tilde(s, i)
+                self.word.append(value)
+            elif c == '$':
+                value, i = self._parameter(s, i, quoted=False)
+                self._append_split(value)
+            elif c in _unquoted_special:
+                raise _NeedsShell()
+            else:
+                self.word.append(c)
+                i += 1
+
+        # unterminated quote is a shell syntax error
+        if dq:
+            raise _NeedsShell()
+
+        self._end_word()
+
+        return self.words
+
+    def _end_word(self):
+        if self.word or self.word_quoted:
+            self.words.append(''.join(self.word))
+        self.word = []
+        self.word_quoted = False
+
+    def _append_split(self, value):
+        """
+        Append the result of an unquoted expansion, which is split into
+        words and subject to pathname expansion
+        """
+
+        if any(c in value for c in '*?['):
+            raise _NeedsShell()
+
+        for k, piece in enumerate(re.split(r'[ \t\n]+', value)):
+            if k > 0:
+                self._end_word()
+            if piece:
+                self.word.append(piece)
+
+    def _tilde(self, s, i):
+
+        j = i + 1
+        while j < len(s) and s[j] not in _tilde_end:
+            j += 1
+
+        prefix = s[i+1:j]
+
+        if not re.fullmatch(r'[A-Za-z0-9._-]*', prefix):
+            raise _NeedsShell()
+
+        if not prefix:
+            home = self.env.get('HOME')
+            if home is None:
+                home = pwd.getpwuid(os.getuid()).pw_dir
+            return home, j
+
+        try:
+            return pwd.getpwnam(prefix).pw_dir, j
+        except KeyError:
+            return s[i:j], j
+
+    def _parameter(self, s, i, quoted):
+        """
+        Expand the parameter starting at s[i] == '$', and return its
+        value and the index following the expansion
+        """
+
+        nxt = s[i+1] if i + 1 < len(s) else ''
+
+        # $NAME
+        m = _name_re.match(s, i + 1)
+        if m is not None:
+            return self._lookup(m.group(0)), m.end()
+
+        # ${NAME}, ${NAME:-word}, ${NAME-word}
+        if nxt == '{':
+            end = s.find('}', i + 2)
+            if end < 0:
+                raise _NeedsShell()
+
+            content = s[i+2:end]
+            m = _name_re.match(content)
+            if m is None or any(c in content for c in '$`"\'\\{~'):
+                raise _NeedsShell()
+
+            name = m.group(0)
+            op = content[m.end():]
+            value = self._lookup(name)
+
+            if op == '':
+                return value, end + 1
+
+            if op.startswith(':-'):
+                default = op[2:]
+                return (default if not value else value), end + 1
+
+            if op.startswith('-'):
+                default = op[1:]
+                return (default if name not in self.env else value), end + 1
+
+            raise _NeedsShell()
+
+        # special parameters, command substitution, arithmetic expansion
+        if nxt and (nxt.isdigit() or nxt in '@*#?$!-({'):
+            raise _NeedsShell()
+
+        # ansi-c quoting and locale translation
+        if not quoted and nxt in ('\'', '"'):
+            raise _NeedsShell()
+
+        # a lonely $ is literal
+        return '$', i + 1
+
+    def _lookup(self, name):
+        if name in _shell_vars or (name == 'PATH' and name not in self.env):
+            raise _NeedsShell()
+        return self.env.get(name, '')
@@ -0,0 +1,118 @@
+import atexit
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import uuid
+
+from forest.common import proc_utils
+
+
+class ShellSession:
+
+    """
+    A persistent /bin/sh process that runs shell commands on behalf of recipes
+    (e.g. command substitution in recipe strings, the shell() local), so that
+    a new shell is not started for every command. Commands see the same
+    shell as with subprocess(shell=True).
+
+    Commands are sent over a pipe, and each one runs inside a subshell of a
+    session started from a snapshot of the environment, so that commands
+    cannot affect each other. Their output is delimited by a random marker
+    followed by the exit status.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self) -> None:
+        self.env = dict(os.environ)
+        self.cwd = os.getcwd()
+        self.proc = None
+        self.lock = threading.Lock()
+        self.marker = f'__forest_{uuid.uuid4().hex}__'.encode()
+
+    @classmethod
+    def instance(cls) -> 'ShellSession':
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                atexit.register(cls._instance.close)
+        return cls._instance
+
+    def _start(self):
+        self.proc = subprocess.Popen(args=['/bin/sh'],
+                                     stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE,
+                                     cwd=self.cwd,
+                                     env=self.env)
+
+    def close(self):
+        with self.lock:
+            if self.proc is None:
+                return
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.proc.kill()
+            self.proc = None
+
+    def _run(self, cmd: str):
+        """
+        Run cmd, and return its exit status and output
+        """
+
+        script = f'( eval {shlex.quote(cmd)} ) </dev/null; printf "\\n%s %d\\n" {self.marker.decode()} $?\n'
+
+        with self.lock:
+
+            # (re)start the session if needed
+            if self.proc is None or self.proc.poll() is not None:
+                self._start()
+
+            self.proc.stdin.write(script.encode())
+            self.proc.stdin.flush()
+
+            lines = []
+            while True:
+                line = self.proc.stdout.readline()
+
+                # session died
+                if not line:
+                    self.proc = None
+                    return 1, b''.join(lines)
+
+                if line.startswith(self.marker + b' '):
+                    status = int(line[len(self.marker):])
+                    break
+
+                lines.append(line)
+
+        # remove the newline printed before the marker
+        out = b''.join(lines)[:-1]
+
+        return status, out
+
+    def get_output(self, cmd: str, verbose=False, print_on_error=True):
+        """
+        Run cmd through the shell session, and return its output (stripped),
+        or None on failure; this mirrors proc_utils.get_output
+        """
+
+        if verbose or proc_utils.call_process_verbose:
+            print(f'calling shell with command "{cmd}"')
+
+        status, out = self._run(cmd)
+        ret = out.decode().strip()
+
+        if status != 0:
+            if print_on_error:
+                print('stdout: ' + ret, file=sys.stderr)
+            return None
+
+        if verbose or proc_utils.call_process_verbose:
+            print(f'calling "{cmd}" returned "{ret}"')
+
+        return ret
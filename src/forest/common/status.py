@@ -0,0 +1,226 @@
+import concurrent.futures
+import json
+import os
+from typing import List
+
+import yaml
+
+from forest.common import package
+from forest.common import proc_utils
+from forest.common.build_journal import BuildJournal, tree_fingerprint
+from forest.common.eval_handler import EvalHandler
+from forest.common.fetch_handler import GitFetcher
+from forest.common.plan_cache import PlanCache
+from forest.git_tools import GitTools
+
+
+def status(pkgs: List[str],
+           srcroot: str,
+           buildroot: str,
+           installdir: str,
+           lock_file: str,
+           as_json=False,
+           jobs=16) -> bool:
+    """
+    Print the state of the given source repos (all repos inside srcroot
+    if pkgs is empty): local changes, commits ahead/behind of upstream,
+    and whether HEAD matches the recipe tag, the lock file, and the last
+    successful build. Repos are checked concurrently.
+
+    Returns:
+        bool: success flag
+    """
+
+    if not pkgs:
+        pkgs = sorted(d for d in os.listdir(srcroot) if os.path.isdir(os.path.join(srcroot, d)))
+
+    # lock file entries
+    locked = dict()
+    if lock_file is not None and os.path.isfile(lock_file):
+        with open(lock_file, 'r') as f:
+            locked = yaml.safe_load(f) or dict()
+
+    # recipes are evaluated up front, git operations run concurrently
+    recipes = dict()
+    errors = dict()
+    for pkgname in pkgs:
+        try:
+            recipes[pkgname] = package.Package.from_name(name=pkgname)
+        except FileNotFoundError:
+            recipes[pkgname] = None
+        except ValueError as e:
+            recipes[pkgname] = None
+            errors[pkgname] = f'invalid recipe: {e}'
+
+    PlanCache.instance().save()
+
+    def status_fn(pkgname):
+        return _status_single(pkgname=pkgname,
+                              pkg=recipes[pkgname],
+                              srcroot=srcroot,
+                              buildroot=buildroot,
+                              installdir=installdir,
+                              locked=locked.get(pkgname),
+                              error=errors.get(pkgname))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, int(jobs))) as executor:
+        rows = list(executor.map(status_fn, pkgs))
+
+    if as_json:
+        print(json.dumps(rows, indent=2))
+    else:
+        _print_table(rows)
+
+    return True
+
+
+def _status_single(pkgname: str, pkg, srcroot: str, buildroot: str, installdir: str, locked, error=None) -> dict:
+
+    srcdir = os.path.join(srcroot, pkgname)
+    builddir = os.path.join(buildroot, pkgname)
+
+    ret = {
+        'name': pkgname,
+        'branch': None,
+        'head': None,
+        'dirty': None,
+        'upstream': None,
+        'ahead': None,
+        'behind': None,
+        'tag': None,
+        'on_tag': None,
+        'lock': str(locked) if locked is not None else None,
+        'on_lock': None,
+        'build': None,
+        'error': error
+    }
+
+    if error is not None:
+        return ret
+
+    git = GitTools(srcdir)
+
+    if not os.path.isdir(srcdir):
+        ret['error'] = 'not cloned'
+        return ret
+
+    head = git.head()
+
+    if head is None:
+        ret['error'] = 'not a git repository'
+        return ret
+
+    ret['head'] = head
+    ret['branch'] = git.branch()
+    ret['dirty'] = git.is_dirty()
+
+    # commits ahead/behind the branch of origin
+    if ret['branch'] is not None:
+        upstream = git.resolve(f'refs/remotes/origin/{ret["branch"]}')
+        if upstream is not None:
+            ret['upstream'] = f'origin/{ret["branch"]}'
+            ret['ahead'], ret['behind'] = _ahead_behind(srcdir, head, upstream)
+
+    if pkg is not None and isinstance(pkg.fetcher, GitFetcher):
+        ret['tag'] = EvalHandler.instance().process_string(pkg.fetcher.tag)
+        ret['on_tag'] = git.resolve(ret['tag']) == head
+
+    if locked is not None:
+        ret['on_lock'] = str(locked) == head
+
+    ret['build'] = _build_state(pkgname, pkg, srcdir, builddir, installdir, head)
+
+    return ret
+
+
+def _ahead_behind(srcdir: str, head: str, upstream: str):
+
+    if head == upstream:
+        return 0, 0
+
+    out = proc_utils.get_output(['git', 'rev-list', '--left-right', '--count', f'{head}...{upstream}'],
+                                cwd=srcdir,
+                                print_on_error=False)
+
+    try:
+        ahead, behind = out.split()
+        return int(ahead), int(behind)
+    except (AttributeError, ValueError):
+        return None, None
+
+
+def _build_state(pkgname: str, pkg, srcdir: str, builddir: str, installdir: str, head: str) -> str:
+    """
+    Compare the sources with their state at the last successful build
+    (checked-out commit, local changes and untracked files), as grow does
+
+    Returns:
+        str: one of 'built', 'stale', 'never built'
+    """
+
+    journal = BuildJournal.instance()
+    entry = journal.get_entry(pkgname)
+
+    if entry is None:
+        return 'never built'
+
+    if pkg is not None and not all(os.path.exists(p) for p in pkg.builder.outputs(builddir, installdir)):
+        return 'stale'
+
+    # older journal entries record the checked-out commit separately
+    if entry.get('head', head) != head:
+        return 'stale'
+
+    for dep, dep_stamp in entry.get('depends', dict()).items():
+        if journal.get(dep) != dep_stamp:
+            return 'stale'
+
+    if entry.get('tree') is not None and tree_fingerprint(srcdir) != entry['tree']:
+        return 'stale'
+
+    return 'built'
+
+
+def _print_table(rows: List[dict]):
+
+    header = ['PACKAGE', 'BRANCH', 'HEAD', 'LOCAL', 'UPSTREAM', 'TAG', 'LOCK', 'BUILD']
+    table = [header]
+
+    for r in rows:
+
+        if r['error'] is not None:
+            table.append([r['name'], f'({r["error"]})', '-', '-', '-', '-', '-', '-'])
+            continue
+
+        if r['upstream'] is None or r['ahead'] is None:
+            upstream = '-'
+        elif r['ahead'] == 0 and r['behind'] == 0:
+            upstream = '='
+        else:
+            upstream = f'+{r["ahead"]}/-{r["behind"]}'
+
+        if r['tag'] is None:
+            tag = '-'
+        elif r['on_tag']:
+            tag = r['tag']
+        else:
+            tag = f'{r["tag"]} (off)'
+
+        if r['lock'] is None:
+            lock = '-'
+        else:
+            lock = 'ok' if r['on_lock'] else 'off'
+
+        table.append([r['name'],
+                      r['branch'] or '(detached)',
+                      r['head'][:8],
+                      'dirty' if r['dirty'] else 'clean',
+                      upstream,
+                      tag,
+                      lock,
+                      r['build']])
+
+    widths = [max(len(row[i]) for row in table) for i in range(len(header))]
+
+    for row in table:
+        print('  '.join(c.ljust(w) for c, w in zip(row, widths)).rstrip())
@@ -0,0 +1,144 @@
+import concurrent.futures
+import os
+from typing import List
+
+from forest.common import package
+from forest.common import proc_utils
+from forest.common.eval_handler import EvalHandler
+from forest.common.fetch_handler import GitFetcher
+from forest.common.plan_cache import PlanCache
+from forest.common.print_utils import ProgressReporter
+from forest.common.recipe import Cookbook
+from forest.git_tools import GitTools
+
+
+def sync(pkgs: List[str], srcroot: str, jobs: int = 8, fetch=False) -> bool:
+    """
+    Bring the checkouts inside srcroot to the tags resolved from the recipes
+    of the given packages (including tag overrides, e.g. from a forest.lock);
+    repos that drifted are fetched and checked out, up to jobs at the same
+    time, while repos with local changes are left untouched. Branches are
+    compared with the refs of origin as of the last fetch, unless fetch is
+    True (all repos are fetched first).
+
+    Returns:
+        bool: True if all repos are in sync afterwards
+    """
+
+    results = dict()
+    tags = dict()
+
+    # recipes are evaluated up front, git operations run concurrently
+    for pkgname in pkgs:
+        try:
+            pkg = package.Package.from_name(name=pkgname)
+        except FileNotFoundError:
+            pprint = ProgressReporter.get_print_fn(pkgname)
+            pprint(f'recipe file not found (searched in {Cookbook.get_recipe_path()})')
+            results[pkgname] = 'failed'
+            continue
+        except ValueError as e:
+            pprint = ProgressReporter.get_print_fn(pkgname)
+            pprint(f'invalid recipe: {e}')
+            results[pkgname] = 'failed'
+            continue
+
+        if isinstance(pkg.fetcher, GitFetcher):
+            tags[pkgname] = EvalHandler.instance().process_string(pkg.fetcher.tag)
+        else:
+            results[pkgname] = 'ok'
+
+    PlanCache.instance().save()
+
+    # progress bars from concurrent processes would garble the terminal
+    proc_utils.progress_bar_enabled = False
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, int(jobs))) as executor:
+        futures = {executor.submit(_sync_single, pkgname, tag, srcroot, fetch): pkgname 
+                   for pkgname, tag in tags.items()}
+        for future in concurrent.futures.as_completed(futures):
+            results[futures[future]] = future.result()
+
+    moved = [p for p in pkgs if results[p] == 'moved']
+    dirty = [p for p in pkgs if results[p] == 'dirty']
+    failed = [p for p in pkgs if results[p] == 'failed']
+    n_ok = sum(1 for p in pkgs if results[p] == 'ok')
+
+    print(f'[forest] sync: {len(moved)} moved, {n_ok} already in sync, '
+          f'{len(dirty)} with local changes, {len(failed)} failed')
+
+    for title, names in (('moved', moved), ('local changes', dirty), ('failed', failed)):
+        if names:
+            print(f'[forest] {title}: {" ".join(names)}')
+
+    return not dirty and not failed
+
+
+def _sync_single(pkgname: str, tag: str, srcroot: str, fetch=False) -> str:
+    """
+    Sync a single checkout with the given tag (branch, tag, or commit sha),
+    fetching it first if fetch is True
+
+    Returns:
+        str: one of 'ok' (already in sync, or nothing to do), 'moved',
+            'dirty', 'failed'
+    """
+
+    # custom print
+    pprint = ProgressReporter.get_print_fn(pkgname)
+
+    srcdir = os.path.join(srcroot, pkgname)
+
+    if not os.path.isdir(srcdir):
+        pprint('not cloned, skipping')
+        return 'ok'
+
+    git = GitTools(srcdir)
+
+    # compare refs without calling git (unless fetching)
+    head = git.head()
+    if head is None:
+        pprint('not a git repository')
+        return 'failed'
+
+    if fetch and not git.fetch(tag):
+        pprint(f'unable to fetch {tag}')
+        return 'failed'
+
+    target = git.resolve(tag)
+    if target == head:
+        return 'ok'
+
+    if git.is_dirty():
+        pprint(f'has uncommitted local changes, will not check out {tag}')
+        return 'dirty'
+
+    # note: commit shas are resolved as they are, and must be looked up
+    if (target is None or not git.has_commit(target)) and not git.fetch(tag):
+        pprint(f'unable to fetch {tag}')
+        return 'failed'
+
+    if not git.checkout(tag):
+        pprint(f'unable to check out {tag}')
+        return 'failed'
+
+    # a local branch can be behind the one of origin
+    target = git.resolve(tag)
+    if target is not None and git.head() != target and \
+            not proc_utils.call_process(['git', 'merge', '--ff-only', '-q', target], cwd=srcdir):
+        pprint(f'unable to fast-forward to {tag}')
+        return 'failed'
+
+    if os.path.isfile(os.path.join(srcdir, '.gitmodules')) and \
+            not proc_utils.call_process(['git', 'submodule', 'update', '--init', '--recursive',
+                                         '--jobs', GitTools.submodule_jobs], cwd=srcdir):
+        pprint('unable to update submodules')
+        return 'failed'
+
+    new_head = git.head()
+
+    if new_head == head:
+        return 'ok'
+
+    pprint(f'moved {head[:10]} -> {new_head[:10]} ({tag})')
+    return 'moved'
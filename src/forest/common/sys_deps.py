@@ -12,9 +12,12 @@ Supported package managers (``--pkg-manager`` CLI flag):
 
 from __future__ import annotations
 
+import importlib.metadata
+import re
 import shutil
 import sys
 
+from forest.common import offline as _offline
 from forest.common import proc_utils
 from forest.common.eval_handler import EvalHandler
 
@@ -68,10 +71,71 @@ def _system_install_cmd(manager: str, packages: list[str]) -> list[str]:
     return cmds[manager]
 
 
+_dpkg_status_file = '/var/lib/dpkg/status'
+
+
+def _dpkg_installed() -> set[str]:
+    """Names of the packages installed according to the dpkg database (read without calling dpkg)."""
+    installed = set()
+
+    try:
+        with open(_dpkg_status_file, 'r', errors='replace') as f:
+            content = f.read()
+    except OSError:
+        return installed
+
+    for stanza in content.split('\n\n'):
+        name = None
+        status = []
+        for line in stanza.splitlines():
+            if line.startswith('Package:'):
+                name = line[len('Package:'):].strip()
+            elif line.startswith('Status:'):
+                status = line[len('Status:'):].split()
+        if name is not None and status[-1:] == ['installed']:
+            installed.add(name)
+
+    return installed
+
+
+def _pip_name(requirement: str) -> str:
+    """Distribution name of a pip requirement (e.g. 'numpy>=1.20' -> 'numpy')."""
+    return re.match(r'[A-Za-z0-9._-]*', requirement.strip()).group(0)
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
+def missing_system_deps(packages: list[str], manager: str | None = None) -> list[str]:
+    """Return the *packages* that are not installed (without network access)."""
+    if not packages:
+        return []
+
+    if manager is None:
+        manager = _detect_pkg_manager()
+    packages = [EvalHandler.instance().echo(pkg) for pkg in packages]  # expand env vars in package names
+
+    # dpkg database is read directly, other managers are queried per package
+    if manager == 'apt':
+        installed = _dpkg_installed()
+        return [pkg for pkg in packages if pkg.split(':')[0] not in installed]
+
+    return [pkg for pkg in packages
+            if not proc_utils.call_process(args=_system_check_installed_cmd(manager, [pkg]), print_on_error=False)]
+
+
+def missing_pip_deps(packages: list[str]) -> list[str]:
+    """Return the *packages* that are not installed for the running interpreter (version specifiers are ignored)."""
+    ret = []
+    for pkg in packages:
+        try:
+            importlib.metadata.distribution(_pip_name(pkg))
+        except (importlib.metadata.PackageNotFoundError, ValueError):
+            ret.append(pkg)
+    return ret
+
+
 def install_system_deps(packages: list[str], verbose: bool = False) -> bool:
     """Install *packages* using the system package manager."""
     if not packages:
@@ -84,6 +148,10 @@ def install_system_deps(packages: list[str], verbose: bool = False) -> bool:
     cmd = _system_check_installed_cmd(manager, packages)
     if proc_utils.call_process(args=cmd, verbose=verbose, print_on_error=False):
         return True
+
+    if _offline.enabled:
+        print(f'[sys_deps] system packages {packages} cannot be installed offline')
+        return False
     
     print(f'[sys_deps] installing system packages via {manager}: {packages}')
     cmd = _system_install_cmd(manager, packages)
@@ -95,6 +163,13 @@ def install_pip_deps(packages: list[str], verbose: bool = False) -> bool:
     if not packages:
         return True
 
+    # nothing can be installed offline
+    if _offline.enabled:
+        missing = missing_pip_deps(packages)
+        if missing:
+            print(f'[sys_deps] pip packages {missing} cannot be installed offline')
+        return not missing
+
     cmd = ['python', '-m', 'pip', 'install'] + packages
     print(f'[sys_deps] installing pip packages: {packages}')
     return proc_utils.call_process(args=cmd, verbose=verbose)
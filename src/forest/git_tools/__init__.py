@@ -1,3 +1,4 @@
+import os
 import typing
 
 from forest.common import proc_utils
@@ -7,6 +8,16 @@ import shutil
 
 class GitTools:
 
+    # supported clone strategies:
+    #  - full: complete clone
+    #  - blobless: partial clone, file contents are fetched on demand
+    #  - treeless: partial clone, trees and file contents are fetched on demand
+    #  - shallow: fetch the requested commit only (also works with commit shas)
+    clone_strategies = ['full', 'blobless', 'treeless', 'shallow']
+
+    # submodules are fetched with these many parallel jobs
+    submodule_jobs = 8
+
     def __init__(self, srcdir) -> None:
         self.srcdir = srcdir
 
@@ -17,7 +28,9 @@ class GitTools:
             proto='ssh', 
             recursive=False,
             depth=None,
-            single_branch=False):
+            single_branch=False,
+            mirror=None,
+            strategy='full'):
 
         if proto == 'ssh':
             addr = f'git@{server}:{repository}'
@@ -26,12 +39,43 @@ class GitTools:
         else:
             # TODO more specific exception
             raise ValueError(f'unsupported protocol "{proto}"')
+
+        if strategy not in GitTools.clone_strategies:
+            raise ValueError(f'unsupported clone strategy "{strategy}"')
+
+        # abbreviated commit shas cannot be fetched by themselves
+        from ._impl import _clone_at_commit, _is_sha, _is_abbrev_sha
+        if strategy == 'shallow' and tag is not None and _is_abbrev_sha(tag):
+            strategy = 'full'
+
+        # fetch the requested commit only (note: a depth can only be
+        # combined with clone --branch if the tag is not a commit sha)
+        if mirror is None and tag is not None and \
+                (strategy == 'shallow' or (depth is not None and _is_sha(tag))):
+            return _clone_at_commit(self, addr=addr, tag=tag, recursive=recursive, depth=depth or 1)
+
+        # clone from a local mirror (updated first), and point origin
+        # to the actual remote afterwards
+        source = addr
+        if mirror is not None:
+            from ._impl import _update_mirror
+            mirror_path = GitTools.mirror_path(mirror, server, repository)
+            if not _update_mirror(addr, mirror_path):
+                return False
+            # note: depth is ignored by local clones from a plain path
+            source = mirror_path if depth is None else f'file://{mirror_path}'
         
         # create command
         # --progress flag forces progress status even if the standard 
         # error stream is not directed to a terminal.
 
         cmd = ['git', 'clone', '--progress']
+
+        # partial clones (local clones from a mirror are cheap already)
+        if mirror is None and strategy == 'blobless':
+            cmd.append('--filter=blob:none')
+        elif mirror is None and strategy == 'treeless':
+            cmd.append('--filter=tree:0')
         
         # we're asked to clone a single branch
         # note: it cannot be a commit sha1
@@ -39,8 +83,10 @@ class GitTools:
             cmd.extend(['--branch', tag])
             cmd.append('--single-branch')
 
-        if recursive:
-            cmd.append('--recursive')
+        # note: with a mirror, submodules are initialized once origin points
+        # to the actual remote, as their urls can be relative to it
+        if recursive and mirror is None:
+            cmd.extend(['--recursive', '--jobs', GitTools.submodule_jobs])
             if tag is not None:
                 cmd.extend(['--branch', tag])
 
@@ -50,7 +96,7 @@ class GitTools:
             cmd.append('--single-branch')
             cmd.extend(['--depth', depth])
 
-        cmd.extend([addr, self.srcdir])
+        cmd.extend([source, self.srcdir])
 
         # clone, and delete the source folder on failure
         # (either exception or git returns != 0) 
@@ -58,10 +104,19 @@ class GitTools:
             # Progress status is reported on the standard error stream
             clone_ok = proc_utils.call_process(args=cmd, 
                                                update_regrex_pattern=git_regrex_pattern)
+
+            if mirror is not None:
+                clone_ok = clone_ok and proc_utils.call_process(['git', 'remote', 'set-url', 'origin', addr], 
+                                                                cwd=self.srcdir)
             
             # checkout to requested branch/tag/commit
             if tag is not None:
                 clone_ok = clone_ok and self.checkout(tag=tag)
+
+            if recursive and mirror is not None:
+                clone_ok = clone_ok and proc_utils.call_process(['git', 'submodule', 'update', '--init', '--recursive', 
+                                                                 '--jobs', GitTools.submodule_jobs], 
+                                                                cwd=self.srcdir)
             
             if not clone_ok:
                 self.rm()
@@ -80,5 +135,119 @@ class GitTools:
         return proc_utils.call_process(['git', 'submodule', 'sync', '--recursive', '&&',
                                         'git', 'submodule', 'update', '--init', '--recursive'], cwd=self.srcdir)
 
+    def git_dir(self, discover=False) -> typing.Optional[str]:
+        """
+        Path to the git directory of srcdir, following 'gitdir:' files
+        (submodules, linked work trees); if discover is True, parent
+        directories are searched as well
+
+        Returns:
+            str: the git directory, or None if srcdir is not a git repository
+        """
+        from ._impl import _git_dir, _discover_git_dir
+        if discover:
+            return _discover_git_dir(self.srcdir)
+        return _git_dir(self.srcdir)
+
+    def head(self) -> typing.Optional[str]:
+        """
+        Read the commit sha checked out in srcdir, without calling git
+
+        Returns:
+            str: the commit sha, or None if srcdir is not a git work tree
+                or HEAD is unborn
+        """
+        from ._impl import _head
+        return _head(self)
+
+    def branch(self) -> typing.Optional[str]:
+        """
+        Name of the branch checked out in srcdir, without calling git
+
+        Returns:
+            str: the branch name, or None if HEAD is detached (or srcdir
+                is not a git work tree)
+        """
+        from ._impl import _branch
+        return _branch(self)
+
+    def resolve(self, name: str) -> typing.Optional[str]:
+        """
+        Resolve a commit sha, tag, or branch (of origin, or local) into the
+        commit sha it points to, without calling git
+
+        Returns:
+            str: the commit sha, or None if it cannot be found locally
+        """
+        from ._impl import _resolve_commit
+        return _resolve_commit(self, name)
+
+    def index(self) -> typing.Optional[typing.Dict[str, tuple]]:
+        """
+        Read the index of the work tree in srcdir, without calling git
+
+        Returns:
+            dict: (mode, sha, mtime_ns, size, ino) of each tracked file, as
+                recorded when it was last staged, or None if the index
+                cannot be read
+        """
+        from ._impl import _read_index
+        return _read_index(self)
+
+    def untracked(self, tracked) -> typing.Iterator[typing.Tuple[str, os.DirEntry]]:
+        """
+        Walk the files of the work tree in srcdir which are not in tracked
+        (paths relative to srcdir), skipping those ignored by .gitignore files
+        and info/exclude (core.excludesFile is not considered)
+        """
+        from ._impl import _untracked
+        return _untracked(self, tracked)
+
+    def is_dirty(self) -> typing.Optional[bool]:
+        """
+        Check if tracked files of the work tree in srcdir have local changes
+
+        Returns:
+            bool: the dirty flag, or None if srcdir is not a git work tree
+        """
+        out = proc_utils.get_output(['git', 'status', '--porcelain', '--untracked-files=no'], 
+                                    cwd=self.srcdir, 
+                                    print_on_error=False)
+        if out is None:
+            return None
+        return len(out) > 0
+
+    def has_commit(self, sha: str) -> bool:
+        """
+        Check if the given commit is available in the repository in srcdir
+        """
+        return proc_utils.call_process(['git', 'cat-file', '-e', f'{sha}^{{commit}}'], 
+                                       cwd=self.srcdir, 
+                                       print_on_error=False)
+
+    def fetch(self, tag: str) -> bool:
+        """
+        Fetch from origin whatever is needed to check out tag
+        """
+        from ._impl import _fetch
+        return _fetch(self, tag)
+
+    def has_ref(self, name: str) -> bool:
+        """
+        Check if name is a branch, tag or full ref of the repository in
+        srcdir (which can be bare), without calling git; commit shas are
+        accepted as they are
+        """
+        from ._impl import _has_ref
+        return _has_ref(self, name)
+
+    @staticmethod
+    def mirror_path(mirror: str, server: str, repository: str) -> str:
+        """
+        Path of the bare mirror of a repository inside the mirror cache
+        """
+        from ._impl import _mirror_path
+        return _mirror_path(mirror, server, repository)
+
     def rm(self):
         shutil.rmtree(self.srcdir,  ignore_errors=True)
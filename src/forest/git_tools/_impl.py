@@ -0,0 +1,760 @@
+import fcntl
+import fnmatch
+import os
+import re
+import shutil
+import struct
+import typing
+import zlib
+
+from forest.common import offline as _offline
+from forest.common import proc_utils
+from forest.common.parser import git_regrex_pattern
+
+
+def _git_dir(srcdir) -> typing.Optional[str]:
+    """
+    Path to the git directory of a work tree, following the 'gitdir:'
+    indirection used by submodules and linked work trees (or srcdir
+    itself for bare repositories)
+    """
+    dotgit = os.path.join(srcdir, '.git')
+
+    if not os.path.exists(dotgit) and os.path.isfile(os.path.join(srcdir, 'HEAD')) \
+            and os.path.isdir(os.path.join(srcdir, 'objects')):
+        return srcdir
+
+    if os.path.isdir(dotgit):
+        return dotgit
+
+    try:
+        with open(dotgit, 'r') as f:
+            content = f.read().strip()
+    except OSError:
+        return None
+
+    if not content.startswith('gitdir:'):
+        return None
+
+    return os.path.normpath(os.path.join(srcdir, content[len('gitdir:'):].strip()))
+
+
+def _discover_git_dir(path) -> typing.Optional[str]:
+    """
+    Path to the git directory of the repository containing path, which
+    can be a subdirectory of a work tree (like git rev-parse --git-dir)
+    """
+    path = os.path.abspath(path)
+
+    while True:
+        git_dir = _git_dir(path)
+        if git_dir is not None and os.path.isfile(os.path.join(git_dir, 'HEAD')):
+            return git_dir
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def _common_dir(git_dir):
+    """
+    Path to the directory holding refs (differs from git_dir for linked work trees)
+    """
+    try:
+        with open(os.path.join(git_dir, 'commondir'), 'r') as f:
+            return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    except OSError:
+        return git_dir
+
+
+def _packed_ref(common_dir, ref, peel=False):
+    """
+    Sha of a ref inside packed-refs; if peel is True, annotated tags are
+    resolved into the commit they point to
+    """
+    try:
+        with open(os.path.join(common_dir, 'packed-refs'), 'r') as f:
+            ret = None
+            for line in f:
+                if line.startswith('#'):
+                    continue
+                if ret is not None:
+                    # the peeled sha (if any) follows the tag entry
+                    if peel and line.startswith('^'):
+                        return line[1:].strip()
+                    return ret
+                if line.startswith('^'):
+                    continue
+                sha, _, name = line.strip().partition(' ')
+                if name == ref:
+                    ret = sha
+            return ret
+    except OSError:
+        pass
+    return None
+
+
+def _resolve_ref(git_dir, content, depth=0):
+    """
+    Resolve the content of HEAD (or of any ref file) into a commit sha
+    """
+
+    if not content.startswith('ref:'):
+        return content or None
+
+    # symbolic refs are followed a few times at most
+    if depth > 5:
+        return None
+
+    ref = content[len('ref:'):].strip()
+
+    # per-worktree refs (e.g. HEAD) live in git_dir, others in the common dir
+    common_dir = _common_dir(git_dir)
+    for d in (git_dir, common_dir):
+        try:
+            with open(os.path.join(d, ref), 'r') as f:
+                return _resolve_ref(git_dir, f.read().strip(), depth + 1)
+        except OSError:
+            pass
+
+    return _packed_ref(common_dir, ref)
+
+
+def _head(self) -> typing.Optional[str]:
+
+    git_dir = _git_dir(self.srcdir)
+    if git_dir is None:
+        return None
+
+    try:
+        with open(os.path.join(git_dir, 'HEAD'), 'r') as f:
+            content = f.read().strip()
+    except OSError:
+        return None
+
+    return _resolve_ref(git_dir, content)
+
+
+def _peel(common_dir, sha, depth=0) -> typing.Optional[str]:
+    """
+    Resolve a (possibly annotated) tag object into a commit sha, reading
+    loose or packed objects; returns None if the object is not available
+    """
+
+    obj = _read_object(common_dir, sha)
+    if obj is None:
+        return None
+
+    kind, body = obj
+
+    if kind == 'commit':
+        return sha
+
+    if kind == 'tag' and body.startswith(b'object ') and depth < 5:
+        return _peel(common_dir, body[len(b'object '):].split(b'\n', 1)[0].decode(), depth + 1)
+
+    return None
+
+
+# types of packed objects
+_pack_types = {1: 'commit', 2: 'tree', 3: 'blob', 4: 'tag'}
+_OFS_DELTA = 6
+_REF_DELTA = 7
+
+
+def _object_dirs(common_dir) -> typing.List[str]:
+    """
+    Object directories of a repository, including its alternates (e.g.
+    clones referencing a mirror)
+    """
+    objdir = os.path.join(common_dir, 'objects')
+    ret = [objdir]
+    try:
+        with open(os.path.join(objdir, 'info', 'alternates'), 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    ret.append(os.path.normpath(os.path.join(objdir, line)))
+    except OSError:
+        pass
+    return ret
+
+
+def _read_object(common_dir, sha, depth=0) -> typing.Optional[typing.Tuple[str, bytes]]:
+    """
+    Type and content of a loose or packed object, without calling git
+    """
+
+    for objdir in _object_dirs(common_dir):
+
+        try:
+            with open(os.path.join(objdir, sha[:2], sha[2:]), 'rb') as f:
+                data = zlib.decompress(f.read())
+            header, _, body = data.partition(b'\0')
+            return header.split(b' ', 1)[0].decode(), body
+        except (OSError, zlib.error):
+            pass
+
+        try:
+            packs = sorted(p for p in os.listdir(os.path.join(objdir, 'pack')) if p.endswith('.idx'))
+        except OSError:
+            continue
+
+        for idx in packs:
+            idx = os.path.join(objdir, 'pack', idx)
+            offset = _pack_offset(idx, sha)
+            if offset is None:
+                continue
+            try:
+                return _read_packed(common_dir, idx[:-len('.idx')] + '.pack', offset, depth)
+            except (OSError, zlib.error, IndexError, ValueError):
+                return None
+
+    return None
+
+
+def _pack_offset(idx, sha) -> typing.Optional[int]:
+    """
+    Offset of an object inside a pack, looked up in its index (v1 or v2)
+    """
+
+    try:
+        with open(idx, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    binsha = bytes.fromhex(sha)
+
+    if data[:4] == b'\377tOc':
+        if struct.unpack('>I', data[4:8])[0] != 2:
+            return None
+        fanout, entry, shas = 8, 20, 8 + 256 * 4
+    else:
+        fanout, entry, shas = 0, 24, 256 * 4
+
+    count = struct.unpack('>I', data[fanout + 255 * 4:fanout + 256 * 4])[0]
+    lo = struct.unpack('>I', data[fanout + (binsha[0] - 1) * 4:fanout + binsha[0] * 4])[0] if binsha[0] else 0
+    hi = struct.unpack('>I', data[fanout + binsha[0] * 4:fanout + (binsha[0] + 1) * 4])[0]
+
+    # v1 entries are (offset, sha), v2 shas are followed by crcs and offsets
+    sha_at = (lambda i: shas + i * 24 + 4) if entry == 24 else (lambda i: shas + i * 20)
+
+    while lo < hi:
+        mid = (lo + hi) // 2
+        cur = data[sha_at(mid):sha_at(mid) + 20]
+        if cur < binsha:
+            lo = mid + 1
+        elif cur > binsha:
+            hi = mid
+        elif entry == 24:
+            return struct.unpack('>I', data[shas + mid * 24:shas + mid * 24 + 4])[0]
+        else:
+            offsets = shas + count * 24
+            offset = struct.unpack('>I', data[offsets + mid * 4:offsets + mid * 4 + 4])[0]
+            if offset & 0x80000000:
+                large = offsets + count * 4 + (offset & 0x7fffffff) * 8
+                offset = struct.unpack('>Q', data[large:large + 8])[0]
+            return offset
+
+    return None
+
+
+def _read_packed(common_dir, pack, offset, depth=0) -> typing.Optional[typing.Tuple[str, bytes]]:
+    """
+    Type and content of the object at offset inside a pack, resolving deltas
+    """
+
+    if depth > 50:
+        return None
+
+    with open(pack, 'rb') as f:
+
+        f.seek(offset)
+        c = f.read(1)[0]
+        kind = (c >> 4) & 7
+        while c & 0x80:
+            c = f.read(1)[0]
+
+        base = None
+        if kind == _OFS_DELTA:
+            c = f.read(1)[0]
+            rel = c & 0x7f
+            while c & 0x80:
+                c = f.read(1)[0]
+                rel = ((rel + 1) << 7) | (c & 0x7f)
+            base = _read_packed(common_dir, pack, offset - rel, depth + 1)
+        elif kind == _REF_DELTA:
+            base = _read_object(common_dir, f.read(20).hex(), depth + 1)
+        elif kind not in _pack_types:
+            return None
+
+        # the object is followed by other ones, only its zlib stream is read
+        z = zlib.decompressobj()
+        data = b''
+        while not z.eof:
+            chunk = f.read(4096)
+            if not chunk:
+                break
+            data += z.decompress(chunk)
+
+    if kind in _pack_types:
+        return _pack_types[kind], data
+
+    if base is None:
+        return None
+
+    return base[0], _apply_delta(base[1], data)
+
+
+def _apply_delta(base: bytes, delta: bytes) -> bytes:
+    """
+    Apply a git delta to base
+    """
+
+    def varint(pos):
+        ret, shift = 0, 0
+        while True:
+            c = delta[pos]
+            pos += 1
+            ret |= (c & 0x7f) << shift
+            shift += 7
+            if not c & 0x80:
+                return ret, pos
+
+    _, pos = varint(0)
+    _, pos = varint(pos)
+
+    out = bytearray()
+
+    while pos < len(delta):
+        c = delta[pos]
+        pos += 1
+        if c & 0x80:
+            # copy from base: offset and size bytes are present per flag bit
+            offset, size = 0, 0
+            for i in range(4):
+                if c & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if c & (1 << (4 + i)):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset:offset + (size or 0x10000)]
+        elif c:
+            out += delta[pos:pos + c]
+            pos += c
+        else:
+            raise ValueError('invalid delta')
+
+    return bytes(out)
+
+
+def _resolve_commit(self, name) -> typing.Optional[str]:
+    """
+    Resolve a full commit sha, a tag, a branch of origin, or a local
+    branch into a commit sha, by reading refs (and tag objects) only
+    """
+
+    if _is_sha(name):
+        return name
+
+    git_dir = _git_dir(self.srcdir)
+    if git_dir is None:
+        return None
+
+    common_dir = _common_dir(git_dir)
+
+    if name.startswith('refs/'):
+        refs = [name]
+    else:
+        refs = [f'refs/tags/{name}', f'refs/remotes/origin/{name}', f'refs/heads/{name}']
+
+    for ref in refs:
+
+        try:
+            with open(os.path.join(common_dir, ref), 'r') as f:
+                sha = _resolve_ref(git_dir, f.read().strip())
+        except OSError:
+            sha = _packed_ref(common_dir, ref, peel=True)
+            if sha is None:
+                continue
+            return sha
+
+        # loose tags can point to annotated tag objects, which are
+        # peeled by git itself when packed
+        if sha is not None and ref.startswith('refs/tags/'):
+            return _peel(common_dir, sha)
+
+        return sha
+
+    return None
+
+
+def _read_index(self) -> typing.Optional[typing.Dict[str, tuple]]:
+    """
+    Entries of the index of the work tree in srcdir (versions 2 to 4), as
+    a mapping from path to (mode, sha, mtime_ns, size, ino) of the file
+    when it was last staged or refreshed; returns None if the index cannot
+    be read (e.g. missing, split, or sparse index)
+    """
+
+    git_dir = _git_dir(self.srcdir)
+    if git_dir is None:
+        return None
+
+    try:
+        with open(os.path.join(git_dir, 'index'), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    if len(data) < 12 or data[:4] != b'DIRC' or _object_format(git_dir) != 'sha1':
+        return None
+
+    version, count = struct.unpack('>II', data[4:12])
+    if version not in (2, 3, 4):
+        return None
+
+    ret = dict()
+    pos = 12
+    path = b''
+
+    try:
+        for _ in range(count):
+            start = pos
+            (_, _, mtime_s, mtime_ns, _, ino, mode, _, _, size) = struct.unpack('>10I', data[pos:pos + 40])
+            sha = data[pos + 40:pos + 60].hex()
+            flags, = struct.unpack('>H', data[pos + 60:pos + 62])
+            pos += 62
+            if flags & 0x4000:
+                pos += 2
+            if version == 4:
+                # path is prefix compressed against the previous entry
+                strip, pos = _read_varint(data, pos)
+                end = data.index(b'\0', pos)
+                path = path[:len(path) - strip] + data[pos:end]
+                pos = end + 1
+            else:
+                end = data.index(b'\0', pos)
+                path = data[pos:end]
+                pos = start + ((end - start) // 8 + 1) * 8
+            ret[path.decode(errors='surrogateescape')] = (mode, sha, mtime_s * 10**9 + mtime_ns, size, ino)
+    except (struct.error, ValueError):
+        return None
+
+    # split (link) and sparse (sdir) indices do not list all files
+    if data[pos:pos + 4] in (b'link', b'sdir'):
+        return None
+
+    return ret
+
+
+def _object_format(git_dir) -> str:
+    """
+    Hash algorithm of the repository (extensions.objectformat)
+    """
+    try:
+        with open(os.path.join(_common_dir(git_dir), 'config'), 'r') as f:
+            m = re.search(r'^\s*objectformat\s*=\s*(\S+)', f.read(), re.IGNORECASE | re.MULTILINE)
+    except OSError:
+        return 'sha1'
+    return m.group(1).lower() if m is not None else 'sha1'
+
+
+def _read_varint(data, pos) -> typing.Tuple[int, int]:
+    """
+    Decode a variable length integer of the index format v4
+    """
+    c = data[pos]
+    val = c & 127
+    pos += 1
+    while c & 128:
+        c = data[pos]
+        pos += 1
+        val = ((val + 1) << 7) | (c & 127)
+    return val, pos
+
+
+def _ignore_rules(path, base) -> typing.List[tuple]:
+    """
+    Patterns of an ignore file (e.g. .gitignore), as (base, pattern, negate,
+    dir_only, anchored) tuples, base being the directory (relative to the
+    work tree) they apply to
+    """
+
+    ret = []
+
+    try:
+        with open(path, 'r', errors='surrogateescape') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return ret
+
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        if line.startswith('**/'):
+            line = line[3:]
+        anchored = '/' in line
+        ret.append((base, line.lstrip('/'), negate, dir_only, anchored))
+
+    return ret
+
+
+def _is_ignored(rules, rel, is_dir) -> bool:
+    """
+    Check a path (relative to the work tree) against ignore rules, the last
+    matching rule winning
+    """
+
+    name = os.path.basename(rel)
+    ret = False
+
+    for base, pattern, negate, dir_only, anchored in rules:
+        if dir_only and not is_dir:
+            continue
+        if base:
+            if not rel.startswith(base + '/'):
+                continue
+            sub = rel[len(base) + 1:]
+        else:
+            sub = rel
+        if fnmatch.fnmatchcase(sub if anchored else name, pattern):
+            ret = not negate
+
+    return ret
+
+
+def _untracked(self, tracked) -> typing.Iterator[typing.Tuple[str, os.DirEntry]]:
+    """
+    Files of the work tree in srcdir which are not in tracked (paths
+    relative to srcdir), leaving out files ignored by .gitignore files
+    and info/exclude (nested repositories are reported as a single entry)
+    """
+
+    git_dir = _git_dir(self.srcdir)
+    rules = _ignore_rules(os.path.join(_common_dir(git_dir), 'info', 'exclude'), '')
+
+    # directories holding tracked files
+    tracked_dirs = set()
+    for path in tracked:
+        d = os.path.dirname(path)
+        while d and d not in tracked_dirs:
+            tracked_dirs.add(d)
+            d = os.path.dirname(d)
+
+    stack = [('', rules)]
+
+    while stack:
+        d, rules = stack.pop()
+        rules = rules + _ignore_rules(os.path.join(self.srcdir, d, '.gitignore'), d)
+
+        try:
+            entries = sorted(os.scandir(os.path.join(self.srcdir, d)), key=lambda e: e.name)
+        except OSError:
+            continue
+
+        for e in entries:
+
+            rel = os.path.join(d, e.name)
+
+            if rel == '.git' or rel in tracked:
+                continue
+
+            is_dir = e.is_dir(follow_symlinks=False)
+
+            if _is_ignored(rules, rel, is_dir):
+                continue
+
+            if is_dir and (rel in tracked_dirs or not os.path.exists(os.path.join(e.path, '.git'))):
+                stack.append((rel, rules))
+            else:
+                yield rel, e
+
+
+def _refspecs(tag) -> typing.List[str]:
+    """
+    Refspecs fetching a branch, tag or commit sha from origin into the
+    same refs as a regular clone
+    """
+    if _is_sha(tag):
+        return [tag]
+    return [f'+refs/heads/{tag}:refs/remotes/origin/{tag}', 
+            f'+refs/tags/{tag}:refs/tags/{tag}']
+
+
+def _fetch(self, tag) -> bool:
+    """
+    Fetch from origin whatever is needed to check out tag (shallow
+    repositories are only deepened up to the requested commit)
+    """
+
+    def git(*args, **kwargs):
+        return proc_utils.call_process(['git'] + list(args), cwd=self.srcdir, **kwargs)
+
+    git_dir = _git_dir(self.srcdir)
+    if git_dir is None:
+        return False
+
+    shallow = os.path.isfile(os.path.join(_common_dir(git_dir), 'shallow'))
+
+    if not shallow:
+        ok = git('fetch', '--progress', '--tags', 'origin', 
+                 update_regrex_pattern=git_regrex_pattern)
+        if ok and _resolve_commit(self, tag) is not None:
+            return True
+
+    # commits that are not reachable from any branch or tag are
+    # fetched by sha (as most hosting services allow it)
+    depth = ['--depth', 1] if shallow else []
+    return any(git('fetch', '--progress', '--no-tags', *depth, 'origin', refspec, 
+                   print_on_error=False, 
+                   update_regrex_pattern=git_regrex_pattern)
+               for refspec in _refspecs(tag))
+
+
+def _branch(self) -> typing.Optional[str]:
+
+    git_dir = _git_dir(self.srcdir)
+    if git_dir is None:
+        return None
+
+    try:
+        with open(os.path.join(git_dir, 'HEAD'), 'r') as f:
+            content = f.read().strip()
+    except OSError:
+        return None
+
+    prefix = 'ref: refs/heads/'
+    if not content.startswith(prefix):
+        return None
+
+    return content[len(prefix):]
+
+
+def _is_sha(name) -> bool:
+    return re.fullmatch(r'[0-9a-f]{40}', name) is not None
+
+
+def _is_abbrev_sha(name) -> bool:
+    return re.fullmatch(r'[0-9a-f]{7,39}', name) is not None
+
+
+def _has_ref(self, name) -> bool:
+    """
+    Check if name is a branch, tag or full ref of the repository; abbreviated
+    or full commit shas are accepted as they are
+    """
+
+    if re.fullmatch(r'[0-9a-f]{7,40}', name):
+        return True
+
+    git_dir = _git_dir(self.srcdir)
+    if git_dir is None:
+        return False
+
+    common_dir = _common_dir(git_dir)
+
+    for ref in (name, f'refs/heads/{name}', f'refs/tags/{name}', f'refs/remotes/{name}'):
+        if not ref.startswith('refs/'):
+            continue
+        if os.path.isfile(os.path.join(common_dir, ref)) or _packed_ref(common_dir, ref) is not None:
+            return True
+
+    return False
+
+
+def _mirror_path(mirror_root, server, repository) -> str:
+    """
+    Path of the bare mirror of a repository inside the mirror cache
+    """
+    repository = repository.strip('/')
+    if not repository.endswith('.git'):
+        repository += '.git'
+    return os.path.join(mirror_root, server, repository)
+
+
+def _update_mirror(addr, mirror_path) -> bool:
+    """
+    Create the bare mirror of addr, or fetch what changed upstream if it
+    exists; the mirror is locked while being updated, as it can be shared
+    by several workspaces
+    """
+
+    os.makedirs(os.path.dirname(mirror_path), exist_ok=True)
+
+    with open(mirror_path + '.lock', 'w') as lock:
+
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        if os.path.isdir(mirror_path):
+            # offline: use the mirror as it is
+            if _offline.enabled:
+                return True
+            return proc_utils.call_process(['git', 'fetch', '--prune', '--progress', 'origin'],
+                                           cwd=mirror_path,
+                                           update_regrex_pattern=git_regrex_pattern)
+
+        # clone into a temporary folder, so that an interrupted clone
+        # does not leave a broken mirror behind
+        tmp_path = f'{mirror_path}.tmp-{os.getpid()}'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+        ok = proc_utils.call_process(['git', 'clone', '--mirror', '--progress', addr, tmp_path],
+                                     update_regrex_pattern=git_regrex_pattern)
+
+        if not ok:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return False
+
+        os.rename(tmp_path, mirror_path)
+
+        return True
+
+
+def _clone_at_commit(self, addr, tag, recursive, depth) -> bool:
+    """
+    Create a repository in srcdir, and fetch the history of the given
+    branch, tag or commit sha up to depth (instead of a full clone)
+    """
+
+    def git(*args, **kwargs):
+        return proc_utils.call_process(['git'] + list(args), cwd=self.srcdir, **kwargs)
+
+    # branches and tags are fetched into the same refs as a regular clone,
+    # so that checkout creates a tracking branch for the former
+    refspecs = _refspecs(tag)
+
+    try:
+        os.makedirs(self.srcdir)
+
+        ok = git('init', '-q') and git('remote', 'add', 'origin', addr)
+
+        ok = ok and any(git('fetch', '--progress', '--no-tags', '--depth', depth, 'origin', refspec, 
+                            print_on_error=False, 
+                            update_regrex_pattern=git_regrex_pattern) 
+                        for refspec in refspecs)
+
+        ok = ok and git('checkout', '-q', tag)
+
+        if recursive:
+            ok = ok and git('submodule', 'update', '--init', '--recursive', 
+                            '--depth', '1', '--jobs', self.submodule_jobs)
+
+        if not ok:
+            self.rm()
+
+    except BaseException as e:
+        # remove src and re-raise exception
+        self.rm()
+        raise e
+
+    return ok
@@ -9,9 +9,11 @@ from datetime import datetime
 from forest import cmake_tools
 from forest.common.eval_handler import EvalHandler
 
-from forest.common.install import install_package, write_setup_file, write_ws_file, create_ws_venv, check_ws_file, uninstall_package, \
-    clean
+from forest.common.install import install_packages, write_setup_file, write_ws_file, create_ws_venv, check_ws_file, uninstall_package, \
+    clean, load_ws_settings, save_ws_settings
+from forest.common.compiler_cache import CompilerCache
 from forest.common.recipe import RecipeSource, Cookbook
+from forest.git_tools import GitTools
 from forest.common import sudo_refresh
 from forest.common.grow_targets import get_current_src_package, get_workspace_src_recipes, is_workspace_root
 from forest.common.tag_override import parse_tag_overrides
@@ -61,6 +63,9 @@ def do_main():
     # parse cmd line args
     buildtypes = ['None', 'RelWithDebInfo', 'Release', 'Debug']
     cloneprotos = ['ssh', 'https']
+    dfl_git_mirror = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'forest', 'git')
+    dfl_artifact_cache = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'forest', 'artifacts')
+    dfl_memory_reserve = '10%'
     dfl_log_file = datetime.now().strftime("/tmp/forest_%Y_%m_%d_%H_%M_%S.log")
 
     parser = argparse.ArgumentParser(description='forest automatizes cloning and building of software packages')
@@ -74,18 +79,38 @@ def do_main():
     init_cmd = 'init'
     init_parser = subparsers.add_parser(init_cmd, help='initialize the current folder as a forest workspace')
     init_parser.add_argument('--venv', action='store_true', help='do not create a python virtualenv for this workspace')
+    init_parser.add_argument('--compiler-cache', required=False, choices=CompilerCache.tools + ['none'], help='compiler cache used by default when growing cmake packages in this workspace (can be changed by calling init again)')
+    init_parser.add_argument('--generator', required=False, choices=cmake_tools.CmakeTools.generators + ['default'], help='cmake generator used by default for packages of this workspace whose recipes do not specify one')
+    init_parser.add_argument('--compiler-cache-size', required=False, metavar='SIZE', help=f'default size limit of the compiler cache (default: {CompilerCache.max_size})')
 
     grow_cmd = 'grow'
     grow_parser = subparsers.add_parser(grow_cmd, help='clone, configure, and build a recipe')
     grow_parser.add_argument('recipe', nargs='*', metavar='RECIPE', choices=available_recipes, help='name of recipe(s) with fetch and build information')
     grow_parser.add_argument('--jobs', '-j', default=1, help='parallel jobs for building')
+    grow_parser.add_argument('--parallel-packages', '-P', default=1, type=int, metavar='N', help='number of independent packages that are built at the same time (each one with --jobs parallel jobs)')
+    grow_parser.add_argument('--jobserver', required=False, action='store_true', help='share --jobs among all packages that build at the same time, through a GNU make jobserver passed to make/ninja, instead of giving --jobs to each one')
+    grow_parser.add_argument('--memory-reserve', required=False, nargs='?', const=dfl_memory_reserve, metavar='SIZE', help=f'keep SIZE of memory available while building (default: {dfl_memory_reserve.replace("%", "%%")} of the total memory; e.g. 2G, 512M), by holding back jobs when available memory is below it, and pausing the newest package builds when it is below half of it; uses the jobserver, with --parallel-packages × --jobs jobs unless --jobserver is given')
+    grow_parser.add_argument('--fetch-jobs', default=0, type=int, metavar='N', help='number of git sources that are fetched at the same time, starting as soon as the dependency graph is resolved and overlapping with builds (default: 0, i.e. each package is fetched right before its build)')
     grow_parser.add_argument('--mode', '-m', nargs='+', required=False, help='specify modes that are used to set conditional compilation flags (e.g., cmake args)')
     grow_parser.add_argument('--config', '-c', nargs='+', required=False, help='specify configuration variables that can be used inside recipes')
     grow_parser.add_argument('--default-build-type', '-t', default=buildtypes[1], choices=buildtypes, help='build type for cmake, it is overridden by recipe')
     grow_parser.add_argument('--force-reconfigure', required=False, action='store_true', help='force calling cmake before building with args from the recipe')
+    grow_parser.add_argument('--force-build', required=False, action='store_true', help='build all packages, even if they are up to date with their last successful build')
+    grow_parser.add_argument('--no-find-package-cache', required=False, action='store_true', help='always run cmake to check whether dependencies are installed, ignoring cached results')
+    grow_parser.add_argument('--no-toolchain-cache', required=False, action='store_true', help='configure new build folders from scratch, instead of seeding them with the compiler and platform detection results shared by the workspace')
+    grow_parser.add_argument('--no-eval-cache', required=False, action='store_true', help='re-evaluate memoized recipe expressions (e.g. shell commands with a ttl, lsb_release) and the resolved build plan')
     grow_parser.add_argument('--list-eval-locals', required=False, action='store_true', help='print available attributes when using conditional build args')
     grow_parser.add_argument('--clone-protocol', required=False, choices=cloneprotos, help='override clone protocol')
     grow_parser.add_argument('--clone-depth', required=False, type=int, help='set maximum history depth to save bandwidth')
+    grow_parser.add_argument('--clone-strategy', required=False, choices=GitTools.clone_strategies, help='clone strategy for recipes that do not specify one: full clone (default), blobless or treeless partial clone, or shallow fetch of the requested commit only (also works with commit shas)')
+    grow_parser.add_argument('--offline', required=False, action='store_true', help='do not access the network: clone from the git mirror only, and require system/pip/deb dependencies to be installed; missing artifacts are listed before building')
+    grow_parser.add_argument('--git-mirror', required=False, nargs='?', const=dfl_git_mirror, default=os.environ.get('HHCM_FOREST_GIT_MIRROR'), metavar='DIR', help=f'clone git repositories from bare mirrors kept in DIR (default: {dfl_git_mirror}), which are shared among workspaces and fetched incrementally; also enabled by the HHCM_FOREST_GIT_MIRROR env var')
+    grow_parser.add_argument('--artifact-cache', required=False, nargs='?', const=dfl_artifact_cache, default=os.environ.get('HHCM_FOREST_ARTIFACT_CACHE'), metavar='DIR', help=f'store built packages into DIR (default: {dfl_artifact_cache}), keyed by source commit, build configuration, compiler and dependencies, and unpack them instead of building when the key matches; also enabled by the HHCM_FOREST_ARTIFACT_CACHE env var')
+    grow_parser.add_argument('--artifact-remote', required=False, default=os.environ.get('HHCM_FOREST_ARTIFACT_REMOTE'), metavar='URL', help='download missing artifacts from URL (http(s):// server supporting GET and PUT, or shared directory), and upload new ones in the background; implies --artifact-cache; also set by the HHCM_FOREST_ARTIFACT_REMOTE env var')
+    grow_parser.add_argument('--artifact-read-only', required=False, action='store_true', help='never upload artifacts to --artifact-remote')
+    grow_parser.add_argument('--generator', '-G', required=False, choices=cmake_tools.CmakeTools.generators + ['default'], help='cmake generator for recipes that do not specify one (default: the workspace default, see forest init, or cmake\'s default); switching generator reconfigures packages from scratch')
+    grow_parser.add_argument('--compiler-cache', required=False, choices=CompilerCache.tools + ['none'], default=os.environ.get('HHCM_FOREST_COMPILER_CACHE'), help='launch compilers of cmake packages through ccache or sccache, with a cache directory shared by the workspace (.cache/<tool>); per-package hit rates are reported at the end of the run; overrides the workspace default (see forest init); also set by the HHCM_FOREST_COMPILER_CACHE env var')
+    grow_parser.add_argument('--compiler-cache-size', required=False, metavar='SIZE', help=f'size limit of the compiler cache (default: {CompilerCache.max_size}, or the workspace default)')
     grow_parser.add_argument('--cmake-args', nargs='+', required=False, help='specify additional cmake args to be appended to each recipe (leading -D must be omitted)')
     grow_parser.add_argument('--no-deps', '-n', required=False, action='store_true', help='skip dependency fetch and build step')
     grow_parser.add_argument('--clean', required=False, action='store_true', help='remove pkg build folder before grow')
@@ -117,6 +142,26 @@ def do_main():
     freeze_parser.add_argument('--append', '-a', action='store_true', help='update existing forest.lock in place instead of overwriting it')
     freeze_parser.add_argument('--ignore-errors', action='store_true', help='write forest.lock even if some repos are invalid or have local changes')
 
+    sync_cmd = 'sync'
+    sync_parser = subparsers.add_parser(sync_cmd, help='check out the tags resolved from recipes (and tag overrides) in existing src repos')
+    sync_parser.add_argument('recipe', nargs='*', metavar='RECIPE', choices=available_recipes, help='name of recipe(s) to sync (default: all workspace source packages)')
+    sync_parser.add_argument('--jobs', '-j', default=8, type=int, help='number of repos that are fetched at the same time')
+    sync_parser.add_argument('--fetch', '-f', required=False, action='store_true', help='fetch from origin before comparing, so that branches of origin are up to date (by default, refs are compared as of the last fetch)')
+    sync_parser.add_argument('--mode', '-m', nargs='+', required=False, help='specify modes that are used to evaluate recipes (e.g., tag_if)')
+    sync_parser.add_argument('--config', '-c', nargs='+', required=False, help='specify configuration variables that can be used inside recipes')
+    sync_parser.add_argument('--tag-override', '-o', required=False, nargs='+', metavar='TAG_OVERRIDE',
+                             help='tag override: mapping file (*.lock, *.yaml, *.yml, *.json), single tag for one recipe, or pkg:=tag entries')
+    sync_parser.add_argument('--verbose', '-v', required=False, action='store_true', help='print additional information')
+
+    status_cmd = 'status'
+    status_parser = subparsers.add_parser(status_cmd, help='show the state of src repos w.r.t. upstream, recipe tags, lock file, and last build')
+    status_parser.add_argument('recipe', nargs='*', metavar='RECIPE', help='name of the package(s) to check (default: all src repos)')
+    status_parser.add_argument('--json', action='store_true', help='print a json list (one object per repo) instead of a table')
+    status_parser.add_argument('--lock', default='forest.lock', metavar='FILE', help='lock file to compare with (default: forest.lock at the workspace root)')
+    status_parser.add_argument('--jobs', '-j', default=16, type=int, help='number of repos that are checked at the same time')
+    status_parser.add_argument('--mode', '-m', nargs='+', required=False, help='specify modes that are used to evaluate recipes (e.g., tag_if)')
+    status_parser.add_argument('--config', '-c', nargs='+', required=False, help='specify configuration variables that can be used inside recipes')
+
     argcomplete.autocomplete(parser)
     args = parser.parse_args()
 
@@ -133,6 +178,14 @@ def do_main():
         # update workspace root and related directories
         update_dirs()
         Cookbook.set_recipe_basedir(_forest_dirs.recipesdir)
+
+        # workspace defaults
+        if args.compiler_cache is not None:
+            save_ws_settings(rootdir=os.getcwd(), compiler_cache=None if args.compiler_cache == 'none' else args.compiler_cache)
+        if args.compiler_cache_size is not None:
+            save_ws_settings(rootdir=os.getcwd(), compiler_cache_size=args.compiler_cache_size)
+        if args.generator is not None:
+            save_ws_settings(rootdir=os.getcwd(), generator=None if args.generator == 'default' else args.generator)
         
     if args.version:
         config = ConfigParser()
@@ -164,8 +217,9 @@ def do_main():
     # create setup.bash if does not exist
     write_setup_file()
 
-    # write path to ws
-    print(f'[forest] workspace: {_forest_dirs.rootdir}')
+    # write path to ws (not for machine-readable output)
+    if not (args.command == status_cmd and args.json):
+        print(f'[forest] workspace: {_forest_dirs.rootdir}')
 
     # verbose mode will show output of any called process
     if args.verbose:
@@ -187,11 +241,16 @@ def do_main():
         return True
 
     # set config vars
-    if args.command == grow_cmd and args.config:
+    if args.command in (grow_cmd, sync_cmd, status_cmd) and args.config:
         from forest.common import config_handler
         ch = config_handler.ConfigHandler.instance()
         ch.set_config_variables(args.config)
 
+    # bypass memoized evaluations
+    if args.command == grow_cmd and args.no_eval_cache:
+        from forest.common.eval_cache import EvalCache
+        EvalCache.enabled = False
+
     # print available local attributes for conditional args
     if args.command == grow_cmd and args.list_eval_locals:
         from forest.common import eval_handler
@@ -208,6 +267,71 @@ def do_main():
         from forest.common.fetch_handler import GitFetcher
         GitFetcher.depth_override = args.clone_depth
 
+    # clone strategy
+    if args.command == grow_cmd and args.clone_strategy is not None:
+        from forest.common.fetch_handler import GitFetcher
+        GitFetcher.default_strategy = args.clone_strategy
+
+    # git mirror cache
+    if args.command == grow_cmd and args.git_mirror:
+        from forest.common.fetch_handler import GitFetcher
+        GitFetcher.mirror = os.path.abspath(os.path.expanduser(args.git_mirror))
+
+    # binary artifact cache (remote backends need a local cache)
+    if args.command == grow_cmd and (args.artifact_cache or args.artifact_remote):
+        from forest.common.artifact_cache import ArtifactCache
+        ArtifactCache.root = os.path.abspath(os.path.expanduser(args.artifact_cache or dfl_artifact_cache))
+        ArtifactCache.remote = args.artifact_remote
+        ArtifactCache.read_only = args.artifact_read_only
+
+    # compiler cache (from the command line, or the workspace default)
+    if args.command == grow_cmd:
+        ws_settings = load_ws_settings(_forest_dirs.rootdir)
+        tool = args.compiler_cache or ws_settings.get('compiler_cache')
+        if tool is not None and tool != 'none':
+            import shutil
+            if tool not in CompilerCache.tools:
+                print(f'[forest] unknown compiler cache "{tool}" (choose from {", ".join(CompilerCache.tools)})', file=sys.stderr)
+                return False
+            if shutil.which(tool) is None:
+                print(f'[forest] {tool} not found, compiler cache disabled', file=sys.stderr)
+            else:
+                CompilerCache.tool = tool
+                CompilerCache.dir = os.path.join(_forest_dirs.cachedir, tool)
+                CompilerCache.max_size = str(args.compiler_cache_size or ws_settings.get('compiler_cache_size', CompilerCache.max_size))
+
+    # cmake generator (from the command line, or the workspace default)
+    if args.command == grow_cmd:
+        from forest.common.build_handler import CmakeBuilder
+        generator = args.generator or load_ws_settings(_forest_dirs.rootdir).get('generator')
+        if generator is not None and generator != 'default':
+            CmakeBuilder.default_generator = generator
+
+    # global pool of build jobs (as many as without it, when only
+    # required by the memory reserve)
+    if args.command == grow_cmd and args.jobserver:
+        from forest.common.jobserver import JobServer
+        JobServer.jobs = max(1, int(args.jobs))
+    elif args.command == grow_cmd and args.memory_reserve is not None:
+        from forest.common.jobserver import JobServer
+        JobServer.jobs = max(1, int(args.jobs)) * max(1, args.parallel_packages)
+
+    # memory reserve
+    if args.command == grow_cmd and args.memory_reserve is not None:
+        from forest.common.memory_governor import MemoryGovernor, parse_size
+        try:
+            parse_size(args.memory_reserve, total=0)
+        except ValueError as e:
+            print(f'[forest] {e} for --memory-reserve', file=sys.stderr)
+            return False
+        MemoryGovernor.reserve = args.memory_reserve
+
+    # offline mode: network git transports are disabled altogether
+    if args.command == grow_cmd and args.offline:
+        from forest.common import offline
+        offline.enabled = True
+        os.environ['GIT_ALLOW_PROTOCOL'] = 'file'
+
     # package manager override for system_depends
     if args.command == grow_cmd and args.pkg_manager is not None:
         from forest.common import sys_deps
@@ -253,8 +377,15 @@ def do_main():
     elif args.command == grow_cmd and args.blacklist:
         parser.error('--blacklist can only be used when growing all source packages from the workspace root')
 
+    # sync: all source packages by default
+    if args.command == sync_cmd and not args.recipe:
+        recipes = Cookbook.get_available_recipes()
+        args.recipe, warnings = get_workspace_src_recipes(_forest_dirs.srcroot, recipes)
+        for warning in warnings:
+            print(warning, file=sys.stderr)
+
     # clone tag override
-    if args.command == grow_cmd and args.tag_override is not None:
+    if args.command in (grow_cmd, sync_cmd) and args.tag_override is not None:
         from forest.common.fetch_handler import GitFetcher
         GitFetcher.tag_overrides = parse_tag_overrides(args.tag_override, args.recipe, parser)
 
@@ -274,13 +405,37 @@ def do_main():
                   verbose=args.verbose)
 
     # handle modes
-    if args.command == grow_cmd and args.mode is not None:
+    if args.command in (grow_cmd, sync_cmd, status_cmd) and args.mode is not None:
         EvalHandler.modes = set(args.mode)
 
+    # status of src repos
+    if args.command == status_cmd:
+        from forest.common.status import status
+        return status(pkgs=args.recipe,
+                      srcroot=_forest_dirs.srcroot,
+                      buildroot=_forest_dirs.buildroot,
+                      installdir=_forest_dirs.installdir,
+                      lock_file=os.path.join(_forest_dirs.rootdir, args.lock),
+                      as_json=args.json,
+                      jobs=args.jobs)
+
+    # sync: check out resolved tags in existing repos
+    if args.command == sync_cmd:
+        from forest.common.sync import sync
+        return sync(pkgs=args.recipe, srcroot=_forest_dirs.srcroot, jobs=args.jobs, fetch=args.fetch)
+
     # default cmake args
     if args.command == grow_cmd and args.cmake_args:
         cmake_tools.CmakeTools.set_default_args(['-D' + a for a in args.cmake_args])
 
+    # find_package cache
+    if args.command == grow_cmd and args.no_find_package_cache:
+        cmake_tools.CmakeTools.set_find_package_cache(False)
+
+    # toolchain detection results shared by new build folders
+    if args.command == grow_cmd and args.no_toolchain_cache:
+        cmake_tools.CmakeTools.set_toolchain_seed(False)
+
     # print jobs
     if args.command == grow_cmd:
 
@@ -289,25 +444,25 @@ def do_main():
             print('[forest] workspace does not appear to be sourced')
 
         recipes_str = ' '.join(args.recipe)
-        print(f'[forest] building {recipes_str} with {args.jobs} parallel job{"s" if int(args.jobs) > 1 else ""}')
-
-        # perform required installation for each requested recipe;
-        # install_package uses an internal cache to avoid re-building
-        # packages that were already built earlier in this run
-        success = True
-        for recipe in args.recipe:
-            ok = install_package(pkg=recipe,
-                                 srcroot=_forest_dirs.srcroot,
-                                 buildroot=_forest_dirs.buildroot,
-                                 installdir=_forest_dirs.installdir,
-                                 buildtype=args.default_build_type,
-                                 jobs=args.jobs,
-                                 reconfigure=args.force_reconfigure,
-                                 no_deps=args.no_deps,
-                                 src_only=args.src_only
-                                 )
-            if not ok:
-                success = False
+        parallel_str = f' {"shared by" if args.jobserver else "on"} {args.parallel_packages} package slots' if args.parallel_packages > 1 else ''
+        print(f'[forest] building {recipes_str} with {args.jobs} parallel job{"s" if int(args.jobs) > 1 else ""}{parallel_str}')
+
+        # resolve the dependency graph of all requested recipes, and 
+        # install its packages (independent ones at the same time, 
+        # if requested); packages are built only once per run
+        success = install_packages(pkgs=args.recipe,
+                                   srcroot=_forest_dirs.srcroot,
+                                   buildroot=_forest_dirs.buildroot,
+                                   installdir=_forest_dirs.installdir,
+                                   buildtype=args.default_build_type,
+                                   jobs=args.jobs,
+                                   reconfigure=args.force_reconfigure,
+                                   no_deps=args.no_deps,
+                                   src_only=args.src_only,
+                                   parallel_packages=args.parallel_packages,
+                                   force_build=args.force_build,
+                                   fetch_jobs=args.fetch_jobs
+                                   )
 
         return success
 
@@ -0,0 +1,47 @@
+# create local bare repositories that stand in for the remote git server,
+# so that tests can clone and build packages without network access;
+# recipes refer to them as https://forest.local/local/<name>.git
+LOCAL_REMOTE_DIR=$WORK_DIR/remote
+
+function create_local_repo {
+  local name=$1
+  local workdir=$WORK_DIR/remote_work/$name
+  mkdir -p $workdir
+  cp -r $TEST_DIR/local_remote/$name/. $workdir
+  git -C $workdir init -q -b master
+  git -C $workdir add -A
+  git -C $workdir -c user.name=forest -c user.email=forest@localhost commit -q -m "initial commit"
+  mkdir -p $LOCAL_REMOTE_DIR/local
+  git clone -q --bare $workdir $LOCAL_REMOTE_DIR/local/$name.git
+}
+
+function setup_local_remote {
+  rm -rf $LOCAL_REMOTE_DIR $WORK_DIR/remote_work
+  for d in $TEST_DIR/local_remote/*/; do
+    create_local_repo $(basename $d)
+  done
+
+  # redirect the fake server to the local bare repositories, which
+  # (like most hosting services) serve partial clones and commit shas
+  export GIT_CONFIG_COUNT=4
+  export GIT_CONFIG_KEY_0=url.file://$LOCAL_REMOTE_DIR/.insteadOf
+  export GIT_CONFIG_VALUE_0=https://forest.local/
+  export GIT_CONFIG_KEY_1=protocol.file.allow
+  export GIT_CONFIG_VALUE_1=always
+  export GIT_CONFIG_KEY_2=uploadpack.allowFilter
+  export GIT_CONFIG_VALUE_2=true
+  export GIT_CONFIG_KEY_3=uploadpack.allowAnySHA1InWant
+  export GIT_CONFIG_VALUE_3=true
+}
+
+# add a commit to a local remote repository, and print its sha
+function commit_local_repo {
+  local name=$1
+  local message=$2
+  local workdir=$WORK_DIR/remote_work/$name
+  echo "$message" >> $workdir/CHANGES.txt
+  git -C $workdir add -A
+  git -C $workdir -c user.name=forest -c user.email=forest@localhost commit -q -m "$message"
+  git -C $workdir push -q $LOCAL_REMOTE_DIR/local/$name.git master
+  git -C $workdir rev-parse HEAD
+}
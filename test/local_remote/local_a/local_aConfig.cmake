@@ -0,0 +1 @@
+set(local_a_FOUND TRUE)
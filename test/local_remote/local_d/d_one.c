@@ -0,0 +1,4 @@
+int d_one(void)
+{
+    return 1;
+}
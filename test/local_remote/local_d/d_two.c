@@ -0,0 +1,4 @@
+int d_two(void)
+{
+    return 2;
+}
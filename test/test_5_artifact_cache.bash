@@ -0,0 +1,100 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+setup_local_remote
+export HHCM_FOREST_ARTIFACT_CACHE=$WORK_DIR/artifacts
+
+# first workspace: packages are built, and stored
+mkdir ws1
+(
+    cd ws1
+    forest init
+    source setup.bash
+    cp -r $TEST_DIR/recipes recipes
+    OUTPUT=$(forest grow local_b 2>&1)
+    echo "$OUTPUT"
+    [[ "$OUTPUT" == *"[local_a] stored into artifact cache"* ]]
+    [[ "$OUTPUT" == *"[local_b] stored into artifact cache"* ]]
+    [[ "$OUTPUT" == *"[forest] artifact cache: 0 hits, 2 misses, 2 stored"* ]]
+)
+[ $(find $WORK_DIR/artifacts -name "*.tar.gz" | wc -l) == 2 ]
+
+# second workspace: packages are unpacked (and relocated), not built
+mkdir ws2 && cd ws2
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+OUTPUT=$(forest grow local_b 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] restored from artifact cache"* ]]
+[[ "$OUTPUT" == *"[local_b] restored from artifact cache"* ]]
+[[ "$OUTPUT" == *"[forest] artifact cache: 2 hits, 0 misses, 0 stored"* ]]
+if [[ "$OUTPUT" == *"building..."* ]]; then exit 1; fi
+[ -f install/share/local_a/a_file.txt ]
+[ -f install/share/local_b/b_file.txt ]
+[ "$(cat install/share/local_a/a_prefix.txt)" == "$WORK_DIR/ws2/install" ]
+[ "$(readlink -f install/share/local_a/a_link.txt)" == "$WORK_DIR/ws2/install/share/local_a/a_file.txt" ]
+grep -q a_file.txt install/.install_cache/local_a
+
+# restored packages are up to date, and can be removed
+OUTPUT=$(forest grow local_b 2>&1)
+[[ "$OUTPUT" == *"[local_b] up to date, skipping"* ]]
+forest cut local_b
+[ ! -f install/share/local_b/b_file.txt ]
+
+# a different configuration (of a dependency) is a miss
+OUTPUT=$(forest grow local_b -t Debug 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] building..."* ]]
+[[ "$OUTPUT" == *"[local_b] building..."* ]]
+[[ "$OUTPUT" == *"[forest] artifact cache: 0 hits, 2 misses, 2 stored"* ]]
+
+# binary files referring to the install prefix are never cached
+OUTPUT=$(forest grow local_a --cmake-args LOCAL_A_BINARY_PREFIX=ON 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] unable to store artifact (share/local_a/a_prefix.bin refers to the install prefix"* ]]
+[[ "$OUTPUT" == *"[forest] artifact cache: 0 hits, 1 miss, 0 stored"* ]]
+
+# each cmake project of a package gets its own install manifest back
+cat > recipes/recipes/local_a_multi.yaml <<EOS
+clone:
+  type: git
+  server: forest.local
+  repository: local/local_a.git
+  tag: master
+  proto: https
+
+build:
+  type: cmake
+  cmakelists:
+    - first: .
+    - second: .
+EOS
+OUTPUT=$(cd ../ws1 && source setup.bash && cp ../ws2/recipes/recipes/local_a_multi.yaml recipes/recipes && forest grow local_a_multi 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a_multi] stored into artifact cache"* ]]
+OUTPUT=$(forest grow local_a_multi 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a_multi] restored from artifact cache"* ]]
+grep -q "$WORK_DIR/ws2/install/share/local_a/a_file.txt" build/local_a_multi/first/install_manifest.txt
+grep -q "$WORK_DIR/ws2/install/share/local_a/a_file.txt" build/local_a_multi/second/install_manifest.txt
+[ ! -f build/local_a_multi/install_manifest.txt ]
+
+# local changes are never cached
+echo "# local change" >> src/local_a/CMakeLists.txt
+OUTPUT=$(forest grow local_b 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] building..."* ]]
+[[ "$OUTPUT" == *"[forest] artifact cache: 0 hits, 0 misses, 0 stored"* ]]
+
+SUCCESS=1
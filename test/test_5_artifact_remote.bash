@@ -0,0 +1,84 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+setup_local_remote
+
+# static file server accepting uploads
+mkdir http_root
+cat > server.py <<'PYEOF'
+import http.server, os, sys
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+    def do_PUT(self):
+        path = self.translate_path(self.path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(self.rfile.read(int(self.headers['Content-Length'])))
+        self.send_response(201)
+        self.end_headers()
+
+server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+print(server.server_address[1], flush=True)
+server.serve_forever()
+PYEOF
+(cd http_root && exec python3 ../server.py > ../port.txt 2> ../server.log) &
+SERVER_PID=$!
+trap "kill $SERVER_PID; workdir_cleanup" EXIT
+while [ ! -s port.txt ]; do sleep 0.1; done
+URL=http://127.0.0.1:$(cat port.txt)
+
+# grow local_b in a new workspace with the given options
+grow_in_new_ws() {
+    local ws=$1
+    shift
+    mkdir $WORK_DIR/$ws
+    cd $WORK_DIR/$ws
+    forest init > /dev/null
+    source setup.bash
+    cp -r $TEST_DIR/recipes recipes
+    forest grow local_b "$@" 2>&1
+}
+
+# builds are uploaded
+OUTPUT=$(grow_in_new_ws ws1 --artifact-cache $WORK_DIR/cache1 --artifact-remote $URL)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[forest] artifact cache: 0 hits, 2 misses, 2 stored ($WORK_DIR/cache1); remote: 0 downloaded, 2 uploaded ($URL)"* ]]
+[ $(find http_root -name "*.tar.gz" | wc -l) == 2 ]
+[ $(find http_root -name "*.tar.gz.sha256" | wc -l) == 2 ]
+
+# another machine downloads them, and does not upload anything
+OUTPUT=$(grow_in_new_ws ws2 --artifact-cache $WORK_DIR/cache2 --artifact-remote $URL --artifact-read-only)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] restored from artifact cache"* ]]
+[[ "$OUTPUT" == *"[local_b] restored from artifact cache"* ]]
+[[ "$OUTPUT" == *"remote: 2 downloaded, 0 uploaded ($URL, read-only)"* ]]
+[ -f $WORK_DIR/ws2/install/share/local_b/b_file.txt ]
+
+# corrupted archives are not used
+for f in $(find http_root -name "*.tar.gz"); do echo "garbage" >> $f; done
+OUTPUT=$(grow_in_new_ws ws3 --artifact-cache $WORK_DIR/cache3 --artifact-remote $URL --artifact-read-only)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] ignoring corrupted artifact from $URL (sha256 digest mismatch)"* ]]
+[[ "$OUTPUT" == *"[local_a] building..."* ]]
+[[ "$OUTPUT" == *"remote: 0 downloaded, 0 uploaded"* ]]
+[ $(find $WORK_DIR/cache3 -name "*.tar.gz" | wc -l) == 2 ]
+
+# shared directory backend
+OUTPUT=$(grow_in_new_ws ws4 --artifact-cache $WORK_DIR/cache4 --artifact-remote $WORK_DIR/shared)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"remote: 0 downloaded, 2 uploaded ($WORK_DIR/shared)"* ]]
+OUTPUT=$(grow_in_new_ws ws5 --artifact-cache $WORK_DIR/cache5 --artifact-remote file://$WORK_DIR/shared)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[forest] artifact cache: 2 hits, 0 misses, 0 stored ($WORK_DIR/cache5); remote: 2 downloaded, 0 uploaded"* ]]
+
+SUCCESS=1
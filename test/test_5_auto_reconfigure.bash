@@ -0,0 +1,39 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+forest grow local_c
+[ -f build/local_c/forest_configure_args.json ]
+
+# same arguments: cmake is not called again
+OUTPUT=$(forest grow local_c --force-build 2>&1)
+echo "$OUTPUT"
+if [[ "$OUTPUT" == *"[local_c] running cmake..."* ]]; then exit 1; fi
+
+# changed arguments: the package is configured again
+OUTPUT=$(forest grow local_c --cmake-args INSTALL_C_EXTRA=ON 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_c] running cmake..."* ]]
+[ -f install/share/local_c/c_extra.txt ]
+
+# variables that are no longer passed are removed from the cache
+OUTPUT=$(forest grow local_c 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_c] running cmake..."* ]]
+grep -q "INSTALL_C_EXTRA:BOOL=OFF" build/local_c/CMakeCache.txt
+
+SUCCESS=1
@@ -0,0 +1,59 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+# the resolved plan is saved inside the workspace
+forest grow local_c_plan
+[ -f .cache/build_plan.pickle ]
+if grep -q "C_PLAN" build/local_c_plan/CMakeCache.txt; then exit 1; fi
+
+# unchanged inputs: recipe expressions are not evaluated again
+OUTPUT=$(forest grow local_c_plan --verbose 2>&1)
+echo "$OUTPUT"
+if [[ "$OUTPUT" == *"env('C_PLAN') == 'on' evaluated to"* ]]; then exit 1; fi
+
+# environment variables read by expressions are part of the plan inputs
+rm -rf build/local_c_plan
+OUTPUT=$(C_PLAN=on forest grow local_c_plan --verbose 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"env('C_PLAN') == 'on' evaluated to True"* ]]
+grep -q "C_PLAN:UNINITIALIZED=ON" build/local_c_plan/CMakeCache.txt
+
+# and only the packages reading them are evaluated again
+echo one > memo.txt
+forest grow local_c_plan local_c_memo
+OUTPUT=$(C_PLAN=off forest grow local_c_plan local_c_memo --verbose 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"env('C_PLAN') == 'on' evaluated to False"* ]]
+if [[ "$OUTPUT" == *"shell('cat memo.txt', ttl=3600) == 'one' evaluated to"* ]]; then exit 1; fi
+
+# and so are modes
+rm -rf build/local_c_plan
+forest grow local_c_plan -m plan_mode
+grep -q "C_PLAN_MODE:UNINITIALIZED=ON" build/local_c_plan/CMakeCache.txt
+
+# and recipe files
+rm -rf build/local_c_plan
+sed -i 's/C_PLAN_MODE/C_PLAN_EDITED/' recipes/recipes/local_c_plan.yaml
+forest grow local_c_plan -m plan_mode
+grep -q "C_PLAN_EDITED:UNINITIALIZED=ON" build/local_c_plan/CMakeCache.txt
+
+# the plan can be bypassed
+OUTPUT=$(forest grow local_c_plan -m plan_mode --no-eval-cache --verbose 2>&1)
+[[ "$OUTPUT" == *"env('C_PLAN') == 'on' evaluated to False"* ]]
+
+SUCCESS=1
@@ -0,0 +1,111 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+cd $WORK_DIR
+
+
+# a project with independent slow commands, which log when they start
+# and stop (so that the peak number of concurrent jobs can be computed)
+mkdir -p $WORK_DIR/rs_src
+cat > $WORK_DIR/rs_src/CMakeLists.txt <<'EOS'
+cmake_minimum_required(VERSION 3.16)
+project(rs NONE)
+foreach(i RANGE 1 4)
+  add_custom_command(OUTPUT ${CMAKE_BINARY_DIR}/o${i}
+    COMMAND sh ${CMAKE_SOURCE_DIR}/job.sh
+    COMMAND ${CMAKE_COMMAND} -E touch ${CMAKE_BINARY_DIR}/o${i})
+  list(APPEND outs ${CMAKE_BINARY_DIR}/o${i})
+endforeach()
+add_custom_target(all_outs ALL DEPENDS ${outs})
+install(CODE "")
+EOS
+cat > $WORK_DIR/rs_src/job.sh <<'EOS'
+echo + >> $JOBS_LOG
+sleep 1
+echo - >> $JOBS_LOG
+EOS
+
+function peak_jobs {
+  awk 'BEGIN { n = 0; max = 0 } /\+/ { n++; if (n > max) max = n } /-/ { n-- } END { print max }' $JOBS_LOG
+}
+
+# recipe with the given build resources
+function rs_recipe {
+cat > recipes/recipes/$1.yaml <<EOS
+clone:
+  type: custom
+  cmd:
+    - cp -r $WORK_DIR/rs_src/. {srcdir}
+
+build:
+  type: cmake
+  resources: $2
+EOS
+}
+
+forest init
+source setup.bash
+mkdir -p recipes/recipes
+rs_recipe rs_a "{}"
+rs_recipe rs_b "{weight: 10}"
+rs_recipe rs_max "{max_jobs: 1}"
+rs_recipe rs_excl "{exclusive: true}"
+rs_recipe rs_mem_a "{memory_per_job: 100000G}"
+rs_recipe rs_mem_b "{memory_per_job: 100000G}"
+rs_recipe rs_bad "{max_job: 2}"
+
+export JOBS_LOG=$WORK_DIR/jobs.log
+
+# invalid resources are reported
+OUTPUT=$(forest grow rs_bad 2>&1) || true
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[rs_bad] invalid recipe: unknown build resources max_job"* ]]
+
+# heavier packages go first
+OUTPUT=$(forest grow rs_a rs_b -j 2 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[rs_b] building..."*"[rs_a] building..."* ]]
+
+# independent packages build side by side
+rm $JOBS_LOG
+forest grow rs_a rs_b -j 1 -P 2 --clean
+echo "peak jobs: $(peak_jobs)"
+[ $(peak_jobs) == 2 ]
+
+# max_jobs bounds --jobs, also with a jobserver
+rm $JOBS_LOG
+forest grow rs_max -j 3
+echo "peak jobs: $(peak_jobs)"
+[ $(peak_jobs) == 1 ]
+
+rm $JOBS_LOG
+forest grow rs_max -j 3 --jobserver --clean
+echo "peak jobs: $(peak_jobs)"
+[ $(peak_jobs) == 1 ]
+
+# exclusive packages build alone
+rm $JOBS_LOG
+OUTPUT=$(forest grow rs_a rs_excl -j 1 -P 2 --clean 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[rs_excl] waiting to build alone"* ]]
+echo "peak jobs: $(peak_jobs)"
+[ $(peak_jobs) == 1 ]
+
+# packages that do not fit into memory together build one at a time,
+# with as many jobs as memory allows (at least one)
+rm $JOBS_LOG
+OUTPUT=$(forest grow rs_mem_a rs_mem_b -j 2 -P 2 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[rs_mem_b] waiting for memory to build"* ]]
+echo "peak jobs: $(peak_jobs)"
+[ $(peak_jobs) == 1 ]
+[ $(grep -c + $JOBS_LOG) == 8 ]
+
+SUCCESS=1
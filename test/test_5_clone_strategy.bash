@@ -0,0 +1,70 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+SHA1=$(git -C remote/local/local_c.git rev-parse master)
+SHA2=$(commit_local_repo local_c "second commit")
+
+# partial clones
+forest grow local_c --src-only --clone-strategy blobless
+[ "$(git -C src/local_c config remote.origin.partialclonefilter)" == "blob:none" ]
+[ "$(git -C src/local_c rev-parse HEAD)" == "$SHA2" ]
+
+rm -rf src/local_c
+forest grow local_c --src-only --clone-strategy treeless
+[ "$(git -C src/local_c config remote.origin.partialclonefilter)" == "tree:0" ]
+
+# shallow fetch of a commit sha
+rm -rf src/local_c
+forest grow local_c --src-only --clone-strategy shallow -o $SHA1
+[ "$(git -C src/local_c rev-parse HEAD)" == "$SHA1" ]
+[ "$(git -C src/local_c rev-parse --is-shallow-repository)" == "true" ]
+
+# abbreviated shas fall back to a full clone
+rm -rf src/local_c
+forest grow local_c --src-only --clone-strategy shallow -o ${SHA1:0:10}
+[ "$(git -C src/local_c rev-parse HEAD)" == "$SHA1" ]
+[ "$(git -C src/local_c rev-parse --is-shallow-repository)" == "false" ]
+
+# shallow fetch of a branch, which is checked out as a tracking branch
+rm -rf src/local_c
+forest grow local_c --src-only --clone-strategy shallow
+[ "$(git -C src/local_c rev-parse --abbrev-ref HEAD)" == "master" ]
+[ "$(git -C src/local_c rev-parse --abbrev-ref master@{upstream})" == "origin/master" ]
+[ "$(git -C src/local_c rev-list --count HEAD)" == "1" ]
+
+# clone depth now works with commit shas, too
+rm -rf src/local_c
+forest grow local_c --src-only --clone-depth 1 -o $SHA1
+[ "$(git -C src/local_c rev-parse HEAD)" == "$SHA1" ]
+
+# the recipe strategy has precedence over the default one
+forest grow local_c_shallow --src-only --clone-strategy blobless
+[ "$(git -C src/local_c_shallow rev-parse --is-shallow-repository)" == "true" ]
+if git -C src/local_c_shallow config remote.origin.partialclonefilter; then exit 1; fi
+
+# unknown recipe strategies are reported
+sed 's/strategy: shallow/strategy: bogus/' recipes/recipes/local_c_shallow.yaml > recipes/recipes/local_c_bogus.yaml
+if OUTPUT=$(forest grow local_c_bogus --src-only 2>&1); then
+    echo "grow should have failed"
+    exit 1
+fi
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_c_bogus] invalid recipe: unsupported clone strategy \"bogus\""* ]]
+[[ "$OUTPUT" != *"Traceback"* ]]
+
+SUCCESS=1
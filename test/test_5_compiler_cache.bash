@@ -0,0 +1,74 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+setup_local_remote
+
+# stand-in for ccache: an object is a hit if the same command line was
+# already compiled, and each compilation is written to the stats log
+mkdir -p $WORK_DIR/bin
+cat > $WORK_DIR/bin/ccache <<'EOS'
+#!/bin/bash
+mkdir -p "$CCACHE_DIR"
+KEY=$(echo "$PWD $*" | sha1sum | cut -d' ' -f1)
+if [ -f "$CCACHE_DIR/$KEY" ]; then
+    echo "# $*" >> "$CCACHE_STATSLOG" && echo direct_cache_hit >> "$CCACHE_STATSLOG"
+else
+    echo "# $*" >> "$CCACHE_STATSLOG" && echo cache_miss >> "$CCACHE_STATSLOG"
+    touch "$CCACHE_DIR/$KEY"
+fi
+echo "$CCACHE_MAXSIZE" > "$CCACHE_DIR/maxsize"
+exec "$@"
+EOS
+chmod +x $WORK_DIR/bin/ccache
+export PATH=$WORK_DIR/bin:$PATH
+
+# the workspace default is stored in the marker file
+mkdir ws && cd ws
+forest init --compiler-cache ccache --compiler-cache-size 1G
+grep -q "compiler_cache: ccache" .forest
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+
+# first build: all misses
+OUTPUT=$(forest grow local_d 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_d] compiler cache: 0 hits, 2 misses"* ]]
+[[ "$OUTPUT" == *"[forest] compiler cache: 0 hits, 2 misses (0% hit rate) (ccache, $WORK_DIR/ws/.cache/ccache)"* ]]
+grep -q "CMAKE_C_COMPILER_LAUNCHER.*=$WORK_DIR/bin/ccache" build/local_d/CMakeCache.txt
+[ "$(cat .cache/ccache/maxsize)" == "1G" ]
+[ -f install/lib/liblocal_d.a ]
+
+# rebuild from scratch: all hits
+OUTPUT=$(forest grow local_d --clean 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_d] compiler cache: 2 hits, 0 misses"* ]]
+[[ "$OUTPUT" == *"[forest] compiler cache: 2 hits, 0 misses (100% hit rate)"* ]]
+
+# the command line overrides the workspace default
+OUTPUT=$(forest grow local_d --force-build --compiler-cache none 2>&1)
+echo "$OUTPUT"
+if [[ "$OUTPUT" == *"compiler cache"* ]]; then exit 1; fi
+if grep -q "CMAKE_C_COMPILER_LAUNCHER" build/local_d/CMakeCache.txt; then exit 1; fi
+
+# a missing tool is reported, and the build goes on without it
+if ! which sccache > /dev/null; then
+    OUTPUT=$(forest grow local_d --force-build --compiler-cache sccache 2>&1)
+    echo "$OUTPUT"
+    [[ "$OUTPUT" == *"[forest] sccache not found, compiler cache disabled"* ]]
+fi
+
+# the workspace default can be removed
+forest init --compiler-cache none
+if grep -q "compiler_cache:" .forest; then exit 1; fi
+
+SUCCESS=1
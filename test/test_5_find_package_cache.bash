@@ -0,0 +1,49 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+# install local_a, then forget about its build so that local_b has to look for it
+forest grow local_a
+rm -rf build/local_a
+
+# local_a config file is found without running cmake
+OUTPUT=$(forest grow local_b 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_b] depends on local_a -> found"* ]]
+if grep -q '"local_a"' .cache/find_package.json; then exit 1; fi
+
+# removing the config file makes it missing again
+rm -rf install/lib/cmake/local_a
+OUTPUT=$(forest grow local_b 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_b] depends on local_a -> not found, installing.."* ]]
+
+# packages shipping a find module are probed through cmake, and cached
+OUTPUT=$(forest grow find_module_dep 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[find_module_dep] depends on Threads -> found"* ]]
+grep -q '"Threads"' .cache/find_package.json
+
+# cached result is used as long as the search directories are unchanged
+OUTPUT=$(forest grow find_module_dep 2>&1)
+[[ "$OUTPUT" == *"[find_module_dep] depends on Threads -> found"* ]]
+
+# bypass the cache
+OUTPUT=$(forest grow find_module_dep --no-find-package-cache 2>&1)
+[[ "$OUTPUT" == *"[find_module_dep] depends on Threads -> found"* ]]
+
+SUCCESS=1
@@ -0,0 +1,58 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+forest grow local_a local_b local_c --src-only
+
+# refs in all the places HEAD can be resolved from: packed refs,
+# a detached HEAD, a linked work tree (gitdir: file), a second commit
+git -C src/local_b pack-refs --all
+git -C src/local_c checkout -q --detach
+git -C src/local_a worktree add -q --detach $WORK_DIR/src/local_a_wt
+commit_local_repo local_a "second commit" > /dev/null
+git -C src/local_a pull -q
+
+# lock file written by the same yaml dump from git rev-parse
+expected_lock() {
+    python3 -c "
+import subprocess, sys, yaml
+entries = {p: subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd='src/' + p, text=True).strip() for p in sys.argv[1:]}
+print(yaml.dump(entries, default_flow_style=False), end='')
+" "$@"
+}
+
+forest freeze
+expected_lock local_a local_a_wt local_b local_c > expected.lock
+cmp forest.lock expected.lock
+
+# dirty and non-git folders are reported
+echo "dirty" >> src/local_b/CMakeLists.txt
+mkdir src/not_a_repo
+if OUTPUT=$(forest freeze 2>&1); then
+    echo "freeze should have failed"
+    exit 1
+fi
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"error: local_b: has uncommitted local changes"* ]]
+[[ "$OUTPUT" == *"error: not_a_repo: not a git repository"* ]]
+cmp forest.lock expected.lock
+
+forest freeze --ignore-errors
+expected_lock local_a local_a_wt local_c > expected.lock
+cmp forest.lock expected.lock
+
+SUCCESS=1
@@ -0,0 +1,63 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+setup_local_remote
+
+# ninja progress is reported as finished/total edges
+python3 -c "
+from forest.common.parser import find_progress, ninja_regrex_pattern
+assert find_progress('[3/4] Building C object CMakeFiles/d.dir/d_one.c.o', ninja_regrex_pattern) == 75.0
+assert find_progress('[4/4] Linking C static library liblocal_d.a', ninja_regrex_pattern) == 100.0
+assert find_progress('-- Install configuration: \"\"', ninja_regrex_pattern) is None
+"
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+
+# cmake's default generator
+forest grow local_d
+grep -q '"generator": null' build/local_d/forest_configure_args.json
+
+# switching generator reconfigures from scratch
+OUTPUT=$(forest grow local_d -G "Unix Makefiles" 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_d] running cmake..."* ]]
+grep -q '"generator": "Unix Makefiles"' build/local_d/forest_configure_args.json
+grep -q "CMAKE_GENERATOR:INTERNAL=Unix Makefiles" build/local_d/CMakeCache.txt
+
+# the same generator (here, as the workspace default) does not
+forest init --generator "Unix Makefiles"
+grep -q "generator: Unix Makefiles" .forest
+OUTPUT=$(forest grow local_d 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_d] up to date, skipping"* ]]
+
+# recipes can choose their own generator
+sed -e 's/type: cmake/type: cmake\n  generator: Unix Makefiles/' recipes/recipes/local_d.yaml > recipes/recipes/local_d_make.yaml
+OUTPUT=$(forest grow local_d_make -G default 2>&1)
+echo "$OUTPUT"
+grep -q '"generator": "Unix Makefiles"' build/local_d_make/forest_configure_args.json
+
+# ninja builds (if available)
+if which ninja > /dev/null; then
+    OUTPUT=$(forest grow local_d -G Ninja 2>&1)
+    echo "$OUTPUT"
+    [[ "$OUTPUT" == *"[local_d] running cmake..."* ]]
+    [ -f build/local_d/build.ninja ]
+    [ -f install/lib/liblocal_d.a ]
+    OUTPUT=$(forest grow local_d -G Ninja --force-build 2>&1)
+    if [[ "$OUTPUT" == *"[local_d] running cmake..."* ]]; then exit 1; fi
+fi
+
+SUCCESS=1
@@ -0,0 +1,41 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+MIRROR=$WORK_DIR/mirror
+
+# sources are cloned through a bare mirror, origin points to the remote
+OUTPUT=$(forest grow local_c --git-mirror $MIRROR 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_c] cloning source code (https, via mirror)..."* ]]
+[ -f $MIRROR/forest.local/local/local_c.git/HEAD ]
+[ "$(git -C src/local_c config --get remote.origin.url)" == "https://forest.local/local/local_c.git" ]
+[ -f install/share/local_c/c_file.txt ]
+
+# the mirror is updated incrementally before cloning again
+SHA=$(commit_local_repo local_c "second commit")
+rm -rf src/local_c build/local_c
+HHCM_FOREST_GIT_MIRROR=$MIRROR forest grow local_c
+[ "$(git -C $MIRROR/forest.local/local/local_c.git rev-parse master)" == "$SHA" ]
+[ "$(git -C src/local_c rev-parse HEAD)" == "$SHA" ]
+
+# pulling from origin reaches the actual remote
+SHA=$(commit_local_repo local_c "third commit")
+git -C src/local_c pull -q origin master
+[ "$(git -C src/local_c rev-parse HEAD)" == "$SHA" ]
+
+SUCCESS=1
@@ -0,0 +1,104 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+cd $WORK_DIR
+
+# a project with independent slow commands, which log when they start
+# and stop (so that the peak number of concurrent jobs can be computed)
+mkdir -p $WORK_DIR/js_src
+cat > $WORK_DIR/js_src/CMakeLists.txt <<'EOS'
+cmake_minimum_required(VERSION 3.16)
+project(js NONE)
+foreach(i RANGE 1 4)
+  add_custom_command(OUTPUT ${CMAKE_BINARY_DIR}/o${i}
+    COMMAND sh ${CMAKE_SOURCE_DIR}/job.sh
+    COMMAND ${CMAKE_COMMAND} -E touch ${CMAKE_BINARY_DIR}/o${i})
+  list(APPEND outs ${CMAKE_BINARY_DIR}/o${i})
+endforeach()
+add_custom_target(all_outs ALL DEPENDS ${outs})
+install(CODE "")
+EOS
+cat > $WORK_DIR/js_src/job.sh <<'EOS'
+echo + >> $JOBS_LOG
+sleep 1
+echo - >> $JOBS_LOG
+EOS
+
+function peak_jobs {
+  awk 'BEGIN { n = 0; max = 0 } /\+/ { n++; if (n > max) max = n } /-/ { n-- } END { print max }' $JOBS_LOG
+}
+
+forest init
+source setup.bash
+mkdir -p recipes/recipes
+for name in js_a js_b; do
+cat > recipes/recipes/$name.yaml <<EOS
+clone:
+  type: custom
+  cmd:
+    - cp -r $WORK_DIR/js_src/. {srcdir}
+
+build:
+  type: cmake
+EOS
+done
+
+export JOBS_LOG=$WORK_DIR/jobs.log
+
+# without a jobserver, each package runs --jobs jobs
+forest grow js_a js_b -j 2 -P 2
+echo "peak jobs: $(peak_jobs)"
+[ $(peak_jobs) -gt 2 ]
+
+# with a jobserver, --jobs is shared among packages
+rm $JOBS_LOG
+OUTPUT=$(forest grow js_a js_b -j 2 -P 2 --jobserver --clean 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"with 2 parallel jobs shared by 2 package slots"* ]]
+echo "peak jobs: $(peak_jobs)"
+[ $(peak_jobs) == 2 ]
+[ $(grep -c + $JOBS_LOG) == 8 ]
+
+# a package building alone takes all jobs
+rm $JOBS_LOG
+forest grow js_a -j 3 --jobserver --clean
+echo "peak jobs: $(peak_jobs)"
+[ $(peak_jobs) == 3 ]
+
+# the same holds for ninja (if available, and recent enough to take
+# part in the jobserver)
+function ninja_supports_jobserver {
+    printf '1.13\n%s\n' "$(ninja --version)" | sort -V -C
+}
+
+if which ninja > /dev/null && ninja_supports_jobserver; then
+    rm $JOBS_LOG
+    forest grow js_a js_b -j 2 -P 2 -G Ninja --jobserver --clean
+    echo "peak jobs: $(peak_jobs)"
+    [ $(peak_jobs) == 2 ]
+fi
+
+# older ninja ignores the jobserver, and gets a fixed share of the jobs
+if which ninja > /dev/null; then
+    mkdir -p $WORK_DIR/old_ninja
+    cat > $WORK_DIR/old_ninja/ninja <<EOS
+#!/bin/bash
+if [ "\$1" == "--version" ]; then echo 1.10.1; exit 0; fi
+exec env -u MAKEFLAGS $(which ninja) "\$@"
+EOS
+    chmod +x $WORK_DIR/old_ninja/ninja
+    rm $JOBS_LOG
+    forest grow js_a js_b -j 1 -P 2 -G Ninja --jobserver --clean --no-toolchain-cache --cmake-args CMAKE_MAKE_PROGRAM=$WORK_DIR/old_ninja/ninja
+    echo "peak jobs: $(peak_jobs)"
+    [ $(peak_jobs) == 1 ]
+    [ $(grep -c + $JOBS_LOG) == 8 ]
+fi
+
+SUCCESS=1
@@ -0,0 +1,97 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+cd $WORK_DIR
+
+
+# a project with independent slow commands, which log when they start
+# and stop (so that the peak number of concurrent jobs can be computed)
+mkdir -p $WORK_DIR/mr_src
+cat > $WORK_DIR/mr_src/CMakeLists.txt <<'EOS'
+cmake_minimum_required(VERSION 3.16)
+project(mr NONE)
+foreach(i RANGE 1 4)
+  add_custom_command(OUTPUT ${CMAKE_BINARY_DIR}/o${i}
+    COMMAND sh ${CMAKE_SOURCE_DIR}/job.sh
+    COMMAND ${CMAKE_COMMAND} -E touch ${CMAKE_BINARY_DIR}/o${i})
+  list(APPEND outs ${CMAKE_BINARY_DIR}/o${i})
+endforeach()
+add_custom_target(all_outs ALL DEPENDS ${outs})
+install(CODE "")
+EOS
+cat > $WORK_DIR/mr_src/job.sh <<'EOS'
+echo + >> $JOBS_LOG
+sleep 1
+echo - >> $JOBS_LOG
+EOS
+
+function peak_jobs {
+  awk 'BEGIN { n = 0; max = 0 } /\+/ { n++; if (n > max) max = n } /-/ { n-- } END { print max }' $JOBS_LOG
+}
+
+forest init
+source setup.bash
+mkdir -p recipes/recipes
+for name in mr_a mr_b; do
+cat > recipes/recipes/$name.yaml <<EOS
+clone:
+  type: custom
+  cmd:
+    - cp -r $WORK_DIR/mr_src/. {srcdir}
+
+build:
+  type: cmake
+EOS
+done
+
+export JOBS_LOG=$WORK_DIR/jobs.log
+
+# invalid sizes are rejected
+! forest grow mr_a --memory-reserve 2X
+
+# with plenty of memory, each package runs --jobs jobs
+OUTPUT=$(forest grow mr_a mr_b -j 2 -P 2 --memory-reserve 1M 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[forest] memory: reserve 1.0 MiB"*"up to 0 jobs withheld, 0 pauses"* ]]
+[[ "$OUTPUT" == *"[mr_a] peak build memory"* ]]
+echo "peak jobs: $(peak_jobs)"
+[ $(peak_jobs) -gt 2 ]
+
+# with a reserve larger than the host memory, jobs are held back, so that
+# packages build one at a time, with a single job; still, every job runs
+rm $JOBS_LOG
+OUTPUT=$(forest grow mr_a mr_b -j 2 -P 2 --memory-reserve 1000% --clean 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"up to 4 jobs withheld"* ]]
+echo "peak jobs: $(peak_jobs)"
+[ $(peak_jobs) == 1 ]
+[ $(grep -c + $JOBS_LOG) == 8 ]
+[ -f $WORK_DIR/build/mr_a/o4 ]
+[ -f $WORK_DIR/build/mr_b/o4 ]
+
+# builds of packages with several cmake projects are accounted to the package
+cat > recipes/recipes/mr_multi.yaml <<EOS
+clone:
+  type: custom
+  cmd:
+    - cp -r $WORK_DIR/mr_src/. {srcdir}
+
+build:
+  type: cmake
+  cmakelists:
+    - first: .
+    - second: .
+EOS
+OUTPUT=$(forest grow mr_multi -j 2 --memory-reserve 1M 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[mr_multi] peak build memory"* ]]
+if [[ "$OUTPUT" == *"[first] peak build memory"* ]]; then exit 1; fi
+
+SUCCESS=1
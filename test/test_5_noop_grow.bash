@@ -0,0 +1,79 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+forest grow local_b
+[ -f .cache/build_journal.json ]
+
+# nothing changed: packages are skipped without calling cmake
+OUTPUT=$(forest grow local_b --verbose 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] up to date, skipping"* ]]
+[[ "$OUTPUT" == *"[local_b] up to date, skipping"* ]]
+if [[ "$OUTPUT" == *'calling "'* ]]; then exit 1; fi
+
+# the same goes with the artifact cache
+forest grow local_b --artifact-cache $WORK_DIR/artifacts
+OUTPUT=$(forest grow local_b --artifact-cache $WORK_DIR/artifacts --verbose 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_b] up to date, skipping"* ]]
+if [[ "$OUTPUT" == *'calling "'* ]]; then exit 1; fi
+
+# ignored files, and touching a file without changing it, do not count
+echo '*~' >> src/local_a/.git/info/exclude
+echo "backup" > src/local_a/CMakeLists.txt~
+touch src/local_a/CMakeLists.txt
+OUTPUT=$(forest grow local_b 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] up to date, skipping"* ]]
+
+# untracked files do
+echo "new" > src/local_a/new_file.txt
+OUTPUT=$(forest grow local_b 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] building..."* ]]
+rm src/local_a/new_file.txt
+forest grow local_b
+
+# editing a dependency rebuilds it, and its dependents
+echo "# edit" >> src/local_a/CMakeLists.txt
+OUTPUT=$(forest grow local_b 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] building..."* ]]
+[[ "$OUTPUT" == *"[local_b] building..."* ]]
+
+# so does a different build type, or forcing the build
+OUTPUT=$(forest grow local_b -t Debug 2>&1)
+[[ "$OUTPUT" == *"[local_b] building..."* ]]
+OUTPUT=$(forest grow local_b -t Debug --force-build 2>&1)
+[[ "$OUTPUT" == *"[local_b] building..."* ]]
+
+# after a failure, packages that were built successfully are skipped
+echo "# edit" >> src/local_a/CMakeLists.txt
+echo 'message(FATAL_ERROR "broken")' >> src/local_b/CMakeLists.txt
+if forest grow local_b -t Debug --force-reconfigure; then exit 1; fi
+sed -i '/FATAL_ERROR/d' src/local_b/CMakeLists.txt
+OUTPUT=$(forest grow local_b -t Debug 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] up to date, skipping"* ]]
+[[ "$OUTPUT" == *"[local_b] building..."* ]]
+
+# cleaning a package forgets its build
+forest grow local_b -t Debug --clean
+grep -q '"local_a"' .cache/build_journal.json
+
+SUCCESS=1
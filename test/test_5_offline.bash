@@ -0,0 +1,45 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+MIRROR=$WORK_DIR/mirror
+
+# every missing artifact is listed up front, and nothing is fetched
+if OUTPUT=$(forest grow local_b pkg_with_system_deps --offline 2>&1); then exit 1; fi
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[forest] offline mode: the following artifacts are not available locally"* ]]
+[[ "$OUTPUT" == *"[local_a] source code of forest.local/local/local_a.git (not cloned, and --git-mirror is not enabled)"* ]]
+[[ "$OUTPUT" == *"[local_b] source code of forest.local/local/local_b.git"* ]]
+[[ "$OUTPUT" == *"[pkg_with_system_deps] system package sl"* ]]
+[[ "$OUTPUT" == *"[pkg_with_system_deps] pip package meme"* ]]
+[ ! -d src/local_a ]
+
+# populate the mirror, then grow a fresh workspace with the remote gone
+forest grow local_b --git-mirror $MIRROR --src-only
+rm -rf src build install .cache
+mv remote remote_gone
+OUTPUT=$(forest grow local_b --offline --git-mirror $MIRROR 2>&1)
+echo "$OUTPUT"
+[ -f install/share/local_b/b_file.txt ]
+
+# refs are checked against the mirror
+rm -rf src/local_a
+if OUTPUT=$(forest grow local_a -o no_such_branch --offline --git-mirror $MIRROR 2>&1); then exit 1; fi
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"(tag no_such_branch missing from git mirror $MIRROR)"* ]]
+
+SUCCESS=1
@@ -0,0 +1,40 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+# independent packages are built concurrently, dependencies first
+OUTPUT=$(forest grow local_b local_c --parallel-packages 2 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[forest] building local_b local_c with 1 parallel job on 2 package slots"* ]]
+[[ "$OUTPUT" == *"[local_b] depends on local_a -> not found, installing.."* ]]
+[ -f $WORK_DIR/install/share/local_a/a_file.txt ]
+[ -f $WORK_DIR/install/share/local_b/b_file.txt ]
+[ -f $WORK_DIR/install/share/local_c/c_file.txt ]
+
+# a failing dependency is reported, and stops its dependents only
+rm -rf build/local_a src/local_a
+sed -i 's/tag: master/tag: no_such_branch/' recipes/recipes/local_a.yaml
+rm -rf install/lib/cmake/local_a
+if OUTPUT=$(forest grow local_b local_c -P 2 2>&1); then
+    echo "grow should have failed"
+    exit 1
+fi
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_b] failed to install dependency local_a"* ]]
+[[ "$OUTPUT" == *"[local_c] up to date, skipping"* ]]
+
+SUCCESS=1
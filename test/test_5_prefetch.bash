@@ -0,0 +1,69 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+# line number of the first line of $OUTPUT containing the given text
+line_of() {
+    echo "$OUTPUT" | grep -n -F -m 1 "$1" | cut -d: -f1
+}
+
+# all sources are cloned as soon as the graph is resolved, ahead of builds
+OUTPUT=$(forest grow local_b local_c --fetch-jobs 3 2>&1)
+echo "$OUTPUT"
+[ -f $WORK_DIR/install/share/local_a/a_file.txt ]
+[ -f $WORK_DIR/install/share/local_b/b_file.txt ]
+[ -f $WORK_DIR/install/share/local_c/c_file.txt ]
+[ $(line_of "[local_b] cloning source code") -lt $(line_of "[local_a] ok") ]
+[ $(line_of "[local_c] cloning source code") -lt $(line_of "[local_a] ok") ]
+[[ "$OUTPUT" != *"source code  already exists"* ]]
+
+# by default, each package is cloned right before its build
+rm -rf src build install/*
+OUTPUT=$(forest grow local_b --force-build 2>&1)
+echo "$OUTPUT"
+[ $(line_of "[local_b] cloning source code") -gt $(line_of "[local_a] ok") ]
+
+# custom fetch commands run after dependencies are installed
+rm -rf src build install/*
+cat > recipes/recipes/custom_after_a.yaml <<EOS
+clone:
+  type: custom
+  cmd:
+    - test -f $WORK_DIR/install/share/local_a/a_file.txt
+    - mkdir -p {srcdir}
+
+depends:
+  - local_a
+EOS
+OUTPUT=$(forest grow custom_after_a --fetch-jobs 3 2>&1)
+echo "$OUTPUT"
+[ $(line_of "[custom_after_a] executing custom clone command") -gt $(line_of "[local_a] ok") ]
+
+# a failed fetch stops its dependents only
+rm -rf src build install/*
+sed -i 's/tag: master/tag: no_such_branch/' recipes/recipes/local_a.yaml
+if OUTPUT=$(forest grow local_b local_c --fetch-jobs 3 2>&1); then
+    echo "grow should have failed"
+    exit 1
+fi
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] failed to fetch package"* ]]
+[[ "$OUTPUT" == *"[local_b] failed to install dependency local_a"* ]]
+[ -d $WORK_DIR/src/local_b ]
+[ -f $WORK_DIR/install/share/local_c/c_file.txt ]
+
+SUCCESS=1
@@ -0,0 +1,42 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+# parsed recipes are indexed inside the workspace
+forest grow local_c
+[ -f .cache/recipe_index.pickle ]
+[ ! -f install/share/local_c/c_extra.txt ]
+
+# an edited recipe is parsed again
+cat >> recipes/recipes/local_c.yaml <<EOT
+  args:
+    - -DINSTALL_C_EXTRA=ON
+EOT
+forest grow local_c --force-reconfigure
+[ -f install/share/local_c/c_extra.txt ]
+
+# a new recipe is picked up, a removed one is forgotten
+cp recipes/recipes/local_c.yaml recipes/recipes/local_c_copy.yaml
+forest grow local_c_copy
+rm recipes/recipes/local_c_copy.yaml
+if forest grow local_c_copy; then exit 1; fi
+
+# a corrupted index is rebuilt
+echo garbage > .cache/recipe_index.pickle
+forest grow local_c
+
+SUCCESS=1
@@ -0,0 +1,57 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+# default value is used when the variable is unset
+forest grow local_c_env
+[ -f $WORK_DIR/install/share/local_c/c_file.txt ]
+[ ! -f $WORK_DIR/install/share/local_c/c_extra.txt ]
+grep -q "C_SUFFIX:UNINITIALIZED=suffix" build/local_c_env/CMakeCache.txt
+grep -q "C_SHELL_LOCAL:UNINITIALIZED=ON" build/local_c_env/CMakeCache.txt
+grep -q "C_SHELL_SH:UNINITIALIZED=ON" build/local_c_env/CMakeCache.txt
+
+# variable value is used when set
+rm -rf build/local_c_env
+LOCAL_C_EXTRA=ON forest grow local_c_env
+[ -f $WORK_DIR/install/share/local_c/c_extra.txt ]
+
+# shell() results with a ttl are memoized across runs
+echo one > memo.txt
+forest grow local_c_memo
+grep -q "C_MEMO:UNINITIALIZED=ON" build/local_c_memo/CMakeCache.txt
+grep -q "lsb_release -rs" .cache/eval_cache.json
+
+echo two > memo.txt
+rm -rf build/local_c_memo
+forest grow local_c_memo
+grep -q "C_MEMO:UNINITIALIZED=ON" build/local_c_memo/CMakeCache.txt
+
+# unless memoized values are bypassed
+rm -rf build/local_c_memo
+forest grow local_c_memo --no-eval-cache
+if grep -q "C_MEMO" build/local_c_memo/CMakeCache.txt; then exit 1; fi
+
+# cmake args are resolved once per run, for the build stamp and cmake alike
+export COUNT_FILE=$WORK_DIR/count.txt
+forest grow local_c_count
+grep -q "C_COUNT:UNINITIALIZED=ON" build/local_c_count/CMakeCache.txt
+[ $(wc -l < count.txt) -eq 1 ]
+OUTPUT=$(forest grow local_c_count 2>&1)
+[[ "$OUTPUT" == *"[local_c_count] up to date, skipping"* ]]
+[ $(wc -l < count.txt) -eq 2 ]
+
+SUCCESS=1
@@ -0,0 +1,101 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+forest grow local_b
+forest grow local_c --src-only
+forest freeze
+
+# query a field of a package from the json output
+field() {
+    echo "$JSON" | python3 -c "import json, sys; print(next(r for r in json.load(sys.stdin) if r['name'] == '$1')['$2'])"
+}
+
+JSON=$(forest status --json)
+echo "$JSON"
+[ "$(field local_a build)" == "built" ]
+[ "$(field local_a on_tag)" == "True" ]
+[ "$(field local_a on_lock)" == "True" ]
+[ "$(field local_a dirty)" == "False" ]
+[ "$(field local_a ahead)" == "0" ]
+[ "$(field local_b build)" == "built" ]
+[ "$(field local_c build)" == "never built" ]
+[ "$(field local_c branch)" == "master" ]
+
+# a local commit, and local changes
+git -C src/local_a -c user.name=forest -c user.email=forest@localhost commit -q --allow-empty -m "local commit"
+echo "# local change" >> src/local_c/CMakeLists.txt
+mkdir src/not_a_repo
+
+JSON=$(forest status --json)
+echo "$JSON"
+[ "$(field local_a ahead)" == "1" ]
+[ "$(field local_a behind)" == "0" ]
+[ "$(field local_a on_tag)" == "False" ]
+[ "$(field local_a on_lock)" == "False" ]
+[ "$(field local_a build)" == "stale" ]
+[ "$(field local_c dirty)" == "True" ]
+[ "$(field not_a_repo error)" == "not a git repository" ]
+
+# table
+OUTPUT=$(forest status)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"PACKAGE"*"BRANCH"*"HEAD"*"LOCAL"*"UPSTREAM"*"TAG"*"LOCK"*"BUILD"* ]]
+echo "$OUTPUT" | grep -E "^local_a +master +[0-9a-f]{8} +clean +\+1/-0 +master \(off\) +off +stale$"
+echo "$OUTPUT" | grep -E "^local_b +master +[0-9a-f]{8} +clean += +master +ok +built$"
+echo "$OUTPUT" | grep -E "^local_c +master +[0-9a-f]{8} +dirty += +master +ok +never built$"
+echo "$OUTPUT" | grep -E "^not_a_repo +\(not a git repository\)"
+
+# a checkout on its recipe tag, whose objects are packed (as after a
+# clone or gc) while the tag ref is loose
+git -C src/local_b -c user.name=forest -c user.email=forest@localhost tag -a v2.0 -m "version 2.0"
+git -C src/local_b repack -adq
+git -C src/local_b prune-packed
+sed -i 's/tag: master/tag: v2.0/' recipes/recipes/local_b.yaml
+JSON=$(forest status --json)
+echo "$JSON"
+[ "$(field local_b on_tag)" == "True" ]
+OUTPUT=$(forest status)
+echo "$OUTPUT"
+echo "$OUTPUT" | grep -E "^local_b +master +[0-9a-f]{8} +clean += +v2.0 +ok"
+
+# untracked files make a build stale, as they make grow rebuild
+echo "new" > src/local_b/new_file.txt
+JSON=$(forest status --json)
+[ "$(field local_b build)" == "stale" ]
+rm src/local_b/new_file.txt
+JSON=$(forest status --json)
+[ "$(field local_b build)" == "built" ]
+
+# so does reverting the local changes a package was built with
+forest grow local_c
+JSON=$(forest status --json)
+[ "$(field local_c build)" == "built" ]
+git -C src/local_c checkout -q CMakeLists.txt
+JSON=$(forest status --json)
+[ "$(field local_c dirty)" == "False" ]
+[ "$(field local_c build)" == "stale" ]
+
+# invalid recipes are reported, and do not prevent checking other repos
+sed -i 's/^  tag: .*/&\n  strategy: bogus/' recipes/recipes/local_c.yaml
+OUTPUT=$(forest status 2>&1)
+echo "$OUTPUT"
+if [[ "$OUTPUT" == *"Traceback"* ]]; then exit 1; fi
+echo "$OUTPUT" | grep -E '^local_c +\(invalid recipe: unsupported clone strategy "bogus"'
+echo "$OUTPUT" | grep -E "^local_b +master"
+
+SUCCESS=1
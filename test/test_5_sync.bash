@@ -0,0 +1,105 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+setup_local_remote
+
+forest grow local_a local_c --src-only
+
+# nothing drifted
+OUTPUT=$(forest sync 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[forest] sync: 0 moved, 2 already in sync, 0 with local changes, 0 failed"* ]]
+
+# branches are compared with origin as of the last fetch, unless fetching
+A_OLD_SHA=$(git -C src/local_a rev-parse HEAD)
+A_UPSTREAM_SHA=$(commit_local_repo local_a "upstream commit" | tail -n 1)
+OUTPUT=$(forest sync local_a 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[forest] sync: 0 moved, 1 already in sync"* ]]
+OUTPUT=$(forest sync local_a --fetch 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] moved ${A_OLD_SHA:0:10} -> ${A_UPSTREAM_SHA:0:10} (master)"* ]]
+[ "$(git -C src/local_a rev-parse HEAD)" == "$A_UPSTREAM_SHA" ]
+
+# a tag override moves the checkout (the new commit is fetched)
+OLD_SHA=$(git -C src/local_c rev-parse HEAD)
+NEW_SHA=$(commit_local_repo local_c "second commit" | tail -n 1)
+OUTPUT=$(forest sync local_c -o $NEW_SHA 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_c] moved ${OLD_SHA:0:10} -> ${NEW_SHA:0:10} ($NEW_SHA)"* ]]
+[[ "$OUTPUT" == *"[forest] moved: local_c"* ]]
+[ "$(git -C src/local_c rev-parse HEAD)" == "$NEW_SHA" ]
+
+# repos are brought back to a forest.lock
+forest freeze
+git -C src/local_c checkout -q $OLD_SHA
+OUTPUT=$(forest sync -o forest.lock 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[forest] sync: 1 moved, 1 already in sync"* ]]
+[ "$(git -C src/local_c rev-parse HEAD)" == "$NEW_SHA" ]
+
+# a recipe tag that is not available locally (annotated tag)
+git -C remote_work/local_c -c user.name=forest -c user.email=forest@localhost tag -a v1.0 -m "version 1.0" $OLD_SHA
+git -C remote_work/local_c push -q $LOCAL_REMOTE_DIR/local/local_c.git v1.0
+sed -i 's/tag: master/tag: v1.0/' recipes/recipes/local_c.yaml
+OUTPUT=$(forest sync 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_c] moved ${NEW_SHA:0:10} -> ${OLD_SHA:0:10} (v1.0)"* ]]
+[ "$(git -C src/local_c rev-parse HEAD)" == "$OLD_SHA" ]
+OUTPUT=$(forest sync 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[forest] sync: 0 moved, 2 already in sync"* ]]
+
+# tags are resolved locally also when their objects are packed (with
+# loose tag refs, as left by fetch); the remote must not be contacted
+git -C src/local_c tag v1.0-light $OLD_SHA
+git -C src/local_c repack -adq
+git -C src/local_c prune-packed
+[ ! -f src/local_c/.git/packed-refs ] || ! grep -q "refs/tags/v1.0" src/local_c/.git/packed-refs
+[ -z "$(find src/local_c/.git/objects -type f -path '*/objects/??/*')" ]
+OUTPUT=$(GIT_CONFIG_VALUE_0=https://unreachable.invalid/ forest sync local_c 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[forest] sync: 0 moved, 1 already in sync"* ]]
+OUTPUT=$(GIT_CONFIG_VALUE_0=https://unreachable.invalid/ forest sync local_c -o v1.0-light 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[forest] sync: 0 moved, 1 already in sync"* ]]
+
+# dirty trees are not touched
+A_SHA=$(git -C src/local_a rev-parse HEAD)
+A_NEW_SHA=$(commit_local_repo local_a "second commit" | tail -n 1)
+echo "# local change" >> src/local_a/CMakeLists.txt
+if OUTPUT=$(forest sync -o local_a:=$A_NEW_SHA local_c:=v1.0 2>&1); then
+    echo "sync should have failed"
+    exit 1
+fi
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"[local_a] has uncommitted local changes, will not check out $A_NEW_SHA"* ]]
+[[ "$OUTPUT" == *"[forest] local changes: local_a"* ]]
+[ "$(git -C src/local_a rev-parse HEAD)" == "$A_SHA" ]
+grep -q "# local change" src/local_a/CMakeLists.txt
+
+# invalid recipes are reported as failures
+sed 's/^  tag: .*/&\n  strategy: bogus/' recipes/recipes/local_c.yaml > recipes/recipes/local_c_bogus.yaml
+if OUTPUT=$(forest sync local_c local_c_bogus 2>&1); then
+    echo "sync should have failed"
+    exit 1
+fi
+echo "$OUTPUT"
+if [[ "$OUTPUT" == *"Traceback"* ]]; then exit 1; fi
+[[ "$OUTPUT" == *'[local_c_bogus] invalid recipe: unsupported clone strategy "bogus"'* ]]
+[[ "$OUTPUT" == *"[forest] failed: local_c_bogus"* ]]
+
+SUCCESS=1
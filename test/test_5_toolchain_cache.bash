@@ -0,0 +1,58 @@
+#!/bin/bash
+
+TEST_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+cd $TEST_DIR
+
+# exit on error
+set -e
+SUCCESS=0
+
+source $TEST_DIR/common.bash
+source $TEST_DIR/local_remote.bash
+cd $WORK_DIR
+
+setup_local_remote
+
+forest init
+source setup.bash
+cp -r $TEST_DIR/recipes recipes
+
+# the first configure detects the toolchain, and shares the results
+OUTPUT=$(forest grow local_d --verbose 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"The C compiler identification"* ]]
+[ $(ls .cache/cmake_toolchain | wc -l) == 1 ]
+SEED=$(ls -d .cache/cmake_toolchain/*)
+grep -q "set(CMAKE_C_COMPILER " $SEED/initial_cache.cmake
+grep -q "CMAKE_PLATFORM_INFO_INITIALIZED" $SEED/initial_cache.cmake
+
+# new build folders are seeded with them
+OUTPUT=$(forest grow local_d --clean --verbose 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"loading initial cache file"* ]]
+if [[ "$OUTPUT" == *"The C compiler identification"* ]]; then exit 1; fi
+[ -f install/lib/liblocal_d.a ]
+
+# the seed is not part of the configure arguments
+OUTPUT=$(forest grow local_d --force-build 2>&1)
+if [[ "$OUTPUT" == *"running cmake..."* ]]; then exit 1; fi
+
+# a different toolchain has its own seed
+OUTPUT=$(CC=gcc forest grow local_d --clean --verbose 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"The C compiler identification"* ]]
+[ $(ls .cache/cmake_toolchain | wc -l) == 2 ]
+
+# a broken seed falls back to detection
+echo 'message(FATAL_ERROR "stale seed")' >> $SEED/initial_cache.cmake
+OUTPUT=$(forest grow local_d --clean --verbose 2>&1)
+echo "$OUTPUT"
+[[ "$OUTPUT" == *"The C compiler identification"* ]]
+[[ "$OUTPUT" == *"[local_d] ok"* ]]
+if grep -q "stale seed" $SEED/initial_cache.cmake; then exit 1; fi
+
+# seeding can be disabled
+OUTPUT=$(forest grow local_d --clean --verbose --no-toolchain-cache 2>&1)
+[[ "$OUTPUT" == *"The C compiler identification"* ]]
+
+SUCCESS=1